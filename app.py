@@ -4,14 +4,16 @@ import os
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from src.route_handlers import setup_routes
 
-# Load environment variables
+# Load environment variables (before importing src modules, which read their settings at import time)
 load_dotenv()
+from src.route_handlers import setup_routes
+
 GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
-if not GROQ_API_KEY:
+if not GROQ_API_KEY and os.environ.get("LLM_PROVIDER", "groq") != "fake":
     raise ValueError("GROQ_API_KEY not found in environment variables")
-os.environ["GROQ_API_KEY"] = GROQ_API_KEY
+if GROQ_API_KEY:
+    os.environ["GROQ_API_KEY"] = GROQ_API_KEY
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -22,6 +22,10 @@ class ApiService {
 
       if (response.statusCode == 200) {
         final data = jsonDecode(response.body);
+        // Ingestion runs as a background job; poll until it finishes
+        if (data['job_id'] != null) {
+          return await _waitForJob(data['job_id']);
+        }
         return ApiResponse.fromJson(data);
       } else {
         return ApiResponse.error('Server error: ${response.statusCode}');
@@ -31,6 +35,26 @@ class ApiService {
     }
   }
 
+  Future<ApiResponse> _waitForJob(String jobId) async {
+    while (true) {
+      await Future.delayed(const Duration(seconds: 2));
+      final response = await http.get(
+        Uri.parse('$baseUrl/api/jobs/$jobId'),
+        headers: headers,
+      );
+      if (response.statusCode != 200) {
+        return ApiResponse.error('Server error: ${response.statusCode}');
+      }
+      final data = jsonDecode(response.body);
+      if (data['status'] == 'done') {
+        return ApiResponse.fromJson(data);
+      }
+      if (data['status'] == 'error') {
+        return ApiResponse.error(data['response'] ?? 'Repository ingestion failed');
+      }
+    }
+  }
+
   Future<ApiResponse> sendMessage(String message) async {
     try {
       final response = await http.post(
@@ -0,0 +1,106 @@
+# src/answer_cache.py
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_MAX_ENTRIES = int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", "86400"))
+# Cosine similarity above which a differently worded question reuses an answer; 0 disables matching
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("ANSWER_CACHE_SIMILARITY", "0"))
+
+def normalize_question(question):
+    """Lowercases, collapses whitespace and drops trailing punctuation, so trivial variants share a key."""
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip("?!. ")
+
+class CachedAnswer:
+    def __init__(self, question, answer, vector=None):
+        self.question = question
+        self.answer = answer
+        self.vector = vector
+        self.created = time.time()
+
+class AnswerCache:
+    """
+    In-memory LRU cache of chat answers keyed by (repo, indexed commit, normalized question), with a
+    TTL. With a similarity threshold and an `embed_query` function, a question whose embedding is
+    close enough to a cached question of the same repo and commit reuses that answer.
+    Re-ingesting a repository changes its commit (and `invalidate` drops its entries outright).
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                 similarity_threshold=ANSWER_CACHE_SIMILARITY, embed_query=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.embed_query = embed_query
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _vector(self, question):
+        if not self.similarity_threshold or self.embed_query is None:
+            return None
+        vector = np.asarray(self.embed_query(question), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _expired(self, entry):
+        return self.ttl_seconds and time.time() - entry.created > self.ttl_seconds
+
+    def get(self, repo_hash, commit, question):
+        """Returns (entry, info) for a hit, where info describes the match for response metadata, or None."""
+        key = (repo_hash, commit, normalize_question(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry, {"hit": True, "match": "exact", "age_seconds": round(time.time() - entry.created, 1)}
+        vector = self._vector(question)
+        if vector is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            best_key, best_similarity = None, self.similarity_threshold
+            for other_key, entry in self._entries.items():
+                if other_key[:2] != (repo_hash, commit) or entry.vector is None or self._expired(entry):
+                    continue
+                similarity = float(np.dot(vector, entry.vector))
+                if similarity >= best_similarity:
+                    best_key, best_similarity = other_key, similarity
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            entry = self._entries[best_key]
+            self.hits += 1
+            return entry, {"hit": True, "match": "similar", "similarity": round(best_similarity, 4),
+                           "cached_question": entry.question, "age_seconds": round(time.time() - entry.created, 1)}
+
+    def put(self, repo_hash, commit, question, answer):
+        entry = CachedAnswer(question, answer, self._vector(question))
+        with self._lock:
+            key = (repo_hash, commit, normalize_question(question))
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, repo_hash):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == repo_hash]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,375 @@
+# src/benchmark.py
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import platform
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_VERSION = 1
+# Relative file counts per extension in generated repositories
+DEFAULT_MIX = {".py": 3, ".c": 1, ".h": 1, ".cpp": 1, ".hpp": 1, ".html": 1, ".css": 1, ".js": 1, ".java": 1}
+BENCHMARK_QUERIES = (
+    "How is the configuration loaded?",
+    "Where are records validated?",
+    "What does process_batch return?",
+    "Which function parses the input?",
+)
+# Dimension of the fake embeddings (that of the default model)
+FAKE_EMBEDDING_SIZE = 384
+
+def parse_mix(text):
+    """Parses "py=3,c=1,js=2" into {".py": 3, ".c": 1, ".js": 2}."""
+    mix = {}
+    for item in text.split(","):
+        extension, _, weight = item.strip().partition("=")
+        mix["." + extension.lstrip(".")] = int(weight or 1)
+    return mix
+
+def _words(rng, count):
+    vocabulary = ("config", "record", "batch", "input", "cache", "index", "user", "event", "buffer", "token",
+                  "parse", "load", "store", "check", "merge", "value", "item", "result", "state", "node")
+    return [rng.choice(vocabulary) for _ in range(count)]
+
+def _python_source(rng, functions):
+    parts = ['"""Synthetic module."""\nimport os\n']
+    for i in range(functions):
+        a, b = _words(rng, 2)
+        if i % 4 == 3:
+            parts.append(f"class {a.capitalize()}{b.capitalize()}{i}:\n    def __init__(self, {a}):\n"
+                         f"        self.{a} = {a}\n\n    def {b}(self, {a}):\n"
+                         f"        return [{a} for _ in range({i % 7 + 1})]\n")
+        else:
+            body = "\n".join(f"    {w}_{j} = {a} + {j}" for j, w in enumerate(_words(rng, 3 + i % 5)))
+            parts.append(f"def {a}_{b}_{i}({a}, {b}=None):\n    \"\"\"Handles {a} and {b}.\"\"\"\n{body}\n"
+                         f"    return {a}\n")
+    return "\n\n".join(parts)
+
+def _c_source(rng, functions, header=False):
+    parts = ["#include <stdio.h>\n#include <stdlib.h>\n"]
+    for i in range(functions):
+        a, b = _words(rng, 2)
+        if i % 4 == 3:
+            parts.append(f"struct {a}_{b}_{i} {{\n    int {a};\n    char *{b};\n}};\n")
+        elif header:
+            parts.append(f"int {a}_{b}_{i}(int {a}, int {b});\n")
+        else:
+            body = "\n".join(f"    int {w}_{j} = {a} * {j};" for j, w in enumerate(_words(rng, 3 + i % 5)))
+            parts.append(f"int {a}_{b}_{i}(int {a}, int {b})\n{{\n{body}\n    return {a} + {b};\n}}\n")
+    return "\n".join(parts)
+
+def _cpp_source(rng, functions, header=False):
+    parts = ["#include <string>\n#include <vector>\n\nnamespace synthetic {\n"]
+    for i in range(functions):
+        a, b = _words(rng, 2)
+        if i % 3 == 2:
+            parts.append(f"class {a.capitalize()}{i} {{\npublic:\n    int {b}(int {a}) {{ return {a} * {i}; }}\n"
+                         f"private:\n    std::vector<int> {a}_;\n}};\n")
+        elif header:
+            parts.append(f"int {a}_{b}_{i}(const std::string &{a});\n")
+        else:
+            body = "\n".join(f"    int {w}_{j} = static_cast<int>({a}.size()) + {j};"
+                             for j, w in enumerate(_words(rng, 3 + i % 5)))
+            parts.append(f"int {a}_{b}_{i}(const std::string &{a})\n{{\n{body}\n    return 0;\n}}\n")
+    parts.append("}  // namespace synthetic\n")
+    return "\n".join(parts)
+
+def _java_source(rng, functions, class_name):
+    methods = []
+    for i in range(functions):
+        a, b = _words(rng, 2)
+        body = "\n".join(f"        int {w}{j} = {a} + {j};" for j, w in enumerate(_words(rng, 3 + i % 5)))
+        methods.append(f"    public int {a}{b.capitalize()}{i}(int {a}) {{\n{body}\n        return {a};\n    }}\n")
+    return f"package synthetic;\n\npublic class {class_name} {{\n" + "\n".join(methods) + "}\n"
+
+def _js_source(rng, functions):
+    parts = []
+    for i in range(functions):
+        a, b = _words(rng, 2)
+        body = "\n".join(f"  var {w}{j} = {a} + {j};" for j, w in enumerate(_words(rng, 3 + i % 5)))
+        parts.append(f"function {a}{b.capitalize()}{i}({a}) {{\n{body}\n  return {a};\n}}\n")
+    return "\n".join(parts)
+
+def _html_source(rng, functions):
+    items = "\n".join(f"      <li class=\"{a}\">{a} {b}</li>" for a, b in (_words(rng, 2) for _ in range(functions * 3)))
+    return f"<!DOCTYPE html>\n<html>\n  <head><title>Synthetic</title></head>\n  <body>\n    <ul>\n{items}\n    </ul>\n  </body>\n</html>\n"
+
+def _css_source(rng, functions):
+    return "\n".join(f".{a}-{i} {{\n  margin: {i}px;\n  color: #{rng.randrange(0x1000000):06x};\n}}\n"
+                     for i, a in enumerate(_words(rng, functions * 2)))
+
+def synthetic_source(extension, rng, functions, name):
+    if extension == ".py":
+        return _python_source(rng, functions)
+    if extension in (".c", ".h"):
+        return _c_source(rng, functions, header=extension == ".h")
+    if extension in (".cpp", ".hpp"):
+        return _cpp_source(rng, functions, header=extension == ".hpp")
+    if extension == ".java":
+        return _java_source(rng, functions, name)
+    if extension == ".js":
+        return _js_source(rng, functions)
+    if extension == ".html":
+        return _html_source(rng, functions)
+    if extension == ".css":
+        return _css_source(rng, functions)
+    raise ValueError(f"No synthetic source for {extension}")
+
+def generate_repo(repo_path, files=100, mix=None, functions_per_file=10, seed=0):
+    """
+    Writes a deterministic synthetic repository of `files` source files, split across extensions by
+    the weights in `mix`, and commits it as a local git repository. Returns the written paths.
+    """
+    from git import Repo, Actor
+
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    total_weight = sum(mix.values())
+    extensions = [extension for extension, weight in mix.items()
+                  for _ in range(max(1, round(files * weight / total_weight)))][:files]
+    written = []
+    for i, extension in enumerate(extensions):
+        name = f"Module{i}" if extension == ".java" else f"module_{i}"
+        rel_path = os.path.join(f"pkg{i % 10}", name + extension)
+        file_path = os.path.join(repo_path, rel_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(synthetic_source(extension, rng, functions_per_file, name))
+        written.append(rel_path)
+    repo = Repo.init(repo_path)
+    repo.index.add(written)
+    author = Actor("Benchmark", "benchmark@example.com")
+    repo.index.commit("Synthetic repository", author=author, committer=author)
+    return written
+
+def touch_files(repo_path, rel_paths, seed=1):
+    """Appends a function to some files and commits, for measuring incremental re-ingestion."""
+    from git import Repo, Actor
+
+    rng = random.Random(seed)
+    for rel_path in rel_paths:
+        extension = os.path.splitext(rel_path)[1]
+        name = os.path.splitext(os.path.basename(rel_path))[0]
+        if extension == ".java":
+            continue
+        with open(os.path.join(repo_path, rel_path), 'a', encoding='utf-8') as f:
+            f.write("\n" + synthetic_source(extension, rng, 1, name))
+    repo = Repo(repo_path)
+    repo.index.add(rel_paths)
+    author = Actor("Benchmark", "benchmark@example.com")
+    repo.index.commit("Touch files", author=author, committer=author)
+
+def fake_embeddings(size=FAKE_EMBEDDING_SIZE):
+    """Deterministic offline embeddings: the same text always maps to the same random vector."""
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    return DeterministicFakeEmbedding(size=size)
+
+def peak_rss_mb():
+    """Peak resident memory so far of this process and of its finished children (e.g. ingestion workers)."""
+    if resource is None:
+        return None, None
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return (round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+            round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1))
+
+class StageTimer:
+    """Collects wall time, peak RSS and (with tracemalloc) peak Python allocations per stage."""
+
+    def __init__(self, trace_allocations=False):
+        self.stages = {}
+        self.trace_allocations = trace_allocations
+
+    @contextmanager
+    def stage(self, name, **extra):
+        if self.trace_allocations:
+            tracemalloc.start()
+        started = time.perf_counter()
+        result = dict(extra)
+        try:
+            yield result
+        finally:
+            result["seconds"] = round(time.perf_counter() - started, 4)
+            if self.trace_allocations:
+                result["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+                tracemalloc.stop()
+            result["peak_rss_mb"], result["children_peak_rss_mb"] = peak_rss_mb()
+            self.stages[name] = result
+            logger.info(f"{name}: {result}")
+
+def run_benchmark(work_dir, files=100, mix=None, functions_per_file=10, seed=0, queries=BENCHMARK_QUERIES,
+                  workers=None, trace_allocations=False):
+    """
+    Generates a synthetic repository under `work_dir` and times every ingestion and query stage on it
+    with fake embeddings and the fake LLM. Returns a JSON-serializable report.
+    """
+    from langchain_community.vectorstores import FAISS
+    from src.helper import walk_repo_files, load_files, function_class_chunker, chunk_repo_files, INGEST_WORKERS
+    from src.indexer import build_index, INDEX_DIRNAME, EMBED_BATCH_SIZE, get_head_commit
+    from src.index_store import save_index, open_index
+    from src.fake_llm import load_fake_llm
+    from src.chat_pipeline import make_chain, run_chat, wait_for_memory, LLMCallStats
+    from src.context_assembler import assemble_context
+
+    workers = workers or INGEST_WORKERS
+    repo_path = os.path.join(work_dir, "repo")
+    db_dir = os.path.join(work_dir, "db")
+    embeddings = fake_embeddings()
+    timer = StageTimer(trace_allocations)
+
+    with timer.stage("generate") as stage:
+        written = generate_repo(repo_path, files, mix, functions_per_file, seed)
+        stage["files"] = len(written)
+        stage["bytes"] = sum(os.path.getsize(os.path.join(repo_path, path)) for path in written)
+    with timer.stage("walk") as stage:
+        file_paths, _ = walk_repo_files(repo_path)
+        stage["files"] = len(file_paths)
+    with timer.stage("load_repo") as stage:
+        documents = load_files(file_paths)
+        stage["documents"] = len(documents)
+    with timer.stage("function_class_chunker") as stage:
+        chunks = function_class_chunker(documents)
+        stage["chunks"] = len(chunks)
+    with timer.stage("chunk_parallel", workers=workers) as stage:
+        stage["chunks"] = len(chunk_repo_files(file_paths, workers))
+    texts = [chunk.page_content for chunk in chunks]
+    with timer.stage("embed"):
+        vectors = []
+        for i in range(0, len(texts), EMBED_BATCH_SIZE):
+            vectors.extend(embeddings.embed_documents(texts[i:i + EMBED_BATCH_SIZE]))
+    timer.stages["embed"]["chunks_per_second"] = round(len(texts) / max(timer.stages["embed"]["seconds"], 1e-9), 1)
+    with timer.stage("faiss_build") as stage:
+        vectordb = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings,
+                                         metadatas=[chunk.metadata for chunk in chunks])
+        stage["vectors"] = vectordb.index.ntotal
+    index_path = os.path.join(work_dir, "standalone_index")
+    with timer.stage("save_local") as stage:
+        vectordb.save_local(index_path)
+        stage["bytes"] = sum(os.path.getsize(os.path.join(index_path, name)) for name in os.listdir(index_path))
+    with timer.stage("load_local"):
+        FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+    store_path = os.path.join(work_dir, "standalone_store")
+    with timer.stage("save_index") as stage:
+        save_index(vectordb, store_path)
+        stage["bytes"] = sum(os.path.getsize(os.path.join(store_path, name)) for name in os.listdir(store_path))
+    with timer.stage("open_index"):
+        vectordb = open_index(store_path, embeddings)
+    with timer.stage("retrieve", queries=len(queries), k=8) as stage:
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            vectordb.similarity_search(query, k=8)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        stage["mean_ms"] = round(1000 * sum(latencies) / len(latencies), 3)
+        stage["max_ms"] = round(1000 * latencies[-1], 3)
+
+    with timer.stage("ingest_full") as stage:
+        vectordb, stats = build_index(repo_path, db_dir, embeddings, incremental=False)
+        stage.update(files=stats["files_indexed"], chunks=stats["chunks_added"], index_type=stats["index_type"])
+    touched = written[::20] or written[:1]
+    touch_files(repo_path, touched, seed + 1)
+    with timer.stage("ingest_incremental", files_touched=len(touched)) as stage:
+        vectordb, stats = build_index(repo_path, db_dir, embeddings, incremental=True)
+        stage.update(mode=stats["mode"], files=stats["files_indexed"], chunks=stats["chunks_added"])
+    # On the ingested index, whose chunks carry ids and token counts
+    with timer.stage("context_assembly", queries=len(queries)) as stage:
+        # Code and file:line headers are reported apart: headers add tokens even when no chunks merge
+        totals = {"retrieved_tokens": 0, "assembled_code_tokens": 0, "header_tokens": 0, "blocks_dropped": 0}
+        for query in queries:
+            _, report = assemble_context(vectordb.similarity_search(query, k=8))
+            totals["retrieved_tokens"] += report["tokens_before"]
+            totals["assembled_code_tokens"] += report["tokens_after"] - report["header_tokens"]
+            totals["header_tokens"] += report["header_tokens"]
+            totals["blocks_dropped"] += report["blocks_dropped"]
+        totals["assembled_tokens"] = totals["assembled_code_tokens"] + totals["header_tokens"]
+        stage.update(totals)
+
+    llm_stats = LLMCallStats()
+    llm = load_fake_llm(token_delay=0)
+    llm.callbacks = [llm_stats]
+    qa = make_chain(llm, vectordb.as_retriever(search_kwargs={"k": 8}), "Context:\n{context}\n\nQuestion:\n{question}")
+    with timer.stage("chat", messages=len(queries)) as stage:
+        for query in queries:
+            run_chat(qa, query)
+        wait_for_memory(qa)
+        stage["llm_calls"] = llm_stats.calls
+
+    return {
+        "benchmark_version": BENCHMARK_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "code_commit": get_head_commit(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": {"files": files, "mix": mix or DEFAULT_MIX, "functions_per_file": functions_per_file,
+                   "seed": seed, "workers": workers},
+        "stages": timer.stages,
+    }
+
+def compare_reports(baseline, current, threshold=0.1):
+    """Per-stage time ratios of two reports; stages slower by more than `threshold` are flagged."""
+    comparison = {}
+    for name, stage in current["stages"].items():
+        before = baseline["stages"].get(name)
+        if not before or not before.get("seconds"):
+            continue
+        ratio = stage["seconds"] / before["seconds"]
+        comparison[name] = {"baseline_seconds": before["seconds"], "seconds": stage["seconds"],
+                            "ratio": round(ratio, 3), "regression": ratio > 1 + threshold}
+    return comparison
+
+# Usage: python -m src.benchmark [--files N] [--mix py=3,c=1,...] [--functions N] [--seed N] [--workers N]
+#                                [--tracemalloc] [--output report.json] [--keep DIR]
+#        python -m src.benchmark compare baseline.json current.json
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.WARNING)
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        with open(sys.argv[2], 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(sys.argv[3], 'r', encoding='utf-8') as f:
+            current = json.load(f)
+        comparison = compare_reports(baseline, current)
+        print(json.dumps(comparison, indent=2))
+        sys.exit(1 if any(stage["regression"] for stage in comparison.values()) else 0)
+
+    parser = argparse.ArgumentParser(description="End-to-end ingestion and query benchmark on a synthetic repository")
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--mix", type=parse_mix, default=None, help="extension weights, e.g. py=3,c=1,js=1")
+    parser.add_argument("--functions", type=int, default=10, help="functions/classes per file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tracemalloc", action="store_true", help="also record peak Python allocations per stage")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--keep", help="generate into this directory and keep it")
+    args = parser.parse_args()
+
+    work_dir = args.keep or tempfile.mkdtemp(prefix="repo-benchmark-")
+    # A cold C++ parse cache of its own, inherited by the spawned chunking workers
+    os.environ.setdefault("CPP_PARSE_CACHE_DIR", os.path.join(work_dir, "parse_cache"))
+    try:
+        report = run_benchmark(work_dir, args.files, args.mix, args.functions, args.seed,
+                               workers=args.workers, trace_allocations=args.tracemalloc)
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
@@ -0,0 +1,342 @@
+# src/c_chunker.py
+import re
+import logging
+from pycparser import CParser, c_ast
+from src.chunk_sizing import CHUNK_MAX_TOKENS, count_tokens, split_chunk
+from src.definition_chunker import parse_once, line_scopes
+
+logger = logging.getLogger(__name__)
+
+# Common library typedefs prepended (on the first line, so line numbers are kept) because
+# includes are not expanded and pycparser needs every type name declared before use
+TYPEDEF_PRELUDE = " ".join(f"typedef int {name};" for name in (
+    "size_t", "ssize_t", "ptrdiff_t", "intptr_t", "uintptr_t", "off_t", "time_t", "clock_t", "wchar_t",
+    "bool", "FILE", "va_list", "pid_t", "int8_t", "int16_t", "int32_t", "int64_t",
+    "uint8_t", "uint16_t", "uint32_t", "uint64_t",
+)) + " "
+
+AGGREGATE_RE = re.compile(r"^(?:typedef\s+)?(?:(?:static|const|volatile)\s+)*(struct|union|enum)\b\s*(\w+)?")
+ATTRIBUTE_RE = re.compile(r"__attribute__\s*\(\(.*?\)\)", re.S)
+FUNCTION_NAME_RE = re.compile(r"(\w+)\s*\($")
+INCLUDE_RE = re.compile(r'^\s*#\s*include\s*[<"]([^>"]+)[>"]')
+# Lines that carry no content on their own: blanks, conditional directives and extern "C" wrappers
+GUARD_LINE_RE = re.compile(r'^\s*(#\s*(if|ifdef|ifndef|elif|else|endif)\b.*|extern\s*"C"\s*\{|\}|)\s*$')
+MAX_GROUP_NAMES = 10
+# Bumped whenever chunk boundaries, metadata or extracted symbols change, so indexed C files are re-chunked
+CHUNKER_VERSION = 3
+# Symbol index kinds of the item types
+SYMBOL_KINDS = {"FuncDef": "function", "Struct": "class", "Union": "class", "Enum": "class"}
+
+def mask_c_source(code, keep_literals=False):
+    """
+    Returns the source with comments and preprocessor directives (including continuation lines) replaced
+    by spaces, and string/char literals too unless `keep_literals`. Newlines are kept, so line and column
+    positions match the original. Also returns the set of 1-based lines holding directives.
+    """
+    out = list(code)
+    directive_lines = set()
+    i, n, line = 0, len(code), 1
+    at_line_start = True
+    while i < n:
+        c = code[i]
+        if c == "\n":
+            line += 1
+            at_line_start = True
+            i += 1
+            continue
+        if at_line_start and c in " \t":
+            i += 1
+            continue
+        if at_line_start and c == "#":
+            # Directive runs to the first newline not escaped by a backslash
+            while i < n and not (code[i] == "\n" and code[i - 1] != "\\"):
+                if code[i] == "\n":
+                    directive_lines.add(line)
+                    line += 1
+                else:
+                    out[i] = " "
+                i += 1
+            directive_lines.add(line)
+            continue
+        at_line_start = False
+        if code.startswith("//", i):
+            while i < n and code[i] != "\n":
+                out[i] = " "
+                i += 1
+        elif code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            end = n if end == -1 else end + 2
+            for j in range(i, end):
+                if code[j] != "\n":
+                    out[j] = " "
+                else:
+                    line += 1
+            i = end
+        elif c in "\"'":
+            j = i + 1
+            while j < n and code[j] != c and code[j] != "\n":
+                j += 2 if code[j] == "\\" else 1
+            j = min(j + 1, n)
+            if not keep_literals:
+                for k in range(i + 1, j - 1):
+                    out[k] = " "
+            i = j
+        else:
+            i += 1
+    return "".join(out), directive_lines
+
+def _line_at(line_starts, offset):
+    lo, hi = 0, len(line_starts)
+    while lo + 1 < hi:
+        mid = (lo + hi) // 2
+        if line_starts[mid] <= offset:
+            lo = mid
+        else:
+            hi = mid
+    return lo + 1
+
+def _aggregate_head(head):
+    """
+    The AGGREGATE_RE match if a brace following `head` opens the struct/union/enum body itself
+    (`struct X {`, `typedef struct {`), or None, e.g. for `struct node *new_node(int v) {`.
+    """
+    head = ATTRIBUTE_RE.sub(" ", head).strip()
+    match = AGGREGATE_RE.match(head)
+    return match if match and not head[match.end():].strip() else None
+
+def top_level_spans(masked):
+    """
+    Scans masked C source for top-level items, returning (start_line, end_line, kind, name) tuples where
+    kind is "function", "aggregate" (struct/union/enum definition) or "declaration". Braces of
+    `extern "C" { ... }` blocks are treated as transparent; their (start, end) offsets are returned too.
+    """
+    line_starts = [0] + [m.end() for m in re.finditer("\n", masked)]
+    spans, extern_blocks = [], []
+    depth, start, head = 0, None, None
+    for i, c in enumerate(masked):
+        if start is None and not c.isspace():
+            start = i
+        if c == "{":
+            if depth == 0:
+                prefix = masked[start:i].strip() if start is not None else ""
+                if re.fullmatch(r'extern[\s"]*', prefix):
+                    extern_blocks.append((start, i + 1))
+                    start = None
+                    continue
+                head = prefix
+            depth += 1
+        elif c == "}":
+            if depth == 0:
+                # Closing brace of an extern "C" block
+                extern_blocks.append((i, i + 1))
+                start = None
+                continue
+            depth -= 1
+            # A function whatever its head starts with (functions may return struct/union/enum types)
+            if depth == 0 and head is not None and "(" in head and "=" not in head \
+                    and not _aggregate_head(head):
+                name_match = FUNCTION_NAME_RE.search(head[:head.find("(") + 1])
+                spans.append((_line_at(line_starts, start), _line_at(line_starts, i), "function",
+                              name_match.group(1) if name_match else ""))
+                start, head = None, None
+        elif c == ";" and depth == 0 and start is not None:
+            text = masked[start:i]
+            match = _aggregate_head(head) if head is not None and "=" not in head else None
+            kind = "aggregate" if match else "declaration"
+            if match:
+                # typedef struct {...} name; is named by the typedef name
+                tail = re.findall(r"\w+", text[text.rfind("}") + 1:])
+                name = tail[-1] if head.startswith("typedef") and tail else match.group(2) or (tail[-1] if tail else "")
+            else:
+                # The declarator name, before any parameter list or initializer
+                identifiers = re.findall(r"\w+", re.sub(r"[(=].*", "", text, flags=re.S))
+                name = identifiers[-1] if identifiers else ""
+                paren = FUNCTION_NAME_RE.search(text[:text.find("(") + 1]) if "(" in text else None
+                if paren:
+                    name = paren.group(1)
+            spans.append((_line_at(line_starts, start), _line_at(line_starts, i), kind, name))
+            start, head = None, None
+    return spans, extern_blocks
+
+class TopLevelVisitor(c_ast.NodeVisitor):
+    """Records (line, type, name) for each top-level node of a pycparser tree, without visiting function bodies."""
+
+    def __init__(self):
+        self.nodes = []
+
+    def visit_FileAST(self, node):
+        for ext in node.ext:
+            self.visit(ext)
+
+    def visit_FuncDef(self, node):
+        self.nodes.append((node.decl.coord.line, "FuncDef", node.decl.name))
+
+    def visit_Decl(self, node):
+        if isinstance(node.type, (c_ast.Struct, c_ast.Union, c_ast.Enum)) and _defines(node.type):
+            self.nodes.append((node.coord.line, type(node.type).__name__, node.type.name or ""))
+        else:
+            node_type = "FuncDecl" if isinstance(node.type, c_ast.FuncDecl) else "Decl"
+            self.nodes.append((node.coord.line, node_type, node.name or ""))
+
+    def visit_Typedef(self, node):
+        inner = getattr(node.type, "type", None)
+        if isinstance(inner, (c_ast.Struct, c_ast.Union, c_ast.Enum)) and _defines(inner):
+            self.nodes.append((node.coord.line, type(inner).__name__, node.name))
+        else:
+            self.nodes.append((node.coord.line, "Typedef", node.name))
+
+def _defines(node):
+    # A struct/union with members or an enum with values, as opposed to a reference to one
+    return getattr(node, "decls", None) is not None or getattr(node, "values", None) is not None
+
+class CallVisitor(c_ast.NodeVisitor):
+    """Records (line, name) of each call of a named function or function pointer member in a pycparser tree."""
+
+    def __init__(self):
+        self.calls = []
+
+    def visit_FuncCall(self, node):
+        name = node.name.name if isinstance(node.name, c_ast.ID) else \
+            node.name.field.name if isinstance(node.name, c_ast.StructRef) else None
+        if name:
+            self.calls.append((node.coord.line, name))
+        self.generic_visit(node)
+
+def parse_top_level(tree):
+    """Top-level (line, type, name) nodes of a pycparser tree of masked C source."""
+    visitor = TopLevelVisitor()
+    visitor.visit(tree)
+    # Skip the prelude's own typedefs
+    return visitor.nodes[TYPEDEF_PRELUDE.count("typedef"):]
+
+def parse_c(code):
+    """
+    Scans and parses a C file: {"items": top-level (start_line, end_line, type, name) items, "masked_lines",
+    "directive_lines", "tree": the pycparser tree, or None (with the "error") where the file does not parse
+    without its includes expanded}. Parsing the same file again, for its symbols after its chunks, reuses
+    the result.
+    """
+    return parse_once(("c", code), lambda: _parse_c(code))
+
+def _parse_c(code):
+    masked, directive_lines = mask_c_source(code)
+    spans, extern_blocks = top_level_spans(masked)
+    try:
+        pycparser_masked, _ = mask_c_source(code, keep_literals=True)
+        # extern "C" wrappers are C++ only
+        for start, end in extern_blocks:
+            pycparser_masked = pycparser_masked[:start] + " " * (end - start) + pycparser_masked[end:]
+        # The prelude is prepended to the first line, so node lines are the file's lines
+        tree, error = CParser().parse(TYPEDEF_PRELUDE + pycparser_masked), None
+        nodes = parse_top_level(tree)
+    except Exception as e:
+        tree, error, nodes = None, e, []
+
+    items = []
+    for start_line, end_line, kind, name in spans:
+        node = next((node for node in nodes if start_line <= node[0] <= end_line), None)
+        if kind == "function":
+            node_type = "FuncDef"
+        elif kind == "aggregate":
+            node_type = node[1] if node and node[1] in ("Struct", "Union", "Enum") else "Struct"
+        else:
+            node_type = "Declarations"
+        items.append((start_line, end_line, node_type, node[2] if node and node[2] else name))
+    items.extend((line, line, "Declarations", "") for line in directive_lines)
+    items.sort()
+    return {"items": items, "masked_lines": masked.splitlines(), "directive_lines": directive_lines,
+            "tree": tree, "error": error}
+
+def chunk_c_code(code, file_path, max_tokens=None, overlap_tokens=None):
+    """
+    Chunks a C source or header file: one chunk per function definition and per struct/union/enum
+    definition, and one chunk per run of other top-level declarations and preprocessor directives
+    (grown up to the token budget). Extents come from a brace/semicolon scan of the source with comments
+    and directives masked out; node types and names come from pycparser where the file parses without
+    its includes expanded, and from the scan otherwise.
+    """
+    lines = code.splitlines()
+    max_tokens = max_tokens or CHUNK_MAX_TOKENS
+    token_prefix = [0]
+    for tokens in count_tokens(lines):
+        token_prefix.append(token_prefix[-1] + tokens)
+    parsed = parse_c(code)
+    if parsed["tree"] is None:
+        logger.debug(f"pycparser could not parse {file_path}, using scanned names: {parsed['error']}")
+    items, masked_lines, directive_lines = parsed["items"], parsed["masked_lines"], parsed["directive_lines"]
+
+    chunks = []
+    group = None
+    previous_end = 0
+
+    def flush():
+        if group is None:
+            return
+        start_line, end_line, names = group
+        group_lines = lines[start_line - 1:end_line]
+        if all(GUARD_LINE_RE.match(line) for line in group_lines):
+            return
+        metadata = {"type": "Declarations", "name": ", ".join(list(dict.fromkeys(n for n in names if n))[:MAX_GROUP_NAMES]),
+                    "file": file_path, "start_line": start_line, "end_line": end_line}
+        chunks.extend(split_chunk("\n".join(group_lines), metadata, max_tokens, overlap_tokens))
+
+    for start_line, end_line, node_type, name in items:
+        if end_line <= previous_end:
+            continue
+        # Comments directly above an item belong to it
+        while start_line > previous_end + 1 and lines[start_line - 2].strip() \
+                and not masked_lines[start_line - 2].strip() and (start_line - 1) not in directive_lines:
+            start_line -= 1
+        if node_type == "Declarations":
+            if group is not None and token_prefix[end_line] - token_prefix[group[0] - 1] <= max_tokens:
+                group = (group[0], end_line, group[2] + [name])
+            else:
+                flush()
+                group = (start_line, end_line, [name])
+        else:
+            flush()
+            group = None
+            metadata = {"type": node_type, "name": name, "file": file_path,
+                        "start_line": start_line, "end_line": end_line}
+            chunks.extend(split_chunk("\n".join(lines[start_line - 1:end_line]), metadata,
+                                      max_tokens, overlap_tokens))
+        previous_end = end_line
+    flush()
+    return chunks
+
+def analyze_c(code):
+    """
+    Definitions (the functions, structs, unions and enums the chunker finds) and references (#includes,
+    and call sites with the enclosing function where pycparser parses the file) in a C file.
+    """
+    parsed = parse_c(code)
+    definitions = [{"name": name, "qualname": name, "kind": SYMBOL_KINDS[node_type],
+                    "start_line": start_line, "end_line": end_line}
+                   for start_line, end_line, node_type, name in parsed["items"] if node_type in SYMBOL_KINDS and name]
+    lines = code.splitlines()
+    references = []
+    for line in sorted(parsed["directive_lines"]):
+        match = INCLUDE_RE.match(lines[line - 1])
+        if match:
+            references.append({"name": match.group(1), "kind": "import", "line": line, "scope": "<module>"})
+    if parsed["tree"] is not None:
+        scopes = line_scopes(definitions, len(lines))
+        visitor = CallVisitor()
+        visitor.visit(parsed["tree"])
+        references.extend({"name": name, "kind": "call", "line": line, "scope": scopes[line]}
+                          for line, name in visitor.calls)
+    references.sort(key=lambda r: r["line"])
+    return {"definitions": definitions, "references": references}
+
+# Usage: python -m src.c_chunker file.c [file.h ...]
+if __name__ == "__main__":
+    import sys
+    import time
+
+    total_chunks, start = 0, time.perf_counter()
+    for path in sys.argv[1:]:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            file_chunks = chunk_c_code(f.read(), path)
+        total_chunks += len(file_chunks)
+        print(f"{path}: {len(file_chunks)} chunks")
+    print(f"{len(sys.argv) - 1} files, {total_chunks} chunks in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,275 @@
+# src/chat_pipeline.py
+import os
+import json
+import time
+import logging
+import threading
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.prompts import format_document
+from langchain.chains.conversational_retrieval.base import _get_chat_history
+from src.metrics import record_stage, LLM_CALLS, LLM_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# "fast": condense only follow-ups, answer with one LLM call and update memory after responding;
+# "chain": run the ConversationalRetrievalChain as is
+CHAT_PIPELINE = os.environ.get("CHAT_PIPELINE", "fast")
+# "window": the last CHAT_MEMORY_WINDOW exchanges; "token_buffer": the newest messages within
+# CHAT_MEMORY_MAX_TOKENS (counted by the LLM's tokenizer); "summary": an LLM-written running summary
+CHAT_MEMORY = os.environ.get("CHAT_MEMORY", "window")
+CHAT_MEMORY_WINDOW = int(os.environ.get("CHAT_MEMORY_WINDOW", "4"))
+CHAT_MEMORY_MAX_TOKENS = int(os.environ.get("CHAT_MEMORY_MAX_TOKENS", "1000"))
+
+def token_usage(response):
+    """(input, output) token counts reported in an LLMResult, or None if the provider reported none."""
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (response.llm_output or {}).get("token_usage")
+    if usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return None
+
+class LLMCallStats(BaseCallbackHandler):
+    """
+    Counts LLM calls and their total latency; attach to an LLM through its callbacks.
+    Calls are also recorded in the app metrics and the current request's trace.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._started[run_id] = time.perf_counter()
+
+    def _finish(self, run_id, failed, usage=None):
+        started = self._started.pop(run_id, None)
+        seconds = time.perf_counter() - started if started is not None else 0.0
+        with self._lock:
+            self.calls += 1
+            self.errors += failed
+            self.seconds += seconds
+        LLM_CALLS.inc(status="error" if failed else "ok")
+        if usage is not None:
+            LLM_TOKENS.inc(usage[0], direction="input")
+            LLM_TOKENS.inc(usage[1], direction="output")
+        extra = {"input_tokens": usage[0], "output_tokens": usage[1]} if usage is not None else {}
+        record_stage("llm", seconds, **extra)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, False, token_usage(response))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, True)
+
+    def snapshot(self):
+        with self._lock:
+            return {"calls": self.calls, "errors": self.errors, "seconds": self.seconds}
+
+# Process-wide counters for every LLM created by the app
+llm_stats = LLMCallStats()
+
+def build_memory(llm, kind=CHAT_MEMORY):
+    from langchain.memory import (ConversationBufferWindowMemory, ConversationSummaryMemory,
+                                  ConversationTokenBufferMemory)
+
+    common = {"memory_key": "chat_history", "return_messages": True}
+    if kind == "window":
+        return ConversationBufferWindowMemory(k=CHAT_MEMORY_WINDOW, **common)
+    if kind == "token_buffer":
+        return ConversationTokenBufferMemory(llm=llm, max_token_limit=CHAT_MEMORY_MAX_TOKENS, **common)
+    if kind == "summary":
+        return ConversationSummaryMemory(llm=llm, **common)
+    raise ValueError(f"Unknown chat memory {kind!r}; expected window, token_buffer or summary.")
+
+def make_chain(llm, retriever, prompt_template, memory_kind=CHAT_MEMORY):
+    """A ConversationalRetrievalChain answering with `prompt_template` (with {context} and {question})."""
+    from langchain.chains import ConversationalRetrievalChain
+    from langchain_core.prompts import PromptTemplate
+
+    return ConversationalRetrievalChain.from_llm(
+        llm,
+        retriever=retriever,
+        memory=build_memory(llm, memory_kind),
+        combine_docs_chain_kwargs={"prompt": PromptTemplate(
+            template=prompt_template,
+            input_variables=["context", "question"]
+        )}
+    )
+
+# Memory updates still running, by id of the session's memory object
+_pending_updates = {}
+_pending_lock = threading.Lock()
+
+def has_history(qa):
+    """Whether the chain's session has exchanged any messages yet (counting an update still in progress)."""
+    with _pending_lock:
+        if id(qa.memory) in _pending_updates:
+            return True
+    return bool(qa.memory.chat_memory.messages)
+
+def wait_for_memory(qa):
+    """Blocks until the session's background memory updates have finished."""
+    with _pending_lock:
+        thread = _pending_updates.get(id(qa.memory))
+    if thread is not None:
+        thread.join()
+
+def remember_in_background(qa, question, answer):
+    """
+    Records an exchange in the session memory on a background thread, so a summary LLM call never
+    delays the response. Updates of one session are applied in order.
+    """
+    memory, key = qa.memory, id(qa.memory)
+
+    def update(previous):
+        if previous is not None:
+            previous.join()
+        try:
+            memory.save_context({"question": question}, {"answer": answer})
+        except Exception:
+            logger.exception("Updating chat memory failed")
+        finally:
+            with _pending_lock:
+                if _pending_updates.get(key) is threading.current_thread():
+                    del _pending_updates[key]
+
+    with _pending_lock:
+        thread = threading.Thread(target=update, args=(_pending_updates.get(key),), daemon=True)
+        _pending_updates[key] = thread
+        thread.start()
+    return thread
+
+def condense_question(qa, question):
+    """Rewrites a follow-up question into a standalone one using the chain's chat history."""
+    wait_for_memory(qa)
+    # Without history the question is already standalone (summary memory would still return an empty summary)
+    if not has_history(qa):
+        return question
+    chat_history = qa.memory.load_memory_variables({})[qa.memory.memory_key]
+    get_chat_history = qa.get_chat_history or _get_chat_history
+    return qa.question_generator.invoke({
+        "question": question,
+        "chat_history": get_chat_history(chat_history),
+    })[qa.question_generator.output_key]
+
+def build_answer_prompt(qa, question, docs):
+    """Formats retrieved documents into the chain's answer prompt, as its stuff-documents step would."""
+    combine_chain = qa.combine_docs_chain
+    context = combine_chain.document_separator.join(
+        format_document(doc, combine_chain.document_prompt) for doc in docs
+    )
+    return combine_chain.llm_chain.prompt.format_prompt(**{
+        combine_chain.document_variable_name: context,
+        "question": question,
+    })
+
+def iter_answer_tokens(qa, question):
+    """
+    Runs the same steps as a ConversationalRetrievalChain (condense, retrieve, answer, update memory)
+    but yields answer tokens as the LLM produces them. The memory is updated in the background after the last token.
+    """
+    standalone_question = condense_question(qa, question)
+    docs = qa.retriever.invoke(standalone_question)
+    prompt = build_answer_prompt(qa, standalone_question, docs)
+    answer = []
+    for chunk in qa.combine_docs_chain.llm_chain.llm.stream(prompt):
+        token = chunk.content if hasattr(chunk, "content") else str(chunk)
+        if token:
+            answer.append(token)
+            yield token
+    remember_in_background(qa, question, "".join(answer))
+
+def answer_question(qa, question):
+    """
+    The non-streaming "fast" pipeline: at most one condense call (only for follow-ups) and one answer
+    call before returning; the memory update, and any summary call it makes, runs afterwards.
+    """
+    standalone_question = condense_question(qa, question)
+    docs = qa.retriever.invoke(standalone_question)
+    prompt = build_answer_prompt(qa, standalone_question, docs)
+    message = qa.combine_docs_chain.llm_chain.llm.invoke(prompt)
+    answer = message.content if hasattr(message, "content") else str(message)
+    remember_in_background(qa, question, answer)
+    return {"question": question, "answer": answer}
+
+def run_chat(qa, question, pipeline=CHAT_PIPELINE):
+    """Answers one chat message with the configured pipeline; returns a dict with "answer"."""
+    if pipeline == "chain":
+        return qa.invoke({"question": question})
+    return answer_question(qa, question)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def iter_sse_answer(qa, question, on_answer=None, done_extra=None):
+    """
+    Server-Sent Events stream: one `token` event per token, then `done` with the full answer.
+    `on_answer` is called with the complete answer before `done` is sent, and `done_extra` is merged into it.
+    """
+    answer = []
+    try:
+        for token in iter_answer_tokens(qa, question):
+            answer.append(token)
+            yield sse_event("token", {"token": token})
+        if on_answer is not None:
+            on_answer("".join(answer))
+        yield sse_event("done", dict({"response": "".join(answer), "type": "answer"}, **(done_extra or {})))
+    except Exception as e:
+        logger.exception("Streaming chat failed")
+        yield sse_event("error", {"response": f"Error processing chat: {str(e)}", "type": "error"})
+
+def iter_sse_cached(answer, cache_info):
+    """The stream for a cached answer: the whole answer as a single `token` event, then `done`."""
+    yield sse_event("token", {"token": answer})
+    yield sse_event("done", {"response": answer, "type": "answer", "cache": cache_info})
+
+# Usage: python -m src.chat_pipeline [messages]
+# LLM calls per message and response latency of each pipeline/memory combination, against the fake LLM.
+if __name__ == "__main__":
+    import sys
+    from langchain_core.documents import Document
+    from langchain_core.retrievers import BaseRetriever
+    from src.fake_llm import load_fake_llm, FAKE_LLM_CALL_DELAY
+
+    class StaticRetriever(BaseRetriever):
+        docs: list
+
+        def _get_relevant_documents(self, query, *, run_manager=None):
+            return self.docs
+
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    # Without a simulated round trip every pipeline would look instant
+    call_delay = FAKE_LLM_CALL_DELAY or 0.2
+    retriever = StaticRetriever(docs=[Document(page_content="def load_repo(path):\n    return path")])
+    results = {}
+    for pipeline, memory_kind in (("chain", "summary"), ("fast", "summary"), ("fast", "window")):
+        stats = LLMCallStats()
+        llm = load_fake_llm(call_delay=call_delay)
+        llm.callbacks = [stats]
+        qa = make_chain(llm, retriever, "Context:\n{context}\n\nQuestion:\n{question}", memory_kind)
+        latencies, calls, calls_before_response = [], [], []
+        for i in range(messages):
+            before = stats.calls
+            started = time.perf_counter()
+            run_chat(qa, f"Question {i} about load_repo?", pipeline)
+            latencies.append(time.perf_counter() - started)
+            calls_before_response.append(stats.calls - before)
+            wait_for_memory(qa)
+            calls.append(stats.calls - before)
+        results[f"{pipeline}/{memory_kind}"] = {
+            "llm_calls_per_message": calls,
+            "llm_calls_before_response": calls_before_response,
+            "mean_latency_ms": round(1000 * sum(latencies) / len(latencies), 1),
+            "max_latency_ms": round(1000 * max(latencies), 1),
+        }
+    print(json.dumps({"messages": messages, "fake_llm_call_delay": call_delay, "results": results}, indent=2))
@@ -0,0 +1,133 @@
+# src/chunk_sizing.py
+import os
+import re
+import math
+import logging
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# Word-pieces the embedding model reads per input (sentence-transformers' max_seq_length);
+# anything beyond is truncated, [CLS] and [SEP] included
+EMBEDDING_MAX_SEQ_LENGTH = int(os.environ.get("EMBEDDING_MAX_SEQ_LENGTH", "256"))
+CHUNK_MAX_TOKENS = int(os.environ.get("CHUNK_MAX_TOKENS", str(EMBEDDING_MAX_SEQ_LENGTH - 2)))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", "32"))
+
+# Lines after which a split reads naturally: blank lines and ends of statements or blocks
+BOUNDARY_LINE_RE = re.compile(r"^\s*$|[;{}:,)\]]\s*$")
+# Rough word-piece estimate for code when the tokenizer cannot be loaded
+FALLBACK_CHARS_PER_TOKEN = 3
+
+@lru_cache(maxsize=1)
+def get_tokenizer(model_name=EMBEDDING_MODEL):
+    """The embedding model's tokenizer, loaded once per process; None if it is not available."""
+    try:
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(model_name)
+    except Exception as e:
+        logger.warning(f"Could not load the {model_name} tokenizer ({e}); estimating token counts from length")
+        return None
+
+def count_tokens(texts):
+    """Word-piece counts (without special tokens) for a list of texts."""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return [math.ceil(len(text) / FALLBACK_CHARS_PER_TOKEN) for text in texts]
+    if not texts:
+        return []
+    return [len(ids) for ids in tokenizer(list(texts), add_special_tokens=False)["input_ids"]]
+
+def _split_long_line(line, tokens, max_tokens):
+    # A single line over budget is cut into equal character slices
+    pieces = math.ceil(tokens / max_tokens)
+    size = math.ceil(len(line) / pieces)
+    return [line[i:i + size] for i in range(0, len(line), size)]
+
+def split_chunk(chunk_code, metadata, max_tokens=None, overlap_tokens=None):
+    """
+    Splits a chunk that exceeds the embedding model's token budget into pieces on line boundaries,
+    preferring to cut after blank lines and statement or block ends. Pieces overlap by up to
+    `overlap_tokens` tokens of whole lines and get their own start/end lines and a "split" number.
+    Every returned chunk records its token count in metadata["tokens"].
+    """
+    max_tokens = max_tokens or CHUNK_MAX_TOKENS
+    overlap_tokens = CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    lines = chunk_code.split("\n")
+    line_tokens = count_tokens(lines)
+    # A newline adds no word-pieces, so the chunk's count is the sum over its lines
+    total = sum(line_tokens)
+    if total <= max_tokens:
+        return [{"content": chunk_code, "metadata": dict(metadata, tokens=total)}]
+
+    first_line = metadata.get("start_line") or 1
+    units = []
+    for offset, (line, tokens) in enumerate(zip(lines, line_tokens)):
+        if tokens > max_tokens:
+            parts = _split_long_line(line, tokens, max_tokens)
+            units.extend((offset, part, tokens_part, False)
+                         for part, tokens_part in zip(parts, count_tokens(parts)))
+        else:
+            units.append((offset, line, tokens, bool(BOUNDARY_LINE_RE.search(line))))
+
+    chunks = []
+    start = 0
+    while start < len(units):
+        end, used, cut = start, 0, None
+        while end < len(units) and used + units[end][2] <= max_tokens:
+            used += units[end][2]
+            if units[end][3]:
+                cut = end + 1
+            end += 1
+        end = max(end, start + 1)
+        # Cut at the last natural boundary unless that would leave the piece less than half full
+        if end < len(units) and cut is not None and cut > start \
+                and sum(unit[2] for unit in units[start:cut]) * 2 >= max_tokens:
+            end = cut
+        piece = units[start:end]
+        sub_metadata = dict(metadata, split=str(len(chunks) + 1), tokens=sum(unit[2] for unit in piece),
+                            start_line=first_line + piece[0][0], end_line=first_line + piece[-1][0])
+        chunks.append({"content": "\n".join(unit[1] for unit in piece), "metadata": sub_metadata})
+        if end >= len(units):
+            break
+        # Step back over whole trailing lines for overlap, always making progress
+        next_start, overlap = end, 0
+        while next_start - 1 > start and overlap + units[next_start - 1][2] <= overlap_tokens:
+            next_start -= 1
+            overlap += units[next_start][2]
+        start = next_start
+    return chunks
+
+def truncation_report(token_counts, max_tokens=None):
+    """How many of the given chunks' tokens fall past the model's input limit and are never embedded."""
+    max_tokens = max_tokens or EMBEDDING_MAX_SEQ_LENGTH - 2
+    total = sum(token_counts)
+    truncated = sum(max(0, tokens - max_tokens) for tokens in token_counts)
+    return {
+        "chunks": len(token_counts),
+        "chunks_truncated": sum(1 for tokens in token_counts if tokens > max_tokens),
+        "tokens": total,
+        "truncated_tokens": truncated,
+        "truncated_fraction": round(truncated / total, 4) if total else 0.0,
+    }
+
+def char_windows(chunk_code, max_chunk_size=1800, overlap=200):
+    """The previous fixed character windows, kept for comparison reports."""
+    return [chunk_code[i:i + max_chunk_size] for i in range(0, len(chunk_code), max_chunk_size - overlap)]
+
+# Usage: python -m src.chunk_sizing <repo_path>
+# Compares embedding truncation of 1800-character windows with token-budgeted chunks.
+if __name__ == "__main__":
+    import sys
+    import json
+    from src.helper import list_repo_files, load_and_chunk_file
+
+    before, after = [], []
+    for file_path in list_repo_files(sys.argv[1]):
+        # An effectively unlimited budget yields whole functions/classes, which the old code char-split
+        whole_chunks, _ = load_and_chunk_file(file_path, max_tokens=10 ** 9)
+        for chunk in whole_chunks:
+            before.extend(count_tokens(char_windows(chunk["content"])))
+        after.extend(chunk["metadata"]["tokens"] for chunk in load_and_chunk_file(file_path)[0])
+    print(json.dumps({"before_char_windows": truncation_report(before),
+                      "after_token_budget": truncation_report(after)}, indent=2))
@@ -0,0 +1,136 @@
+# src/context_assembler.py
+import os
+import time
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.chunk_sizing import count_tokens, split_chunk
+from src.metrics import record_stage, CONTEXT_TOKENS
+
+# Tokens of retrieved code (headers included) put into the answer prompt
+CONTEXT_MAX_TOKENS = int(os.environ.get("CONTEXT_MAX_TOKENS", "3000"))
+
+def _file_of(doc):
+    # Chunk ids are "<path relative to the repository>#<n>"; older indexes only have the checkout path
+    chunk_id = doc.metadata.get("chunk_id")
+    if chunk_id and "#" in chunk_id:
+        return chunk_id.rsplit("#", 1)[0]
+    return doc.metadata.get("file") or doc.metadata.get("source") or "unknown"
+
+def _doc_tokens(doc):
+    tokens = doc.metadata.get("tokens")
+    return tokens if tokens is not None else count_tokens([doc.page_content])[0]
+
+def _aligned_lines(doc):
+    """The chunk's lines keyed by line number, if its content maps one-to-one onto its line span."""
+    start_line, end_line = doc.metadata.get("start_line"), doc.metadata.get("end_line")
+    lines = doc.page_content.split("\n")
+    if not start_line or not end_line or end_line - start_line + 1 != len(lines):
+        return None
+    return {start_line + offset: line for offset, line in enumerate(lines)}
+
+def _block(file, start_line, end_line, text, rank, chunk_ids):
+    header = f"File: {file}, lines {start_line}-{end_line}" if start_line else f"File: {file}"
+    return {"file": file, "start_line": start_line or 0, "end_line": end_line or 0, "header": header,
+            "text": text, "rank": rank, "chunk_ids": chunk_ids}
+
+def merge_chunks(docs):
+    """
+    Merges retrieved chunks that overlap or touch in the same file into one block of contiguous lines,
+    and drops duplicates. Chunks whose overlapping lines differ are not the same code and stay separate.
+    Each block keeps the best (lowest) retrieval rank of its chunks.
+    """
+    by_file, blocks, seen = {}, [], set()
+    for rank, doc in enumerate(docs):
+        file = _file_of(doc)
+        if (file, doc.page_content) in seen:
+            continue
+        seen.add((file, doc.page_content))
+        lines = _aligned_lines(doc)
+        if lines is None:
+            # Content that does not map onto its line span (e.g. trimmed outlines) is kept as is
+            blocks.append(_block(file, doc.metadata.get("start_line"), doc.metadata.get("end_line"),
+                                 doc.page_content, rank, [doc.metadata.get("chunk_id")]))
+            continue
+        by_file.setdefault(file, []).append((min(lines), max(lines), lines, rank, doc.metadata.get("chunk_id")))
+
+    for file, items in by_file.items():
+        items.sort(key=lambda item: item[0])
+        current = None
+        for start_line, end_line, lines, rank, chunk_id in items:
+            if current is not None and start_line <= current["end_line"] + 1 and \
+                    all(current["lines"].get(line_no, line) == line for line_no, line in lines.items()):
+                for line_no, line in lines.items():
+                    current["lines"].setdefault(line_no, line)
+                current["end_line"] = max(current["end_line"], end_line)
+                current["rank"] = min(current["rank"], rank)
+                current["chunk_ids"].append(chunk_id)
+                continue
+            if current is not None:
+                blocks.append(current)
+            current = {"file": file, "start_line": start_line, "end_line": end_line, "lines": dict(lines),
+                       "rank": rank, "chunk_ids": [chunk_id]}
+        blocks.append(current)
+
+    merged = []
+    for block in blocks:
+        if "lines" in block:
+            text = "\n".join(block["lines"][line_no] for line_no in range(block["start_line"], block["end_line"] + 1))
+            block = _block(block["file"], block["start_line"], block["end_line"], text, block["rank"],
+                           block["chunk_ids"])
+        merged.append(block)
+    return merged
+
+def assemble_context(docs, max_tokens=None):
+    """
+    Turns retrieved chunks into the prompt context: merged, de-duplicated blocks with file:line headers,
+    chosen by retrieval rank until `max_tokens` is used and then ordered by file and line.
+    Returns (blocks, report) where the report compares token counts before and after.
+    """
+    max_tokens = max_tokens or CONTEXT_MAX_TOKENS
+    blocks = merge_chunks(docs)
+    token_counts = count_tokens([block["header"] + "\n" + block["text"] for block in blocks])
+    chosen, used = [], 0
+    for block, tokens in sorted(zip(blocks, token_counts), key=lambda pair: pair[0]["rank"]):
+        if used + tokens <= max_tokens:
+            chosen.append(block)
+            used += tokens
+        elif not chosen:
+            # The best block alone exceeds the budget: keep its leading lines
+            block_header_tokens = count_tokens([block["header"]])[0]
+            piece = split_chunk(block["text"], {}, max(1, max_tokens - block_header_tokens), 0)[0]
+            block = dict(block, text=piece["content"])
+            chosen.append(block)
+            used += block_header_tokens + piece["metadata"]["tokens"]
+    chosen.sort(key=lambda block: (block["file"], block["start_line"]))
+    header_tokens = sum(count_tokens([block["header"] for block in chosen]))
+    report = {
+        "chunks": len(docs),
+        "blocks": len(chosen),
+        "blocks_dropped": len(blocks) - len(chosen),
+        "tokens_before": sum(_doc_tokens(doc) for doc in docs),
+        "tokens_after": used,
+        # Part of tokens_after spent on the file:line headers
+        "header_tokens": header_tokens,
+    }
+    return chosen, report
+
+class ContextAssemblingRetriever(BaseRetriever):
+    """
+    Wraps a retriever so the chain receives assembled context blocks instead of raw chunks:
+    one Document per block, its page content prefixed with a file:line header.
+    """
+
+    retriever: BaseRetriever
+    max_tokens: int = CONTEXT_MAX_TOKENS
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        docs = self.retriever.invoke(query)
+        started = time.perf_counter()
+        blocks, report = assemble_context(docs, self.max_tokens)
+        record_stage("context_assembly", time.perf_counter() - started, **report)
+        CONTEXT_TOKENS.inc(report["tokens_before"], stage="retrieved")
+        CONTEXT_TOKENS.inc(report["tokens_after"], stage="assembled")
+        return [Document(page_content=block["header"] + "\n" + block["text"],
+                         metadata={"file": block["file"], "start_line": block["start_line"],
+                                   "end_line": block["end_line"], "chunk_ids": block["chunk_ids"]})
+                for block in blocks]
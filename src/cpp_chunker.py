@@ -0,0 +1,208 @@
+# src/cpp_chunker.py
+import os
+import json
+import shlex
+import hashlib
+import logging
+from functools import lru_cache
+from src.chunk_sizing import CHUNK_MAX_TOKENS, count_tokens, split_chunk
+
+logger = logging.getLogger(__name__)
+
+# Flags used when no compile_commands.json covers a file
+CPP_COMPILE_FLAGS = shlex.split(os.environ.get("CPP_COMPILE_FLAGS", "-x c++ -std=c++17"))
+# Parsed definitions/references keyed by file content and flags, shared by all repositories.
+# Each entry records the files it included, and is re-parsed once one of them changes.
+CPP_PARSE_CACHE_DIR = os.environ.get("CPP_PARSE_CACHE_DIR", os.path.join("db", "_parse_cache"))
+PARSE_CACHE_VERSION = 2
+# Bumped whenever chunk boundaries or metadata change, so indexed C++ files are re-chunked
+CHUNKER_VERSION = 1
+
+_index = None
+
+def get_index():
+    """One libclang index per process, reused for every file that process parses."""
+    global _index
+    if _index is None:
+        import clang.cindex
+        _index = clang.cindex.Index.create()
+    return _index
+
+@lru_cache(maxsize=256)
+def find_compilation_database(directory):
+    """Nearest compile_commands.json (in a directory or its build/) between `directory` and the git root."""
+    import clang.cindex
+
+    while True:
+        for candidate in (directory, os.path.join(directory, "build")):
+            if os.path.isfile(os.path.join(candidate, "compile_commands.json")):
+                try:
+                    return clang.cindex.CompilationDatabase.fromDirectory(candidate)
+                except clang.cindex.CompilationDatabaseError as e:
+                    logger.warning(f"Ignoring unreadable compile database in {candidate}: {e}")
+                    return None
+        parent = os.path.dirname(directory)
+        if parent == directory or os.path.isdir(os.path.join(directory, ".git")):
+            return None
+        directory = parent
+
+def compile_args(file_path):
+    """Arguments for parsing a file: its compile database entry if there is one, else CPP_COMPILE_FLAGS."""
+    file_path = os.path.abspath(file_path)
+    database = find_compilation_database(os.path.dirname(file_path))
+    commands = database.getCompileCommands(file_path) if database is not None else None
+    if not commands:
+        return list(CPP_COMPILE_FLAGS)
+    command = next(iter(commands))
+    args, skip_next = [f"-working-directory={command.directory}"], False
+    # Drop the compiler, the input file and output options
+    for arg in list(command.arguments)[1:]:
+        if skip_next:
+            skip_next = False
+        elif arg in ("-c", "-o"):
+            skip_next = arg == "-o"
+        elif arg.startswith("-o") or os.path.abspath(os.path.join(command.directory, arg)) == file_path:
+            continue
+        else:
+            args.append(arg)
+    return args
+
+def _walk(tu):
+    import clang.cindex
+
+    kinds = clang.cindex.CursorKind
+    class_kinds = (kinds.CLASS_DECL, kinds.STRUCT_DECL, kinds.CLASS_TEMPLATE, kinds.UNION_DECL, kinds.ENUM_DECL)
+    function_kinds = (kinds.FUNCTION_DECL, kinds.FUNCTION_TEMPLATE)
+    method_kinds = (kinds.CXX_METHOD, kinds.CONSTRUCTOR, kinds.DESTRUCTOR)
+    main_file = tu.spelling
+    definitions, references = [], []
+
+    def walk(cursor, scope):
+        for child in cursor.get_children():
+            # Cursors from included headers are skipped without descending into them
+            location_file = child.location.file
+            if location_file is None or location_file.name != main_file:
+                continue
+            kind = child.kind
+            if kind == kinds.INCLUSION_DIRECTIVE:
+                references.append({"name": child.spelling, "kind": "import", "line": child.location.line,
+                                   "scope": "::".join(scope) or "<module>"})
+                continue
+            if kind == kinds.CALL_EXPR and child.spelling:
+                references.append({"name": child.spelling, "kind": "call", "line": child.location.line,
+                                   "scope": "::".join(scope) or "<module>"})
+            if kind in class_kinds + function_kinds + method_kinds and child.spelling and child.is_definition():
+                definitions.append({
+                    "name": child.spelling, "qualname": "::".join(scope + [child.spelling]),
+                    "kind": "class" if kind in class_kinds else "method" if kind in method_kinds else "function",
+                    "type": kind.name, "start_line": child.extent.start.line, "end_line": child.extent.end.line,
+                })
+                walk(child, scope + [child.spelling])
+            elif kind == kinds.NAMESPACE:
+                walk(child, scope + [child.spelling])
+            else:
+                walk(child, scope)
+
+    walk(tu.cursor, [])
+    return {"definitions": definitions, "references": references}
+
+def _include_stamps(tu):
+    # (path, mtime, size) of every file the translation unit included, directly or not
+    stamps = {}
+    for include in tu.get_includes():
+        path = include.include.name
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        stamps[path] = [path, stat.st_mtime_ns, stat.st_size]
+    return sorted(stamps.values())
+
+def _includes_unchanged(stamps):
+    for path, mtime_ns, size in stamps:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if (stat.st_mtime_ns, stat.st_size) != (mtime_ns, size):
+            return False
+    return True
+
+def analyze_cpp_file(file_path, code=None):
+    """
+    Definitions (with line extents and cursor type) and references (calls, includes) in a C++ file.
+    Results are cached on disk by file content and compile arguments, and reused while none of the
+    included headers has changed (by modification time and size). A header newly shadowing another
+    on the include path is not noticed until the file or its flags change.
+    """
+    import clang.cindex
+
+    if code is None:
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            code = f.read()
+    args = compile_args(file_path)
+    key = hashlib.sha1(json.dumps([PARSE_CACHE_VERSION, args, code]).encode("utf-8")).hexdigest()
+    cache_path = os.path.join(CPP_PARSE_CACHE_DIR, key[:2], key + ".json")
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        if _includes_unchanged(entry["includes"]):
+            return entry["result"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    # Header cursors are skipped by the walk; their function bodies are still parsed, since skipping
+    # them (LimitSkipFunctionBodiesToPreamble) needs a precompiled preamble that costs more to build
+    # than it saves on a single parse
+    tu = get_index().parse(file_path, args=args, unsaved_files=[(file_path, code)],
+                           options=clang.cindex.TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD)
+    result = _walk(tu)
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"includes": _include_stamps(tu), "result": result}, f)
+    os.replace(tmp_path, cache_path)
+    return result
+
+def chunk_cpp_code(code, file_path, max_tokens=None, overlap_tokens=None):
+    """
+    Chunks a C++ file into one chunk per class/struct and per function or method defined outside one.
+    A class too large for one chunk is emitted as its methods plus the remaining class outline.
+    """
+    definitions = analyze_cpp_file(file_path, code)["definitions"]
+    max_tokens = max_tokens or CHUNK_MAX_TOKENS
+    line_starts = [0]
+    for line in code.splitlines(keepends=True):
+        line_starts.append(line_starts[-1] + len(line))
+
+    def text(start_line, end_line):
+        return code[line_starts[start_line - 1]:line_starts[min(end_line, len(line_starts) - 1)]]
+
+    chunks, emitted, outlined = [], [], []
+    for definition in sorted(definitions, key=lambda d: (d["start_line"], -d["end_line"])):
+        start_line, end_line = definition["start_line"], definition["end_line"]
+        if any(start <= start_line and end_line <= end for start, end in emitted):
+            continue
+        chunk_code = text(start_line, end_line).strip()
+        has_members = any(start_line <= d["start_line"] and d["end_line"] <= end_line and d is not definition
+                          for d in definitions)
+        if definition["kind"] == "class" and has_members and count_tokens([chunk_code])[0] > max_tokens:
+            outlined.append(definition)
+            continue
+        emitted.append((start_line, end_line))
+        metadata = {"type": definition["type"], "name": definition["name"], "file": file_path,
+                    "start_line": start_line, "end_line": end_line}
+        chunks.extend(split_chunk(chunk_code, metadata, max_tokens, overlap_tokens))
+
+    for definition in outlined:
+        start_line, end_line = definition["start_line"], definition["end_line"]
+        members = [(start, end) for start, end in emitted if start_line <= start and end <= end_line]
+        outline = "".join(text(line, line) for line in range(start_line, end_line + 1)
+                          if not any(start <= line <= end for start, end in members)).strip()
+        metadata = {"type": definition["type"], "name": definition["name"], "file": file_path,
+                    "start_line": start_line, "end_line": end_line}
+        chunks.extend(split_chunk(outline, metadata, max_tokens, overlap_tokens))
+
+    chunks.sort(key=lambda chunk: chunk["metadata"]["start_line"])
+    return chunks
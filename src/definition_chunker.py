@@ -0,0 +1,122 @@
+# src/definition_chunker.py
+import re
+import threading
+from src.chunk_sizing import CHUNK_MAX_TOKENS, count_tokens, split_chunk
+
+# Lines that are (part of) a comment; comments directly above a definition belong to it
+COMMENT_LINE_RE = re.compile(r"^\s*(//|/\*|\*)")
+MAX_GROUP_NAMES = 10
+
+# The last parse on each thread, shared by a file's chunker and symbol extractor
+_last_parse = threading.local()
+
+def parse_once(key, parse):
+    """
+    Returns parse(), or the result (or exception) of the previous call on this thread if it had the same
+    key, so the chunker and the symbol extractor of a file run a single parse.
+    """
+    entry = getattr(_last_parse, "entry", None)
+    if entry is None or entry[0] != key:
+        try:
+            entry = (key, parse(), None)
+        except Exception as e:
+            entry = (key, None, e)
+        _last_parse.entry = entry
+    if entry[2] is not None:
+        raise entry[2]
+    return entry[1]
+
+def definition(node_type, name, start_line, end_line, members=None):
+    """
+    An item found by a language parser. Items with type "Declarations" (imports, fields, top-level
+    statements) are grouped into runs; other items are definitions. `members` are the nested definitions
+    a definition is broken into when it does not fit in one chunk.
+    """
+    return {"type": node_type, "name": name, "start_line": start_line, "end_line": end_line,
+            "members": members or []}
+
+def chunk_definitions(code, items, file_path, max_tokens=None, overlap_tokens=None):
+    """
+    Chunks a file from its parsed top-level items (in source order, with 1-based line spans): one chunk per
+    definition, and one chunk per run of consecutive declarations grown up to the token budget. A definition
+    too large for one chunk that has members is emitted as its members plus an outline of its other lines.
+    """
+    lines = code.splitlines()
+    max_tokens = max_tokens or CHUNK_MAX_TOKENS
+    token_prefix = [0]
+    for tokens in count_tokens(lines):
+        token_prefix.append(token_prefix[-1] + tokens)
+    chunks = []
+
+    def emit(text, node_type, name, start_line, end_line):
+        metadata = {"type": node_type, "name": name, "file": file_path,
+                    "start_line": start_line, "end_line": end_line}
+        chunks.extend(split_chunk(text, metadata, max_tokens, overlap_tokens))
+
+    def emit_items(items, floor):
+        # Returns the line spans emitted, so a container's outline can leave them out
+        spans, group, previous_end = [], None, floor
+
+        def flush():
+            if group is not None:
+                start_line, end_line, names = group
+                emit("\n".join(lines[start_line - 1:end_line]), "Declarations",
+                     ", ".join(list(dict.fromkeys(n for n in names if n))[:MAX_GROUP_NAMES]), start_line, end_line)
+                spans.append((start_line, end_line))
+
+        for item in items:
+            end_line = min(item["end_line"], len(lines))
+            if end_line <= previous_end:
+                continue
+            # Items sharing a line with the previous one start on the next line
+            start_line = max(item["start_line"], previous_end + 1)
+            while start_line > previous_end + 1 and COMMENT_LINE_RE.match(lines[start_line - 2]):
+                start_line -= 1
+            if item["type"] == "Declarations":
+                if group is not None and token_prefix[end_line] - token_prefix[group[0] - 1] <= max_tokens:
+                    group = (group[0], end_line, group[2] + [item["name"]])
+                else:
+                    flush()
+                    group = (start_line, end_line, [item["name"]])
+            else:
+                flush()
+                group = None
+                if item["members"] and token_prefix[end_line] - token_prefix[start_line - 1] > max_tokens:
+                    member_spans = emit_items(item["members"], start_line)
+                    outline = "\n".join(lines[line - 1] for line in range(start_line, end_line + 1)
+                                        if not any(start <= line <= end for start, end in member_spans)).strip()
+                    if outline:
+                        emit(outline, item["type"], item["name"], start_line, end_line)
+                else:
+                    emit("\n".join(lines[start_line - 1:end_line]), item["type"], item["name"], start_line, end_line)
+                spans.append((start_line, end_line))
+            previous_end = end_line
+        flush()
+        return spans
+
+    emit_items(items, 0)
+    chunks.sort(key=lambda chunk: chunk["metadata"]["start_line"])
+    return chunks
+
+def item_definitions(items, kinds):
+    """
+    Symbol index definitions for parsed items and their members. `kinds` maps item types to symbol kinds
+    (class/function/method); other items are left out, but not their members. Item names are qualified
+    with "." (`Outer.method`), and the last part is the definition's name.
+    """
+    definitions = []
+    for item in items:
+        if item["type"] in kinds and item["name"]:
+            definitions.append({"name": item["name"].rsplit(".", 1)[-1], "qualname": item["name"],
+                                "kind": kinds[item["type"]], "start_line": item["start_line"],
+                                "end_line": item["end_line"]})
+        definitions.extend(item_definitions(item["members"], kinds))
+    return definitions
+
+def line_scopes(definitions, line_count):
+    """Qualified name of the innermost definition spanning each line (index = line number), or "<module>"."""
+    scopes = ["<module>"] * (line_count + 2)
+    for d in sorted(definitions, key=lambda d: d["start_line"] - d["end_line"]):
+        start_line, end_line = d["start_line"], min(d["end_line"], line_count + 1)
+        scopes[start_line:end_line + 1] = [d["qualname"]] * (end_line - start_line + 1)
+    return scopes
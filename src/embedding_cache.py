@@ -0,0 +1,218 @@
+# src/embedding_cache.py
+import os
+import hashlib
+import logging
+import sqlite3
+import threading
+import numpy as np
+from contextlib import contextmanager
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_DIR = os.environ.get("EMBEDDING_CACHE_DIR", os.path.join("db", "_embedding_cache"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# SQLite's default limit on bound parameters per statement is 999
+_SQL_BATCH = 900
+
+class EmbeddingCache:
+    """
+    On-disk, content-addressed store of embedding vectors with LRU eviction.
+    Vectors live in a memory-mapped float16 array of `max_entries` rows; a small SQLite table maps
+    each key to its row and last-use tick. Once full, the least recently used rows are reused.
+    Several processes (e.g. uvicorn workers) can share one cache directory: every lookup and store
+    runs in an immediate SQLite transaction, so slots, the next free slot and the LRU clock are
+    allocated under SQLite's write lock and vectors are written while it is held.
+    """
+
+    def __init__(self, cache_dir=EMBEDDING_CACHE_DIR, max_entries=EMBEDDING_CACHE_MAX_ENTRIES, dtype="float16"):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.dtype = np.dtype(dtype)
+        self.dim = None
+        self._vectors = None
+        self._lock = threading.Lock()
+        # Transactions are managed explicitly (BEGIN IMMEDIATE); waits up to 30s for other processes
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False,
+                                   isolation_level=None, timeout=30)
+        with self._transaction():
+            self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used INTEGER NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            meta = self._meta()
+            if "next_slot" in meta and (int(meta.get("max_entries", -1)) != max_entries
+                                        or meta.get("dtype") != self.dtype.name):
+                logger.info(f"Embedding cache settings changed, resetting {cache_dir}")
+                self._reset()
+            elif "next_slot" not in meta:
+                # New cache, or one written before the slot counter was stored
+                self._reset()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _meta(self):
+        return dict(self._db.execute("SELECT name, value FROM meta"))
+
+    def _set_meta(self, **values):
+        self._db.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                             [(name, str(value)) for name, value in values.items()])
+
+    def _vectors_path(self):
+        return os.path.join(self.cache_dir, "vectors.bin")
+
+    def _reset(self):
+        self._db.execute("DELETE FROM entries")
+        self._db.execute("DELETE FROM meta")
+        if os.path.exists(self._vectors_path()):
+            os.remove(self._vectors_path())
+        self._set_meta(max_entries=self.max_entries, dtype=self.dtype.name, next_slot=0, clock=0)
+        self.dim = None
+        self._vectors = None
+
+    def _attach_vectors(self, meta, dim=None):
+        """Opens the vector file once some process has created it (or creates it for `dim`); inside a transaction."""
+        if self._vectors is not None:
+            return True
+        if "dim" in meta:
+            dim = int(meta["dim"])
+        elif dim is None:
+            return False
+        else:
+            self._set_meta(dim=dim)
+        mode = "r+" if os.path.exists(self._vectors_path()) else "w+"
+        self._vectors = np.memmap(self._vectors_path(), dtype=self.dtype, mode=mode, shape=(self.max_entries, dim))
+        self.dim = dim
+        return True
+
+    def _tick(self, meta):
+        clock = int(meta["clock"]) + 1
+        self._set_meta(clock=clock)
+        return clock
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def round(self, vector):
+        """A vector as it comes back from the cache (stored as `dtype`, returned as float32)."""
+        return np.asarray(vector, dtype=self.dtype).astype(np.float32)
+
+    def get_many(self, keys):
+        """Returns a dict of key -> float32 vector for every key present in the cache."""
+        found = {}
+        with self._transaction():
+            meta = self._meta()
+            if not self._attach_vectors(meta):
+                return found
+            for key, slot in self._select_slots(list(dict.fromkeys(keys))):
+                found[key] = np.asarray(self._vectors[slot], dtype=np.float32)
+            if found:
+                clock = self._tick(meta)
+                self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                     [(clock, key) for key in found])
+        return found
+
+    def put_many(self, items):
+        """Stores (key, vector) pairs, evicting the least recently used entries when full."""
+        items = list(dict(items).items())[-self.max_entries:]
+        if not items:
+            return
+        with self._transaction():
+            meta = self._meta()
+            self._attach_vectors(meta, len(items[0][1]))
+            # Keys are content addresses, so an existing row already holds the same vector
+            existing = {key for key, _ in self._select_slots([key for key, _ in items])}
+            new_items = [(key, vector) for key, vector in items if key not in existing]
+            if not new_items:
+                return
+            next_slot = int(meta["next_slot"])
+            fresh_slots = list(range(next_slot, min(next_slot + len(new_items), self.max_entries)))
+            slots = list(fresh_slots)
+            needed = len(new_items) - len(slots)
+            if needed > 0:
+                victims = self._db.execute(
+                    "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (needed,)
+                ).fetchall()
+                self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in victims])
+                slots.extend(slot for _, slot in victims)
+                self.evictions += len(victims)
+            clock = self._tick(meta)
+            self._set_meta(next_slot=next_slot + len(fresh_slots))
+            self._db.executemany("INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                                 [(key, slot, clock) for (key, _), slot in zip(new_items, slots)])
+            # Written while the write lock is held, so no other process is handed these slots meanwhile
+            for (key, vector), slot in zip(new_items, slots):
+                self._vectors[slot] = np.asarray(vector, dtype=self.dtype)
+            self._vectors.flush()
+
+    def _select_slots(self, keys):
+        rows = []
+        for i in range(0, len(keys), _SQL_BATCH):
+            batch = keys[i:i + _SQL_BATCH]
+            rows.extend(self._db.execute(
+                f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(batch))})", batch
+            ).fetchall())
+        return rows
+
+    def record_lookups(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def stats(self):
+        with self._lock:
+            counts = {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+        return dict(counts, entries=len(self))
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that looks up each document text in an EmbeddingCache (keyed by a hash of
+    the model name and text) and only runs the wrapped model on cache misses.
+    Queries are not cached since they are rarely repeated verbatim.
+    """
+
+    def __init__(self, embeddings, model_name, cache=None):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache if cache is not None else EmbeddingCache()
+
+    def cache_key(self, text):
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed_documents(self, texts):
+        keys = [self.cache_key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(computed.items())
+            # Rounded like cached vectors, so a text gets the same vector whether or not it was cached
+            cached.update((key, self.cache.round(vector)) for key, vector in computed.items())
+        hits = len(texts) - len(missing)
+        self.cache.record_lookups(hits, len(missing))
+        logger.info(f"Embedding cache: {hits} hits, {len(missing)} misses for {len(texts)} texts")
+        return [[float(x) for x in cached[key]] for key in keys]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+    def cache_stats(self):
+        return self.cache.stats()
@@ -0,0 +1,120 @@
+# src/embeddings.py
+import os
+import time
+import logging
+from langchain_core.embeddings import Embeddings
+from src.chunk_sizing import EMBEDDING_MODEL, EMBEDDING_MAX_SEQ_LENGTH
+
+logger = logging.getLogger(__name__)
+
+# torch: sentence-transformers on PyTorch; torch-int8: the same with dynamically quantized Linear layers;
+# onnx / onnx-int8: ONNX Runtime with the model's exported (or int8-quantized) graph
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+EMBEDDING_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+# Texts per forward pass, and intra-op threads (0 leaves the runtime default, usually the core count)
+EMBEDDING_ENCODE_BATCH_SIZE = int(os.environ.get("EMBEDDING_ENCODE_BATCH_SIZE", "64"))
+EMBEDDING_THREADS = int(os.environ.get("EMBEDDING_THREADS", "0"))
+# Quantized graph shipped in the model repository's onnx/ directory
+EMBEDDING_ONNX_INT8_FILE = os.environ.get("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+EMBEDDING_PRELOAD = os.environ.get("EMBEDDING_PRELOAD", "true").lower() == "true"
+
+def cache_model_name(model_name=EMBEDDING_MODEL, backend=EMBEDDING_BACKEND):
+    """Name the embedding cache is keyed by; quantized backends produce slightly different vectors."""
+    return model_name if backend in ("torch", "onnx") else f"{model_name}:{backend}"
+
+class LocalEmbeddings(Embeddings):
+    """
+    CPU sentence-transformers embeddings with a selectable runtime, batch size and thread count.
+    Produces the same (unnormalized) vectors as HuggingFaceEmbeddings for the torch and onnx backends.
+    """
+
+    def __init__(self, model_name=EMBEDDING_MODEL, backend=EMBEDDING_BACKEND,
+                 batch_size=EMBEDDING_ENCODE_BATCH_SIZE, threads=EMBEDDING_THREADS):
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {', '.join(EMBEDDING_BACKENDS)}.")
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = batch_size
+        self.threads = threads
+        started = time.perf_counter()
+        self.model = self._load()
+        self.model.max_seq_length = EMBEDDING_MAX_SEQ_LENGTH
+        logger.info(f"Loaded {model_name} ({backend}) in {time.perf_counter() - started:.1f}s")
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.backend.startswith("torch"):
+            import torch
+            if self.threads:
+                torch.set_num_threads(self.threads)
+            model = SentenceTransformer(self.model_name, device="cpu")
+            if self.backend == "torch-int8":
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            return model
+
+        import onnxruntime
+        session_options = onnxruntime.SessionOptions()
+        if self.threads:
+            session_options.intra_op_num_threads = self.threads
+        model_kwargs = {"provider": "CPUExecutionProvider", "session_options": session_options}
+        if self.backend == "onnx-int8":
+            model_kwargs["file_name"] = EMBEDDING_ONNX_INT8_FILE
+        return SentenceTransformer(self.model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        vectors = self.model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True,
+                                    show_progress_bar=False)
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+def benchmark_backends(texts, backends=EMBEDDING_BACKENDS, batch_size=EMBEDDING_ENCODE_BATCH_SIZE,
+                       threads=EMBEDDING_THREADS):
+    """Load time and chunks/sec of each backend on the same texts, with agreement against the first backend."""
+    import numpy as np
+
+    results, reference = {}, None
+    for backend in backends:
+        try:
+            started = time.perf_counter()
+            embeddings = LocalEmbeddings(backend=backend, batch_size=batch_size, threads=threads)
+            load_seconds = time.perf_counter() - started
+            embeddings.embed_documents(texts[:batch_size])  # warm-up
+            started = time.perf_counter()
+            vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+            seconds = time.perf_counter() - started
+        except Exception as e:
+            results[backend] = {"error": str(e)}
+            continue
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        if reference is None:
+            reference = normalized
+        results[backend] = {
+            "load_seconds": round(load_seconds, 2),
+            "seconds": round(seconds, 3),
+            "chunks_per_second": round(len(texts) / seconds, 1),
+            "mean_cosine_to_first": round(float((normalized * reference).sum(axis=1).mean()), 4),
+        }
+    return results
+
+# Usage: python -m src.embeddings <repo_path> [torch onnx ...]
+# Benchmarks the backends on the repository's chunks (the first EMBEDDING_BENCHMARK_CHUNKS of them).
+if __name__ == "__main__":
+    import sys
+    import json
+    from src.helper import list_repo_files, load_and_chunk_file
+
+    limit = int(os.environ.get("EMBEDDING_BENCHMARK_CHUNKS", "2000"))
+    texts = []
+    for file_path in list_repo_files(sys.argv[1]):
+        texts.extend(chunk["content"] for chunk in load_and_chunk_file(file_path)[0])
+        if len(texts) >= limit:
+            break
+    texts = texts[:limit]
+    print(json.dumps({"chunks": len(texts), "batch_size": EMBEDDING_ENCODE_BATCH_SIZE,
+                      "threads": EMBEDDING_THREADS or os.cpu_count(),
+                      "backends": benchmark_backends(texts, sys.argv[2:] or EMBEDDING_BACKENDS)}, indent=2))
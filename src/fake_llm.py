@@ -0,0 +1,27 @@
+# src/fake_llm.py
+import os
+import time
+
+# Seconds slept per streamed character, to mimic token latency
+FAKE_LLM_TOKEN_DELAY = float(os.environ.get("FAKE_LLM_TOKEN_DELAY", "0.005"))
+# Seconds slept per non-streamed call, to mimic a remote round trip
+FAKE_LLM_CALL_DELAY = float(os.environ.get("FAKE_LLM_CALL_DELAY", "0"))
+
+FAKE_LLM_RESPONSE = """## Overview
+This answer was produced by the local fake LLM.
+
+## Summary
+No remote model was called."""
+
+# Local stand-in for the Groq model, used when LLM_PROVIDER=fake (offline runs and testing)
+def load_fake_llm(responses=None, token_delay=FAKE_LLM_TOKEN_DELAY, call_delay=FAKE_LLM_CALL_DELAY):
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    class FakeChatModel(FakeListChatModel):
+        call_delay: float = 0.0
+
+        def _call(self, *args, **kwargs):
+            time.sleep(self.call_delay)
+            return super()._call(*args, **kwargs)
+
+    return FakeChatModel(responses=responses or [FAKE_LLM_RESPONSE], sleep=token_delay, call_delay=call_delay)
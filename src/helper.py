@@ -5,127 +5,185 @@ import shutil
 import hashlib
 import logging
 import ast
-import glob
-from git import Repo
-from langchain_community.document_loaders.generic import GenericLoader
-from langchain_community.document_loaders.parsers.language.language_parser import LanguageParser
+import multiprocessing
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from git import Repo, GitCommandError
 from langchain.text_splitter import Language
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 import stat
-from pycparser import CParser, parse_file
-import clang.cindex  # Added import for libclang
 from bs4 import BeautifulSoup
 import tinycss2
-import esprima
-import javalang
+from src.repo_walker import walk_repo
+from src.symbol_index import extract_symbols
+from src.chunk_sizing import split_chunk
+from src.embeddings import LocalEmbeddings
+from src.c_chunker import chunk_c_code, CHUNKER_VERSION as C_CHUNKER_VERSION
+from src.cpp_chunker import chunk_cpp_code, CHUNKER_VERSION as CPP_CHUNKER_VERSION
+from src.js_chunker import chunk_js_code, CHUNKER_VERSION as JS_CHUNKER_VERSION
+from src.java_chunker import chunk_java_code, CHUNKER_VERSION as JAVA_CHUNKER_VERSION
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Clone any GitHub repository with error handling
+# Clone options: history depth (0 for full history), partial clone without blobs, sparse checkout of indexed files
+CLONE_DEPTH = int(os.environ.get("INGEST_CLONE_DEPTH", "1"))
+CLONE_BLOBLESS = os.environ.get("INGEST_CLONE_BLOBLESS", "false").lower() == "true"
+CLONE_SPARSE = os.environ.get("INGEST_CLONE_SPARSE", "false").lower() == "true"
+
+# Names usable as a single directory component: no path separators, and not "." or ".."
+SAFE_NAME_RE = re.compile(r"^[A-Za-z0-9._-]+$")
+
+def is_safe_name(name):
+    return bool(name) and SAFE_NAME_RE.match(name) is not None and name not in (".", "..")
+
+def is_repo_id(name):
+    # Names starting with "_" are reserved for the caches kept next to repositories (db/_embedding_cache, ...)
+    return is_safe_name(name) and not name.startswith("_")
+
+# Mapping a repository URL to its local checkout path
+def repo_checkout_path(repo_url):
+    match = re.match(r"https?://github\.com/([^/]+)/([^/]+)", repo_url)
+    if match:
+        username, repo_name = match.group(1), match.group(2)
+        if not (is_safe_name(username) and is_safe_name(repo_name)):
+            return None
+        return os.path.join(username, repo_name)
+    # Local repositories (file:// URLs), mainly for testing
+    match = re.match(r"file://(/.+)", repo_url)
+    if match:
+        parts = [part for part in match.group(1).rstrip("/").split("/") if part]
+        repo_name = parts[-1][:-len(".git")] if parts[-1].endswith(".git") else parts[-1]
+        return os.path.join("local", repo_name) if is_safe_name(repo_name) else None
+    return None
+
+def _clone_repo(repo_url, repo_path, depth=CLONE_DEPTH, blobless=CLONE_BLOBLESS, sparse=CLONE_SPARSE):
+    options = {"single_branch": True}
+    if depth > 0:
+        options["depth"] = depth
+    if blobless:
+        options["filter"] = "blob:none"
+    if sparse:
+        options["no_checkout"] = True
+    repo = Repo.clone_from(repo_url, to_path=repo_path, **options)
+    if sparse:
+        # Only materialize files ingestion will index (and .gitignore files the walker honors)
+        patterns = [f"*{extension}" for extension in SUPPORTED_EXTENSIONS] + [".gitignore"]
+        repo.git.sparse_checkout("set", "--no-cone", *patterns)
+        repo.git.checkout(repo.active_branch.name)
+    return repo
+
+def _update_repo(repo, depth=CLONE_DEPTH):
+    before = repo.head.commit.hexsha
+    branch = repo.active_branch.name
+    fetch_args = ["--depth", str(depth)] if depth > 0 else []
+    repo.git.fetch(*fetch_args, "origin", branch)
+    try:
+        repo.git.merge("--ff-only", "FETCH_HEAD")
+    except GitCommandError:
+        # Shallow histories do not connect, so fast-forward by moving the branch to the fetched commit
+        repo.git.reset("--hard", "FETCH_HEAD")
+    return before != repo.head.commit.hexsha
+
+# Clone any GitHub repository, or fetch and fast-forward an existing checkout
 def repo_ingestion(repo_url):
     try:
-        match = re.match(r"https?://github\.com/([^/]+)/([^/]+)", repo_url)
-        if not match:
+        repo_path = repo_checkout_path(repo_url)
+        if repo_path is None:
             return {"status": "error", "message": "Invalid GitHub URL format."}
-        username, repo_name = match.group(1), match.group(2)
-        repo_path = os.path.join(username, repo_name)
+        if os.path.exists(os.path.join(repo_path, ".git")):
+            updated = _update_repo(Repo(repo_path))
+            commit = Repo(repo_path).head.commit.hexsha
+            state = f"updated to {commit[:12]}" if updated else f"already up to date at {commit[:12]}"
+            return {"status": "success", "message": f"Repository at {repo_path} {state}",
+                    "repo_path": repo_path, "commit": commit, "updated": updated}
         if os.path.exists(repo_path):
-            return {"status": "error", "message": f"Repository already exists at {repo_path}."}
+            shutil.rmtree(repo_path, onerror=remove_readonly)
         os.makedirs(repo_path, exist_ok=True)
-        Repo.clone_from(repo_url, to_path=repo_path)
-        return {"status": "success", "message": f"Repository cloned successfully to {repo_path}", "repo_path": repo_path}
+        commit = _clone_repo(repo_url, repo_path).head.commit.hexsha
+        return {"status": "success", "message": f"Repository cloned successfully to {repo_path}",
+                "repo_path": repo_path, "commit": commit, "updated": True}
     except Exception as e:
         return {"status": "error", "message": f"Failed to clone repository: {str(e)}"}
 
-# Loading repositories as documents
-def load_repo(repo_path):
-    try:
-        # Load Python, C, and C++ files with LanguageParser
-        loaders = [
-            GenericLoader.from_filesystem(
-                repo_path,
-                glob="**/*.py",
-                suffixes=[".py"],
-                parser=LanguageParser(language=Language.PYTHON, parser_threshold=500)
-            ),
-            GenericLoader.from_filesystem(
-                repo_path,
-                glob="**/*.c",
-                suffixes=[".c"],
-                parser=LanguageParser(language=Language.C, parser_threshold=500)
-            ),
-            GenericLoader.from_filesystem(
-                repo_path,
-                glob="**/*.h",
-                suffixes=[".h"],
-                parser=LanguageParser(language=Language.C, parser_threshold=500)
-            ),
-            GenericLoader.from_filesystem(
-                repo_path,
-                glob="**/*.cpp",
-                suffixes=[".cpp"],
-                parser=LanguageParser(language=Language.CPP, parser_threshold=500)
-            ),
-            GenericLoader.from_filesystem(
-                repo_path,
-                glob="**/*.hpp",
-                suffixes=[".hpp"],
-                parser=LanguageParser(language=Language.CPP, parser_threshold=500)
-            )
-        ]
-        documents = []
-        for loader in loaders:
-            docs = loader.load()
-            documents.extend(docs)
+# Number of processes used to parse and chunk files during ingestion
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", "0")) or os.cpu_count() or 1
 
-        # Manually load and parse HTML files
-        for html_file in glob.glob(os.path.join(repo_path, "**/*.html"), recursive=True):
-            with open(html_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                soup = BeautifulSoup(content, 'html.parser')
-                doc = Document(
-                    page_content=str(soup.prettify()),
-                    metadata={"source": html_file, "type": "HTML_Document"}
-                )
-                documents.append(doc)
+# Extensions picked up during ingestion, in loading order
+SUPPORTED_EXTENSIONS = (".py", ".c", ".h", ".cpp", ".hpp", ".html", ".css", ".js", ".java")
 
-        # Manually load and parse CSS files
-        for css_file in glob.glob(os.path.join(repo_path, "**/*.css"), recursive=True):
-            with open(css_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                rules = list(tinycss2.parse_stylesheet(content, skip_comments=True))
-                doc = Document(
-                    page_content="\n".join(str(rule) for rule in rules),
-                    metadata={"source": css_file, "type": "CSS_Rule"}
-                )
-                documents.append(doc)
+# Bumped whenever Python chunk boundaries or metadata (see chunk_document) change
+PY_CHUNKER_VERSION = 1
+
+# Version of the chunker used for each extension; ingestion re-chunks indexed files whose version changed
+CHUNKER_VERSIONS = {
+    ".py": PY_CHUNKER_VERSION,
+    ".c": C_CHUNKER_VERSION,
+    ".h": C_CHUNKER_VERSION,
+    ".cpp": CPP_CHUNKER_VERSION,
+    ".hpp": CPP_CHUNKER_VERSION,
+    ".js": JS_CHUNKER_VERSION,
+    ".java": JAVA_CHUNKER_VERSION,
+}
+
+# Listing supported source files in a repository with a single walk
+def walk_repo_files(repo_path):
+    files, stats = walk_repo(repo_path, SUPPORTED_EXTENSIONS)
+    summary = ", ".join(f"{ext}: {c['files']} files/{c['bytes']} bytes" for ext, c in sorted(stats["by_extension"].items()))
+    logger.info(f"Walked {repo_path}: {summary or 'no supported files'}; skipped {stats['skipped'] or 'nothing'}")
+    return files, stats
+
+def list_repo_files(repo_path):
+    return walk_repo_files(repo_path)[0]
 
-        # Manually load and parse JS files
-        for js_file in glob.glob(os.path.join(repo_path, "**/*.js"), recursive=True):
-            with open(js_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                tree = esprima.parseScript(content)
-                doc = Document(
-                    page_content=content,  # Use raw content for now, can refine with tree traversal
-                    metadata={"source": js_file, "type": "JS_Script"}
-                )
-                documents.append(doc)
+# Loading a single source file as documents
+def load_file(file_path):
+    file_extension = os.path.splitext(file_path)[1].lower()
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if file_extension == ".py":
+        # Whole file, so chunk line numbers from `ast` are relative to the file
+        return [Document(page_content=content, metadata={"source": file_path, "type": "Python_Source"})]
+    if file_extension in (".c", ".h"):
+        # Whole file, so the C chunker sees every top-level item with its real line numbers
+        return [Document(page_content=content, metadata={"source": file_path, "type": "C_Source"})]
+    if file_extension in (".cpp", ".hpp"):
+        return [Document(page_content=content, metadata={"source": file_path, "type": "CPP_Source"})]
+    if file_extension == ".html":
+        # Manually load and parse HTML files
+        soup = BeautifulSoup(content, 'html.parser')
+        return [Document(
+            page_content=str(soup.prettify()),
+            metadata={"source": file_path, "type": "HTML_Document"}
+        )]
+    if file_extension == ".css":
+        # Manually load and parse CSS files
+        rules = list(tinycss2.parse_stylesheet(content, skip_comments=True))
+        return [Document(
+            page_content="\n".join(str(rule) for rule in rules),
+            metadata={"source": file_path, "type": "CSS_Rule"}
+        )]
+    if file_extension == ".js":
+        # Parsed once, by the JS chunker
+        return [Document(page_content=content, metadata={"source": file_path, "type": "JS_Source"})]
+    if file_extension == ".java":
+        return [Document(page_content=content, metadata={"source": file_path, "type": "Java_Source"})]
+    return []
 
-        # Manually load and parse Java files
-        for java_file in glob.glob(os.path.join(repo_path, "**/*.java"), recursive=True):
-            with open(java_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                tree = javalang.parse.parse(content)
-                doc = Document(
-                    page_content=content,  # Use raw content for now, can refine with tree traversal
-                    metadata={"source": java_file, "type": "Java_Class"}
-                )
-                documents.append(doc)
+# Loading a list of files as documents
+def load_files(file_paths):
+    documents = []
+    for file_path in file_paths:
+        documents.extend(load_file(file_path))
+    return documents
 
+# Loading repositories as documents
+def load_repo(repo_path):
+    try:
+        documents = load_files(list_repo_files(repo_path))
         logger.info(f"Loaded {len(documents)} documents (Python, C, C++, HTML, CSS, JS, Java) from {repo_path}")
         if not documents:
             raise ValueError(f"No supported files found in {repo_path}.")
@@ -145,207 +203,123 @@ def text_splitter(documents):
     logger.info(f"Created {len(text_chunks)} text chunks")
     return text_chunks
 
-# Loading HuggingFace embedding model
+# Loading the local embedding model (backend, batch size and threads from the environment)
 def load_embedding():
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    embeddings = LocalEmbeddings()
     return embeddings
 
-def function_class_chunker(documents, max_chunk_size=1800, overlap=200):
+def chunk_document(doc, max_tokens=None, overlap_tokens=None):
+    """
+    Splits a single document into function/class or logical chunks sized to the embedding model's
+    token budget (CHUNK_MAX_TOKENS by default). Returns a list of {"content", "metadata"} dicts.
+    """
+    chunks = []
+    code = doc.page_content if hasattr(doc, "page_content") else doc
+    file_path = doc.metadata.get("source", "unknown") if hasattr(doc, "metadata") else "unknown"
+    file_extension = os.path.splitext(file_path)[1].lower()
+    try:
+        if file_extension == ".py":
+            tree = ast.parse(code)
+            lines = code.splitlines()
+            for node in tree.body:
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    start_line = node.lineno - 1
+                    end_line = getattr(node, 'end_lineno', None)
+                    if end_line is None:
+                        end_line = node.body[-1].lineno if node.body else node.lineno
+                    chunk_code = "\n".join(lines[start_line:end_line])
+                    metadata = {
+                        "type": type(node).__name__,
+                        "name": getattr(node, "name", ""),
+                        "file": file_path,
+                        "start_line": start_line + 1,
+                        "end_line": end_line
+                    }
+                    chunks.extend(split_chunk(chunk_code, metadata, max_tokens, overlap_tokens))
+        elif file_extension in (".c", ".h"):
+            chunks.extend(chunk_c_code(code, file_path, max_tokens, overlap_tokens))
+        elif file_extension in (".cpp", ".hpp"):
+            chunks.extend(chunk_cpp_code(code, file_path, max_tokens, overlap_tokens))
+        elif file_extension == ".js":
+            chunks.extend(chunk_js_code(code, file_path, max_tokens, overlap_tokens))
+        elif file_extension == ".java":
+            chunks.extend(chunk_java_code(code, file_path, max_tokens, overlap_tokens))
+        elif doc.metadata.get("type") in ("HTML_Document", "CSS_Rule"):
+            chunk_code = doc.page_content
+            metadata = {
+                "type": doc.metadata["type"],
+                "name": os.path.basename(doc.metadata["source"]),
+                "file": doc.metadata["source"],
+                "start_line": 1,
+                "end_line": len(chunk_code.splitlines())
+            }
+            chunks.extend(split_chunk(chunk_code, metadata, max_tokens, overlap_tokens))
+    except Exception as e:
+        logger.warning(f"Parsing failed for {file_path}: {e}. Falling back to line-based split.")
+        chunks = split_chunk(code, {"type": "text_split", "file": file_path, "start_line": 1,
+                                    "end_line": len(code.splitlines())}, max_tokens, overlap_tokens)
+    return chunks
+
+def function_class_chunker(documents, max_tokens=None, overlap_tokens=None):
     """
     Splits Python, C, C++, HTML, CSS, JS, and Java code into function/class or logical chunks with metadata.
-    If a chunk is too large, further splits it using character-based splitting.
+    If a chunk exceeds the embedding model's token budget, further splits it on line boundaries.
     """
     chunks = []
     for doc in documents:
-        code = doc.page_content if hasattr(doc, "page_content") else doc
-        file_path = doc.metadata.get("source", "unknown") if hasattr(doc, "metadata") else "unknown"
-        file_extension = os.path.splitext(file_path)[1].lower()
-        try:
-            if file_extension == ".py":
-                tree = ast.parse(code)
-                for node in tree.body:
-                    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
-                        start_line = node.lineno - 1
-                        end_line = getattr(node, 'end_lineno', None)
-                        if end_line is None:
-                            end_line = node.body[-1].lineno if node.body else node.lineno
-                        lines = code.splitlines()
-                        chunk_code = "\n".join(lines[start_line:end_line])
-                        metadata = {
-                            "type": type(node).__name__,
-                            "name": getattr(node, "name", ""),
-                            "file": file_path,
-                            "start_line": start_line + 1,
-                            "end_line": end_line
-                        }
-                        if len(chunk_code) > max_chunk_size:
-                            for i in range(0, len(chunk_code), max_chunk_size - overlap):
-                                sub_chunk = chunk_code[i:i + max_chunk_size]
-                                sub_metadata = metadata.copy()
-                                sub_metadata["split"] = f"{i//(max_chunk_size - overlap) + 1}"
-                                chunks.append({"content": sub_chunk, "metadata": sub_metadata})
-                        else:
-                            chunks.append({"content": chunk_code, "metadata": metadata})
-            elif file_extension == ".c":
-                parser = CParser()
-                tree = parser.parse(code)
-                for node in ast.walk(tree):
-                    if hasattr(node, 'coord'):
-                        start_line = node.coord.line - 1
-                        end_line = node.coord.line
-                        lines = code.splitlines()
-                        chunk_code = "\n".join(lines[start_line:end_line])
-                        metadata = {
-                            "type": node.__class__.__name__,
-                            "name": getattr(node, "name", ""),
-                            "file": file_path,
-                            "start_line": start_line + 1,
-                            "end_line": end_line
-                        }
-                        if len(chunk_code) > max_chunk_size:
-                            for i in range(0, len(chunk_code), max_chunk_size - overlap):
-                                sub_chunk = chunk_code[i:i + max_chunk_size]
-                                sub_metadata = metadata.copy()
-                                sub_metadata["split"] = f"{i//(max_chunk_size - overlap) + 1}"
-                                chunks.append({"content": sub_chunk, "metadata": sub_metadata})
-                        else:
-                            chunks.append({"content": chunk_code, "metadata": metadata})
-            elif file_extension == ".h":
-                parser = CParser()
-                tree = parser.parse(code)
-                for node in ast.walk(tree):
-                    if hasattr(node, 'coord'):
-                        start_line = node.coord.line - 1
-                        end_line = node.coord.line
-                        lines = code.splitlines()
-                        chunk_code = "\n".join(lines[start_line:end_line])
-                        metadata = {
-                            "type": node.__class__.__name__,
-                            "name": getattr(node, "name", ""),
-                            "file": file_path,
-                            "start_line": start_line + 1,
-                            "end_line": end_line
-                        }
-                        if len(chunk_code) > max_chunk_size:
-                            for i in range(0, len(chunk_code), max_chunk_size - overlap):
-                                sub_chunk = chunk_code[i:i + max_chunk_size]
-                                sub_metadata = metadata.copy()
-                                sub_metadata["split"] = f"{i//(max_chunk_size - overlap) + 1}"
-                                chunks.append({"content": sub_chunk, "metadata": sub_metadata})
-                        else:
-                            chunks.append({"content": chunk_code, "metadata": metadata})
-            elif file_extension in [".cpp", ".hpp"]:
-                index = clang.cindex.Index.create()
-                tu = index.parse(file_path)
-                for node in tu.cursor.walk_preorder():
-                    if node.location.file and os.path.abspath(node.location.file.name) == os.path.abspath(file_path):
-                        if node.kind in (
-                            clang.cindex.CursorKind.FUNCTION_DECL,
-                            clang.cindex.CursorKind.CXX_METHOD,
-                            clang.cindex.CursorKind.CLASS_DECL
-                        ):
-                            start_line = node.extent.start.line - 1
-                            end_line = node.extent.end.line
-                            with open(file_path, 'r') as f:
-                                lines = f.readlines()
-                                chunk_code = "".join(lines[start_line:end_line]).strip()
-                            metadata = {
-                                "type": node.kind.name,
-                                "name": node.spelling,
-                                "file": file_path,
-                                "start_line": start_line + 1,
-                                "end_line": end_line
-                            }
-                            if len(chunk_code) > max_chunk_size:
-                                for i in range(0, len(chunk_code), max_chunk_size - overlap):
-                                    sub_chunk = chunk_code[i:i + max_chunk_size]
-                                    sub_metadata = metadata.copy()
-                                    sub_metadata["split"] = f"{i//(max_chunk_size - overlap) + 1}"
-                                    chunks.append({"content": sub_chunk, "metadata": sub_metadata})
-                            else:
-                                chunks.append({"content": chunk_code, "metadata": metadata})
-            elif "type" in doc.metadata and doc.metadata["type"] == "HTML_Document":
-                chunk_code = doc.page_content
-                metadata = {
-                    "type": "HTML_Document",
-                    "name": os.path.basename(doc.metadata["source"]),
-                    "file": doc.metadata["source"],
-                    "start_line": 1,
-                    "end_line": len(chunk_code.splitlines())
-                }
-                if len(chunk_code) > max_chunk_size:
-                    for i in range(0, len(chunk_code), max_chunk_size - overlap):
-                        sub_chunk = chunk_code[i:i + max_chunk_size]
-                        sub_metadata = metadata.copy()
-                        sub_metadata["split"] = f"{i//(max_chunk_size - overlap) + 1}"
-                        chunks.append({"content": sub_chunk, "metadata": sub_metadata})
-                else:
-                    chunks.append({"content": chunk_code, "metadata": metadata})
-            elif "type" in doc.metadata and doc.metadata["type"] == "CSS_Rule":
-                chunk_code = doc.page_content
-                metadata = {
-                    "type": "CSS_Rule",
-                    "name": os.path.basename(doc.metadata["source"]),
-                    "file": doc.metadata["source"],
-                    "start_line": 1,
-                    "end_line": len(chunk_code.splitlines())
-                }
-                if len(chunk_code) > max_chunk_size:
-                    for i in range(0, len(chunk_code), max_chunk_size - overlap):
-                        sub_chunk = chunk_code[i:i + max_chunk_size]
-                        sub_metadata = metadata.copy()
-                        sub_metadata["split"] = f"{i//(max_chunk_size - overlap) + 1}"
-                        chunks.append({"content": sub_chunk, "metadata": sub_metadata})
-                else:
-                    chunks.append({"content": chunk_code, "metadata": metadata})
-            elif "type" in doc.metadata and doc.metadata["type"] == "JS_Script":
-                chunk_code = doc.page_content
-                metadata = {
-                    "type": "JS_Script",
-                    "name": os.path.basename(doc.metadata["source"]),
-                    "file": doc.metadata["source"],
-                    "start_line": 1,
-                    "end_line": len(chunk_code.splitlines())
-                }
-                if len(chunk_code) > max_chunk_size:
-                    for i in range(0, len(chunk_code), max_chunk_size - overlap):
-                        sub_chunk = chunk_code[i:i + max_chunk_size]
-                        sub_metadata = metadata.copy()
-                        sub_metadata["split"] = f"{i//(max_chunk_size - overlap) + 1}"
-                        chunks.append({"content": sub_chunk, "metadata": sub_metadata})
-                else:
-                    chunks.append({"content": chunk_code, "metadata": metadata})
-            elif "type" in doc.metadata and doc.metadata["type"] == "Java_Class":
-                chunk_code = doc.page_content
-                metadata = {
-                    "type": "Java_Class",
-                    "name": os.path.basename(doc.metadata["source"]),
-                    "file": doc.metadata["source"],
-                    "start_line": 1,
-                    "end_line": len(chunk_code.splitlines())
-                }
-                if len(chunk_code) > max_chunk_size:
-                    for i in range(0, len(chunk_code), max_chunk_size - overlap):
-                        sub_chunk = chunk_code[i:i + max_chunk_size]
-                        sub_metadata = metadata.copy()
-                        sub_metadata["split"] = f"{i//(max_chunk_size - overlap) + 1}"
-                        chunks.append({"content": sub_chunk, "metadata": sub_metadata})
-                else:
-                    chunks.append({"content": chunk_code, "metadata": metadata})
-        except Exception as e:
-            logger.warning(f"Parsing failed for {file_path}: {e}. Falling back to character split.")
-            for i in range(0, len(code), max_chunk_size - overlap):
-                chunk_code = code[i:i + max_chunk_size]
-                metadata = {"type": "char_split", "file": file_path, "split": f"{i//(max_chunk_size - overlap) + 1}"}
-                chunks.append({"content": chunk_code, "metadata": metadata})
+        chunks.extend(chunk_document(doc, max_tokens, overlap_tokens))
     logger.info(f"Created {len(chunks)} function/class-level (hybrid) chunks")
     return [Document(page_content=chunk["content"], metadata=chunk["metadata"]) for chunk in chunks]
 
+# Loading, chunking and extracting symbols from one file; runs inside ingestion worker processes
+def load_and_chunk_file(file_path, max_tokens=None, overlap_tokens=None):
+    chunks = []
+    for doc in load_file(file_path):
+        chunks.extend(chunk_document(doc, max_tokens, overlap_tokens))
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        symbols = extract_symbols(file_path, f.read())
+    return chunks, symbols
+
+def iter_chunked_files(file_paths, workers=INGEST_WORKERS, max_pending=None):
+    """
+    Yields (file_path, chunks, symbols) for each file in input order, spreading the per-file parse and chunk
+    work over a process pool. At most `max_pending` files are in flight at once, so memory stays
+    bounded regardless of repository size.
+    """
+    if workers <= 1 or len(file_paths) < 2:
+        for file_path in file_paths:
+            yield (file_path, *load_and_chunk_file(file_path))
+        return
+    workers = min(workers, len(file_paths))
+    max_pending = max_pending or workers * 4
+    # Spawned workers avoid forking a process that holds model and server threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        paths = iter(file_paths)
+        pending = deque((file_path, executor.submit(load_and_chunk_file, file_path))
+                        for file_path in islice(paths, max_pending))
+        while pending:
+            file_path, future = pending.popleft()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(load_and_chunk_file, next_path)))
+            yield (file_path, *future.result())
+
+def chunk_repo_files(file_paths, workers=INGEST_WORKERS):
+    """
+    Loads and chunks files in parallel. Results are collected in input order,
+    so the output is identical to the serial path.
+    """
+    chunks = [chunk for _, file_chunks, _ in iter_chunked_files(file_paths, workers) for chunk in file_chunks]
+    logger.info(f"Created {len(chunks)} function/class-level (hybrid) chunks from {len(file_paths)} files "
+                f"using {max(1, min(workers, len(file_paths)))} worker(s)")
+    return [Document(page_content=chunk["content"], metadata=chunk["metadata"]) for chunk in chunks]
+
 def get_repo_hash(repo_url):
+    # owner__name, so same-named repositories of different owners get separate indexes
     match = re.match(r"https?://github\.com/([^/]+)/([^/]+)", repo_url)
-    if match:
-        _, repo_name = match.groups()
-        return repo_name
+    if match and is_repo_id(match.group(1)) and is_safe_name(match.group(2)):
+        return f"{match.group(1)}__{match.group(2)}"
     return hashlib.md5(repo_url.encode()).hexdigest()
 
 def remove_readonly(func, path, excinfo):
@@ -0,0 +1,258 @@
+# src/index_store.py
+import os
+import json
+import sqlite3
+import logging
+import threading
+from collections.abc import Mapping
+from langchain_core.documents import Document
+from langchain_community.vectorstores import FAISS
+
+logger = logging.getLogger(__name__)
+
+# Points at the current generation's files; replaced atomically after they are fully written
+CURRENT_FILENAME = "CURRENT"
+STORE_FORMAT = 1
+READ_ONLY_MESSAGE = "Opened indexes are read-only; re-ingest the repository (build_index) to change them."
+
+class ReadOnlyIndexError(RuntimeError):
+    """Raised when an index opened for serving is modified."""
+
+class ReadOnlyFAISS(FAISS):
+    """
+    FAISS store over an opened generation. Its vectors may be memory-mapped and shared with other
+    processes, so every write raises ReadOnlyIndexError before the index is touched.
+    """
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        raise ReadOnlyIndexError(READ_ONLY_MESSAGE)
+
+    async def aadd_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        raise ReadOnlyIndexError(READ_ONLY_MESSAGE)
+
+    def add_embeddings(self, text_embeddings, metadatas=None, ids=None, **kwargs):
+        raise ReadOnlyIndexError(READ_ONLY_MESSAGE)
+
+    def delete(self, ids=None, **kwargs):
+        raise ReadOnlyIndexError(READ_ONLY_MESSAGE)
+
+    def merge_from(self, target):
+        raise ReadOnlyIndexError(READ_ONLY_MESSAGE)
+
+class SQLiteDocstore:
+    """
+    Read-only docstore over a chunks table, loading each document when it is looked up.
+    Implements the `search` method the FAISS vector store calls, returning a message string
+    for unknown ids as LangChain's in-memory docstore does.
+    """
+
+    def __init__(self, db_path, generation=None, side_indexes=None, index_file=None):
+        # Read-only connections: any number of threads and processes can share the file
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.path = db_path
+        # Generation the file belongs to, its FAISS index file and paths of the side indexes saved with it
+        self.generation = generation
+        self.index_file = index_file
+        self.side_indexes = side_indexes or {}
+
+    def search(self, search):
+        with self._lock:
+            row = self._conn.execute("SELECT content, metadata FROM chunks WHERE chunk_id = ?", (search,)).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(id=search, page_content=row[0], metadata=json.loads(row[1]))
+
+    def position_to_id(self, position):
+        with self._lock:
+            row = self._conn.execute("SELECT chunk_id FROM chunks WHERE position = ?", (position,)).fetchone()
+        return row[0] if row else None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def iter_ids(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT position, chunk_id FROM chunks ORDER BY position").fetchall()
+        return iter(rows)
+
+    def add(self, texts):
+        raise ReadOnlyIndexError(READ_ONLY_MESSAGE)
+
+    def delete(self, ids):
+        raise ReadOnlyIndexError(READ_ONLY_MESSAGE)
+
+class SQLitePositionMap(Mapping):
+    """The vector store's index position -> chunk id mapping, read from the docstore on demand."""
+
+    def __init__(self, docstore):
+        self._docstore = docstore
+
+    def __getitem__(self, position):
+        chunk_id = self._docstore.position_to_id(int(position))
+        if chunk_id is None:
+            raise KeyError(position)
+        return chunk_id
+
+    def __iter__(self):
+        return (position for position, _ in self._docstore.iter_ids())
+
+    def __len__(self):
+        return self._docstore.count()
+
+def read_current(index_path):
+    """
+    The current generation's pointer ({"generation", "index", "docstore", "side_indexes"}), or None if there
+    is none. Generations saved before side indexes were versioned have no "side_indexes".
+    """
+    try:
+        with open(os.path.join(index_path, CURRENT_FILENAME), 'r', encoding='utf-8') as f:
+            current = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return current if current.get("format") == STORE_FORMAT else None
+
+def current_generation(index_path):
+    current = read_current(index_path)
+    return current["generation"] if current else None
+
+def _side_index_paths(index_path, current):
+    return {name: os.path.join(index_path, filename) for name, filename in current.get("side_indexes", {}).items()}
+
+def side_index_file(index_path, name):
+    """Path of the current generation's copy of a side index ("lexical", "symbols"), or None if it has none."""
+    current = read_current(index_path)
+    return _side_index_paths(index_path, current).get(name) if current else None
+
+def opened_side_index(vectordb, name):
+    """Path of the side index saved with the generation `vectordb` was opened from, or None."""
+    return getattr(vectordb.docstore, "side_indexes", {}).get(name)
+
+def opened_generation(vectordb):
+    """Generation `vectordb` was opened from, or None for stores not opened with open_index."""
+    return getattr(vectordb.docstore, "generation", None)
+
+def opened_files(vectordb):
+    """(FAISS index file, docstore file) `vectordb` was opened from, or None for stores not opened with open_index."""
+    docstore = vectordb.docstore
+    if isinstance(docstore, SQLiteDocstore) and docstore.index_file:
+        return docstore.index_file, docstore.path
+    return None
+
+def index_file(index_path):
+    """Path of the current FAISS index file."""
+    current = read_current(index_path)
+    if current is None:
+        raise FileNotFoundError(f"No index in {index_path}")
+    return os.path.join(index_path, current["index"])
+
+def _write_docstore(db_path, vectordb):
+    conn = sqlite3.connect(db_path)
+    try:
+        # A fresh file that nobody reads until CURRENT points at it, so no journal is needed
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.execute("CREATE TABLE chunks (position INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL UNIQUE, "
+                     "content TEXT NOT NULL, metadata TEXT NOT NULL)")
+        rows = []
+        for position in range(vectordb.index.ntotal):
+            chunk_id = vectordb.index_to_docstore_id[position]
+            doc = vectordb.docstore.search(chunk_id)
+            rows.append((position, chunk_id, doc.page_content, json.dumps(doc.metadata)))
+            if len(rows) >= 10000:
+                conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+                rows = []
+        conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+def copy_sqlite(source_path, target_path):
+    """Copies a SQLite database with the online backup API, so it is consistent while others write to it."""
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    source, target = sqlite3.connect(source_path), sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+def save_index(vectordb, index_path, side_indexes=None):
+    """
+    Writes a vector store as a new generation: the FAISS index in its native format, the chunks in
+    SQLite and a copy of each side index (name -> SQLite path, e.g. the lexical and symbol indexes),
+    then switches CURRENT to it. Readers of older generations keep working on their files;
+    files of older generations are removed where the platform allows it. Generation numbers only
+    grow, as long as `index_path` itself is kept across rebuilds.
+    """
+    import faiss
+
+    os.makedirs(index_path, exist_ok=True)
+    generation = (current_generation(index_path) or 0) + 1
+    current = {"format": STORE_FORMAT, "generation": generation,
+               "index": f"index-{generation}.faiss", "docstore": f"docstore-{generation}.sqlite",
+               "side_indexes": {name: f"{name}-{generation}.sqlite" for name in side_indexes or {}}}
+    faiss.write_index(vectordb.index, os.path.join(index_path, current["index"]))
+    docstore_path = os.path.join(index_path, current["docstore"])
+    if os.path.exists(docstore_path):
+        os.remove(docstore_path)
+    _write_docstore(docstore_path, vectordb)
+    for name, source_path in (side_indexes or {}).items():
+        copy_sqlite(source_path, os.path.join(index_path, current["side_indexes"][name]))
+
+    pointer_path = os.path.join(index_path, CURRENT_FILENAME)
+    with open(pointer_path + ".tmp", 'w', encoding='utf-8') as f:
+        json.dump(current, f)
+    os.replace(pointer_path + ".tmp", pointer_path)
+
+    keep = {current["index"], current["docstore"], CURRENT_FILENAME, *current["side_indexes"].values()}
+    for name in os.listdir(index_path):
+        if name not in keep:
+            try:
+                os.remove(os.path.join(index_path, name))
+            except OSError:
+                pass  # Still open on Windows; removed by a later save
+
+def open_index(index_path, embeddings):
+    """
+    Opens the current generation for searching, as a ReadOnlyFAISS store. Flat, fp16, sq8 and HNSW
+    vectors are memory-mapped, so opening takes constant time and worker processes share the page
+    cache; chunk text and metadata are read from SQLite as results are returned. Indexes saved before
+    this format (pickled docstore) are still loaded the old way until they are re-ingested.
+    """
+    import faiss
+    from src.index_types import prepare_index
+
+    current = read_current(index_path)
+    if current is None and os.path.exists(os.path.join(index_path, "index.pkl")):
+        logger.warning(f"{index_path} uses the pickled index format; re-ingest the repository to convert it")
+        return FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+    if current is None:
+        raise FileNotFoundError(f"No index in {index_path}")
+    index_file_path = os.path.join(index_path, current["index"])
+    index = prepare_index(faiss.read_index(index_file_path, faiss.IO_FLAG_MMAP_IFC))
+    docstore = SQLiteDocstore(os.path.join(index_path, current["docstore"]), current["generation"],
+                              _side_index_paths(index_path, current), index_file_path)
+    return ReadOnlyFAISS(embedding_function=embeddings, index=index, docstore=docstore,
+                         index_to_docstore_id=SQLitePositionMap(docstore))
+
+def load_index_for_update(index_path, embeddings):
+    """Loads the current generation fully into memory, as a store that can be added to and deleted from."""
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+
+    current = read_current(index_path)
+    if current is None:
+        raise FileNotFoundError(f"No index in {index_path}")
+    index = faiss.read_index(os.path.join(index_path, current["index"]))
+    conn = sqlite3.connect(f"file:{os.path.join(index_path, current['docstore'])}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("SELECT position, chunk_id, content, metadata FROM chunks ORDER BY position").fetchall()
+    finally:
+        conn.close()
+    docstore = InMemoryDocstore({chunk_id: Document(id=chunk_id, page_content=content, metadata=json.loads(metadata))
+                                 for _, chunk_id, content, metadata in rows})
+    return FAISS(embedding_function=embeddings, index=index, docstore=docstore,
+                 index_to_docstore_id={position: chunk_id for position, chunk_id, _, _ in rows})
@@ -0,0 +1,162 @@
+# src/index_types.py
+import os
+import sys
+import time
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# "auto" picks a type from the chunk count; otherwise one of INDEX_TYPES
+INDEX_TYPE = os.environ.get("INDEX_TYPE", "auto")
+INDEX_TYPES = ("flat", "fp16", "sq8", "hnsw", "ivfpq")
+# Types whose positional ids stay consistent under FAISS.delete, so they support incremental updates
+INCREMENTAL_INDEX_TYPES = ("flat", "fp16", "sq8")
+
+# Chunk counts at which "auto" switches from exact float32 to int8 scalar quantization, then to IVF-PQ
+AUTO_FLAT_MAX_CHUNKS = int(os.environ.get("INDEX_AUTO_FLAT_MAX_CHUNKS", "20000"))
+AUTO_SQ_MAX_CHUNKS = int(os.environ.get("INDEX_AUTO_SQ_MAX_CHUNKS", "200000"))
+
+HNSW_M = 32
+HNSW_EF_SEARCH = int(os.environ.get("INDEX_HNSW_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.environ.get("INDEX_IVF_NPROBE", "16"))
+# PQ with 8-bit codes needs at least 256 training points per sub-quantizer, and IVF ~39 per list
+IVFPQ_MIN_CHUNKS = 10000
+REPORT_QUERIES = 200
+REPORT_K = 8
+
+def choose_index_type(n_chunks, requested=INDEX_TYPE):
+    requested = requested or "auto"
+    if requested != "auto":
+        if requested not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {requested!r}; expected one of {', '.join(INDEX_TYPES)} or auto.")
+        if requested == "ivfpq" and n_chunks < IVFPQ_MIN_CHUNKS:
+            logger.info(f"Only {n_chunks} chunks, too few to train IVF-PQ; using sq8 instead")
+            return "sq8"
+        return requested
+    if n_chunks <= AUTO_FLAT_MAX_CHUNKS:
+        return "flat"
+    if n_chunks <= AUTO_SQ_MAX_CHUNKS or n_chunks < IVFPQ_MIN_CHUNKS:
+        return "sq8"
+    return "ivfpq"
+
+def index_factory_string(index_type, n_chunks, dim):
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "fp16":
+        return "SQfp16"
+    if index_type == "sq8":
+        return "SQ8"
+    if index_type == "hnsw":
+        return f"HNSW{HNSW_M}"
+    if index_type == "ivfpq":
+        nlist = max(16, min(int(4 * np.sqrt(n_chunks)), n_chunks // 39))
+        # Largest sub-quantizer count <= dim/8 that divides the dimension
+        m = next(m for m in range(max(1, dim // 8), 0, -1) if dim % m == 0)
+        return f"IVF{nlist},PQ{m}"
+    raise ValueError(f"Unknown index type {index_type!r}")
+
+def build_compact_index(vectors, index_type):
+    """Builds (and trains, where needed) a FAISS index of the given type over float32 vectors."""
+    import faiss
+
+    n_chunks, dim = vectors.shape
+    index = faiss.index_factory(dim, index_factory_string(index_type, n_chunks, dim), faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    if index_type == "hnsw":
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    if index_type == "ivfpq":
+        index.nprobe = IVF_NPROBE
+    prepare_index(index)
+    return index
+
+def prepare_index(index):
+    """IVF indexes need a direct map so MMR retrieval can reconstruct candidate vectors."""
+    import faiss
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+    return index
+
+def index_bytes(index):
+    import faiss
+    return int(faiss.serialize_index(index).nbytes)
+
+def evaluate_index(vectors, index, k=REPORT_K, n_queries=REPORT_QUERIES, exact_index=None):
+    """
+    Measures recall@k and per-query latency of `index` against exact flat search, using a
+    deterministic sample of the indexed vectors as queries.
+    """
+    import faiss
+
+    if exact_index is None:
+        exact_index = faiss.IndexFlatL2(vectors.shape[1])
+        exact_index.add(vectors)
+    rng = np.random.default_rng(0)
+    queries = vectors[rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)]
+    k = min(k, len(vectors))
+
+    start = time.perf_counter()
+    _, exact_ids = exact_index.search(queries, k)
+    exact_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    _, ids = index.search(queries, k)
+    index_seconds = time.perf_counter() - start
+
+    hits = sum(len(set(row) & set(exact_row)) for row, exact_row in zip(ids.tolist(), exact_ids.tolist()))
+    return {
+        "recall_at_k": round(hits / (len(queries) * k), 4),
+        "k": k,
+        "queries": len(queries),
+        "exact_ms_per_query": round(1000 * exact_seconds / len(queries), 4),
+        "index_ms_per_query": round(1000 * index_seconds / len(queries), 4),
+        "exact_bytes": index_bytes(exact_index),
+        "index_bytes": index_bytes(index),
+    }
+
+def convert_index(vectordb, index_type):
+    """
+    Replaces a store's flat index with a compact index of `index_type` built from the same vectors,
+    keeping positional ids (and so the docstore mapping) unchanged. Returns a recall/latency report.
+    """
+    flat_index = vectordb.index
+    vectors = flat_index.reconstruct_n(0, flat_index.ntotal).astype(np.float32)
+    index = build_compact_index(vectors, index_type)
+    report = evaluate_index(vectors, index, exact_index=flat_index)
+    vectordb.index = index
+    logger.info(f"Converted index to {index_type}: recall@{report['k']}={report['recall_at_k']}, "
+                f"{report['exact_bytes'] // 1024} KiB -> {report['index_bytes'] // 1024} KiB, "
+                f"{report['exact_ms_per_query']} -> {report['index_ms_per_query']} ms/query")
+    return report
+
+def compare_index_types(vectors, index_types=INDEX_TYPES):
+    """Recall-vs-latency table for each index type over the same vectors."""
+    import faiss
+
+    exact_index = faiss.IndexFlatL2(vectors.shape[1])
+    exact_index.add(vectors)
+    reports = {}
+    for index_type in index_types:
+        if index_type == "ivfpq" and len(vectors) < IVFPQ_MIN_CHUNKS:
+            continue
+        start = time.perf_counter()
+        index = build_compact_index(vectors, index_type)
+        reports[index_type] = dict(evaluate_index(vectors, index, exact_index=exact_index),
+                                   build_seconds=round(time.perf_counter() - start, 3))
+    return reports
+
+# Usage: python -m src.index_types db/<repo_hash> [flat sq8 ...]
+# Vectors are reconstructed from the stored index, so compare against a flat or fp16 index for exact results.
+if __name__ == "__main__":
+    import json
+    import faiss
+    from src.indexer import INDEX_DIRNAME
+    from src.index_store import index_file
+
+    db_dir = sys.argv[1]
+    stored = prepare_index(faiss.read_index(index_file(os.path.join(db_dir, INDEX_DIRNAME))))
+    vectors = stored.reconstruct_n(0, stored.ntotal).astype(np.float32)
+    print(json.dumps(compare_index_types(vectors, sys.argv[2:] or INDEX_TYPES), indent=2))
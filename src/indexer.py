@@ -0,0 +1,361 @@
+# src/indexer.py
+import os
+import json
+import shutil
+import hashlib
+import time
+import queue
+import logging
+import threading
+from src.helper import walk_repo_files, iter_chunked_files, remove_readonly, CHUNKER_VERSIONS
+from src.lexical_index import LexicalIndex, LEXICAL_INDEX_FILENAME
+from src.symbol_index import SymbolIndex, SYMBOL_INDEX_FILENAME
+from src.chunk_sizing import truncation_report, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+from src.metrics import (record_stage, timed, FILES, FILE_BYTES, CHUNKS, PARSE_FALLBACKS, EMBEDDED_CHUNKS,
+                         EMBEDDING_CACHE, INDEX_VECTORS, INDEX_BYTES)
+from src.index_types import INDEX_TYPE, INDEX_TYPES, INCREMENTAL_INDEX_TYPES, choose_index_type, convert_index
+from src.index_store import save_index, load_index_for_update, current_generation, copy_sqlite
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIRNAME = "faiss_index"
+# Side indexes being rebuilt, moved into the repository directory once the new generation is saved
+STAGING_DIRNAME = "staging"
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 5
+
+# Chunks embedded per model call, and embedding batches buffered ahead of the embedder
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "256"))
+EMBED_QUEUE_BATCHES = int(os.environ.get("EMBED_QUEUE_BATCHES", "4"))
+
+# Hashing file contents the same way git hashes blobs
+def git_blob_hash(file_path):
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+# Reading the checked out commit, if the path is a git working tree
+def get_head_commit(repo_path):
+    try:
+        from git import Repo
+        return Repo(repo_path).head.commit.hexsha
+    except Exception:
+        return None
+
+def relative_path(file_path, repo_path):
+    return os.path.relpath(file_path, repo_path).replace(os.sep, "/")
+
+def load_manifest(db_dir):
+    manifest_path = os.path.join(db_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable manifest {manifest_path}: {e}")
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+def save_manifest(db_dir, manifest):
+    os.makedirs(db_dir, exist_ok=True)
+    manifest_path = os.path.join(db_dir, MANIFEST_FILENAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def diff_manifest(manifest, current_hashes):
+    """
+    Compares the indexed files in a manifest with the blob hashes currently on disk.
+    Returns (changed, removed): files that are new, modified or chunked by an older chunker version,
+    and files that no longer exist.
+    """
+    indexed = manifest.get("files", {})
+    # Unchanged files are re-chunked too when their extension's chunker changed since they were indexed
+    recorded = manifest.get("chunkers", {})
+    rechunk = {extension for extension in set(recorded) | set(CHUNKER_VERSIONS)
+               if recorded.get(extension) != CHUNKER_VERSIONS.get(extension)}
+    changed = sorted(path for path, blob in current_hashes.items()
+                     if path not in indexed or indexed[path]["blob"] != blob
+                     or os.path.splitext(path)[1].lower() in rechunk)
+    removed = sorted(path for path in indexed if path not in current_hashes)
+    return changed, removed
+
+def embedding_fingerprint(embeddings):
+    """
+    Settings that decide the vectors of a file's chunks. Incremental ingestion only re-embeds changed files,
+    so an index built with a different fingerprint is rebuilt rather than mixing two vector spaces.
+    """
+    return {
+        "model": getattr(embeddings, "model_name", None) or type(embeddings).__name__,
+        # Runtime (torch, onnx, int8 variants) of the model, looked up through the embedding cache wrapper
+        "backend": getattr(getattr(embeddings, "embeddings", embeddings), "backend", None),
+        "dimension": len(embeddings.embed_query("dimension")),
+        "chunk_max_tokens": CHUNK_MAX_TOKENS,
+        "chunk_overlap_tokens": CHUNK_OVERLAP_TOKENS,
+    }
+
+# Streaming chunks in fixed-size batches, assigning stable per-file chunk ids
+def iter_chunk_batches(repo_path, rel_paths, chunk_ids, batch_size=EMBED_BATCH_SIZE, progress=None,
+                       symbol_index=None):
+    batch = []
+    file_paths = [os.path.join(repo_path, rel_path) for rel_path in rel_paths]
+    for files_processed, (file_path, file_chunks, symbols) in enumerate(iter_chunked_files(file_paths), 1):
+        if progress:
+            progress(files_processed=files_processed)
+        rel_path = relative_path(file_path, repo_path)
+        extension = os.path.splitext(rel_path)[1].lower()
+        FILES.inc(extension=extension)
+        FILE_BYTES.inc(os.path.getsize(file_path), extension=extension)
+        CHUNKS.inc(len(file_chunks), extension=extension)
+        if any(chunk["metadata"].get("type") == "text_split" for chunk in file_chunks):
+            PARSE_FALLBACKS.inc(extension=extension)
+        ids = chunk_ids.setdefault(rel_path, [])
+        spans = []
+        for chunk in file_chunks:
+            ids.append(f"{rel_path}#{len(ids)}")
+            batch.append((ids[-1], chunk))
+            spans.append((ids[-1], chunk["metadata"].get("start_line"), chunk["metadata"].get("end_line")))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if symbol_index is not None:
+            symbol_index.add_file(rel_path, symbols, spans)
+    if batch:
+        yield batch
+
+def iter_prefetched(iterable, max_size=EMBED_QUEUE_BATCHES):
+    """
+    Runs an iterator on a background thread through a bounded queue, so producing the next items
+    overlaps with consuming the current ones while at most `max_size` items are buffered.
+    """
+    items = queue.Queue(maxsize=max_size)
+    stop = threading.Event()
+
+    def put(message):
+        while not stop.is_set():
+            try:
+                items.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(("item", item)):
+                    return
+            put(("done", None))
+        except BaseException as e:
+            put(("error", e))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            kind, value = items.get()
+            if kind == "done":
+                break
+            if kind == "error":
+                raise value
+            yield value
+    finally:
+        stop.set()
+        producer.join()
+
+# Embedding chunk batches and adding them to the index as they arrive
+def add_chunk_batches(vectordb, batches, embeddings, progress=None, lexical_index=None, token_counts=None):
+    from langchain_community.vectorstores import FAISS
+
+    added = 0
+    for batch in batches:
+        ids = [chunk_id for chunk_id, _ in batch]
+        texts = [chunk["content"] for _, chunk in batch]
+        metadatas = [dict(chunk["metadata"], chunk_id=chunk_id) for chunk_id, chunk in batch]
+        with timed("embed"):
+            text_embeddings = list(zip(texts, embeddings.embed_documents(texts)))
+        EMBEDDED_CHUNKS.inc(len(texts))
+        with timed("index_add"):
+            if vectordb is None:
+                vectordb = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=ids)
+            else:
+                vectordb.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        if lexical_index is not None:
+            lexical_index.add(ids, texts, metadatas)
+        if token_counts is not None:
+            token_counts.extend(metadata.get("tokens", 0) for metadata in metadatas)
+        added += len(batch)
+        if progress:
+            progress("embedding", chunks_processed=added)
+    return vectordb, added
+
+def build_index(repo_path, db_dir, embeddings, incremental=True, progress=None, index_type=None):
+    """
+    Builds or updates the FAISS index, with its lexical and symbol indexes, for a repository checkout.
+    When a manifest from a previous ingestion exists, only files whose blob hash changed are
+    re-chunked and re-embedded, and chunks of changed or deleted files are removed from the index.
+    `progress`, if given, is called as progress(stage, **counts) with the stage
+    (parsing/embedding/saving) and files_total/files_processed/chunks_processed counts.
+    `index_type` (flat/fp16/sq8/hnsw/ivfpq/auto) overrides the type recorded for the repository.
+    Returns the vector store and a dict of ingestion stats.
+    """
+    started = time.perf_counter()
+    index_path = os.path.join(db_dir, INDEX_DIRNAME)
+    file_paths, walk_stats = walk_repo_files(repo_path)
+    current_hashes = {relative_path(p, repo_path): git_blob_hash(p) for p in file_paths}
+    manifest = load_manifest(db_dir) if incremental and os.path.exists(index_path) else None
+    previous_index = manifest.get("index", {"type": "flat", "requested": INDEX_TYPE}) if manifest else {}
+    requested_type = index_type or previous_index.get("requested", INDEX_TYPE)
+    if requested_type not in INDEX_TYPES + ("auto",):
+        raise ValueError(f"Unknown index type {requested_type!r}; expected one of {', '.join(INDEX_TYPES)} or auto.")
+    fingerprint = embedding_fingerprint(embeddings)
+    if manifest is not None:
+        changed, removed = diff_manifest(manifest, current_hashes)
+        if manifest.get("embedding") != fingerprint:
+            logger.info(f"Embedding settings changed ({manifest.get('embedding')} -> {fingerprint}), "
+                        f"rebuilding {repo_path}")
+            manifest = None
+        elif requested_type != previous_index["requested"]:
+            logger.info(f"Index type changed to {requested_type}, rebuilding {repo_path}")
+            manifest = None
+        elif (changed or removed) and previous_index["type"] not in INCREMENTAL_INDEX_TYPES:
+            # Positional ids of HNSW/IVF indexes do not survive deletes; re-embedding is mostly cache hits
+            logger.info(f"{previous_index['type']} index cannot be updated in place, rebuilding {repo_path}")
+            manifest = None
+        elif manifest.get("generation") != current_generation(index_path):
+            # Saving stopped between the index and the manifest, so the manifest describes another generation
+            logger.info(f"Manifest does not match the saved index, rebuilding {repo_path}")
+            manifest = None
+
+    vectordb = None
+    # Side indexes are updated in a staging copy, so a failed ingestion leaves the working copies
+    # matching the saved generation and its manifest
+    staging_dir = os.path.join(db_dir, STAGING_DIRNAME)
+    if os.path.exists(staging_dir):
+        shutil.rmtree(staging_dir, onerror=remove_readonly)
+    if manifest is not None:
+        files = {path: entry for path, entry in manifest["files"].items()
+                 if path not in changed and path not in removed}
+        vectordb = load_index_for_update(index_path, embeddings)
+        stale_ids = [chunk_id for path in changed + removed
+                     for chunk_id in manifest["files"].get(path, {}).get("chunk_ids", [])]
+        side_dir = staging_dir if changed or removed else db_dir
+        if side_dir == staging_dir:
+            os.makedirs(staging_dir)
+            for filename in (LEXICAL_INDEX_FILENAME, SYMBOL_INDEX_FILENAME):
+                if os.path.exists(os.path.join(db_dir, filename)):
+                    copy_sqlite(os.path.join(db_dir, filename), os.path.join(staging_dir, filename))
+        lexical_index = LexicalIndex(side_dir)
+        symbol_index = SymbolIndex(side_dir)
+        if stale_ids:
+            vectordb.delete(stale_ids)
+            lexical_index.delete(stale_ids)
+        symbol_index.delete_files(changed + removed)
+        mode = "incremental"
+    else:
+        if not current_hashes:
+            raise ValueError(f"No supported files found in {repo_path}.")
+        side_dir = staging_dir
+        lexical_index = LexicalIndex(side_dir)
+        symbol_index = SymbolIndex(side_dir)
+        changed, removed, files = sorted(current_hashes), [], {}
+        mode = "full"
+
+    try:
+        stats = {"mode": mode, "files_indexed": len(changed), "files_removed": len(removed), "chunks_added": 0,
+                 "walk": walk_stats}
+        cache_before = embeddings.cache_stats() if hasattr(embeddings, "cache_stats") else None
+        if changed:
+            # file -> chunks -> embedding batches -> index, with bounded buffering between stages
+            chunk_ids = {}
+            if progress:
+                progress("parsing", files_total=len(changed))
+            batches = iter_prefetched(iter_chunk_batches(repo_path, changed, chunk_ids, progress=progress,
+                                                         symbol_index=symbol_index))
+            token_counts = []
+            vectordb, stats["chunks_added"] = add_chunk_batches(vectordb, batches, embeddings, progress, lexical_index,
+                                                                token_counts)
+            # Share of chunk tokens past the model's input limit (never embedded)
+            stats["truncation"] = truncation_report(token_counts)
+            for path in changed:
+                files[path] = {"blob": current_hashes[path], "chunk_ids": chunk_ids.get(path, [])}
+            chunks_by_extension = {}
+            for path, ids in chunk_ids.items():
+                extension = os.path.splitext(path)[1].lower()
+                chunks_by_extension[extension] = chunks_by_extension.get(extension, 0) + len(ids)
+            stats["chunks_by_extension"] = chunks_by_extension
+        if vectordb is None:
+            raise ValueError(f"No chunks could be created from {repo_path}.")
+
+        index_info = previous_index if mode == "incremental" else {"type": "flat", "requested": requested_type}
+        if mode == "full":
+            chosen_type = choose_index_type(vectordb.index.ntotal, requested_type)
+            if chosen_type != "flat":
+                if progress:
+                    progress("indexing")
+                index_info = {"type": chosen_type, "requested": requested_type,
+                              "report": convert_index(vectordb, chosen_type)}
+        stats["index_type"] = index_info["type"]
+
+        if cache_before is not None:
+            cache_after = embeddings.cache_stats()
+            stats["cache_hits"] = cache_after["hits"] - cache_before["hits"]
+            stats["cache_misses"] = cache_after["misses"] - cache_before["misses"]
+            EMBEDDING_CACHE.inc(stats["cache_hits"], result="hit")
+            EMBEDDING_CACHE.inc(stats["cache_misses"], result="miss")
+
+        if changed or removed or mode == "full":
+            if progress:
+                progress("saving")
+            os.makedirs(db_dir, exist_ok=True)
+            with timed("index_save"):
+                save_index(vectordb, index_path, {"lexical": lexical_index.path, "symbols": symbol_index.path})
+    except BaseException:
+        lexical_index.close()
+        symbol_index.close()
+        if side_dir == staging_dir:
+            shutil.rmtree(staging_dir, onerror=remove_readonly)
+        raise
+    lexical_index.close()
+    symbol_index.close()
+    if side_dir == staging_dir:
+        _swap_in_staged(db_dir, staging_dir, full=mode == "full")
+
+    commit = get_head_commit(repo_path)
+    if changed or removed or mode == "full" or manifest.get("commit") != commit:
+        save_manifest(db_dir, {"version": MANIFEST_VERSION, "commit": commit, "repo_path": repo_path,
+                               "index": index_info, "embedding": fingerprint,
+                               "chunkers": CHUNKER_VERSIONS, "generation": current_generation(index_path),
+                               "files": files})
+    stats["commit"] = commit
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    record_stage("ingest", stats["seconds"])
+    repo_label = os.path.basename(os.path.normpath(db_dir))
+    INDEX_VECTORS.set(vectordb.index.ntotal, repo=repo_label)
+    INDEX_BYTES.set(sum(entry.stat().st_size for entry in os.scandir(index_path) if entry.is_file()), repo=repo_label)
+    logger.info(f"{mode.capitalize()} ingestion of {repo_path}: {stats['files_indexed']} files indexed, "
+                f"{stats['files_removed']} removed, {stats['chunks_added']} chunks embedded "
+                f"{stats.get('chunks_by_extension', {})} in {stats['seconds']}s")
+    return vectordb, stats
+
+def _swap_in_staged(db_dir, staging_dir, full):
+    """
+    Moves the staged side indexes into the repository directory, after their generation was saved.
+    A full rebuild also removes everything else left from the previous build, except the index
+    directory, which is kept so its generation numbers keep growing and workers serving it reload.
+    """
+    if full:
+        for entry in os.scandir(db_dir):
+            if entry.name in (INDEX_DIRNAME, STAGING_DIRNAME, MANIFEST_FILENAME):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, onerror=remove_readonly)
+            else:
+                os.remove(entry.path)
+    for name in os.listdir(staging_dir):
+        os.replace(os.path.join(staging_dir, name), os.path.join(db_dir, name))
+    os.rmdir(staging_dir)
@@ -0,0 +1,178 @@
+# src/java_chunker.py
+import os
+import time
+import javalang
+from javalang.tokenizer import Separator
+from javalang.tree import (ClassDeclaration, InterfaceDeclaration, EnumDeclaration, AnnotationDeclaration,
+                           MethodDeclaration, ConstructorDeclaration, FieldDeclaration, ConstantDeclaration,
+                           MethodInvocation)
+from src.definition_chunker import definition, chunk_definitions, parse_once, item_definitions, line_scopes
+
+# Larger files and parses running longer than the timeout fall back to line-based chunks
+JAVA_PARSE_MAX_BYTES = int(os.environ.get("JAVA_PARSE_MAX_BYTES", str(512 * 1024)))
+JAVA_PARSE_TIMEOUT_SECONDS = float(os.environ.get("JAVA_PARSE_TIMEOUT_SECONDS", "5"))
+# Bumped whenever chunk boundaries, metadata or extracted symbols change, so indexed Java files are re-chunked
+CHUNKER_VERSION = 2
+
+TYPE_DECLARATIONS = (ClassDeclaration, InterfaceDeclaration, EnumDeclaration, AnnotationDeclaration)
+OPENING, CLOSING = "({[", ")}]"
+# Symbol index kinds of the item types
+SYMBOL_KINDS = {**dict.fromkeys((node_type.__name__ for node_type in TYPE_DECLARATIONS), "class"),
+                "MethodDeclaration": "method", "ConstructorDeclaration": "method"}
+
+class DeadlineParser(javalang.parser.Parser):
+    """javalang's parser, raising TimeoutError once the deadline has passed."""
+
+    def __init__(self, tokens, deadline):
+        super().__init__(tokens)
+        self.deadline = deadline
+
+    def accept(self, *accepts):
+        if time.perf_counter() > self.deadline:
+            raise TimeoutError("Java parse timed out")
+        return super().accept(*accepts)
+
+def parse_java(code, timeout=None):
+    """
+    Tokenizes and parses a Java compilation unit, returning (tree, tokens).
+    Raises ValueError for files over JAVA_PARSE_MAX_BYTES and TimeoutError once the timeout has passed.
+    Parsing the same file again, for its symbols after its chunks, reuses the result.
+    """
+    timeout = timeout or JAVA_PARSE_TIMEOUT_SECONDS
+    return parse_once(("java", code, JAVA_PARSE_MAX_BYTES, timeout), lambda: _parse_java(code, timeout))
+
+def _parse_java(code, timeout):
+    size = len(code.encode("utf-8"))
+    if size > JAVA_PARSE_MAX_BYTES:
+        raise ValueError(f"{size} bytes exceeds JAVA_PARSE_MAX_BYTES ({JAVA_PARSE_MAX_BYTES})")
+    deadline = time.perf_counter() + timeout
+    tokens = []
+    for token in javalang.tokenizer.tokenize(code):
+        tokens.append(token)
+        if len(tokens) % 1000 == 0 and time.perf_counter() > deadline:
+            raise TimeoutError("Java tokenization timed out")
+    return DeadlineParser(tokens, deadline).parse(), tokens
+
+def _extent(tokens, start, has_body):
+    """
+    Index of the last token of the declaration starting at token `start`: the closing brace of its body,
+    or the `;` ending it. Brackets are balanced so annotation arguments and initializers are skipped.
+    """
+    depth = 0
+    for i in range(start, len(tokens)):
+        if not isinstance(tokens[i], Separator):
+            continue
+        value = tokens[i].value
+        if value in OPENING:
+            depth += 1
+        elif value in CLOSING:
+            depth -= 1
+            if depth == 0 and value == "}" and has_body:
+                return i
+        elif value == ";" and depth == 0:
+            return i
+    return len(tokens) - 1
+
+def _has_body(node):
+    # Initializer blocks (`static { ... }`) are parsed as a list of statements
+    if isinstance(node, TYPE_DECLARATIONS + (ConstructorDeclaration, list)):
+        return True
+    return isinstance(node, MethodDeclaration) and node.body is not None
+
+def _body_start(tokens, start):
+    # Token after the type's opening brace (braces inside annotation arguments are skipped)
+    depth = 0
+    for i in range(start, len(tokens)):
+        if not isinstance(tokens[i], Separator):
+            continue
+        value = tokens[i].value
+        if value == "{" and depth == 0:
+            return i + 1
+        if value in "([":
+            depth += 1
+        elif value in ")]":
+            depth -= 1
+    return len(tokens)
+
+def _skip_separators(tokens, i):
+    # Stray semicolons between declarations
+    while i < len(tokens) and isinstance(tokens[i], Separator) and tokens[i].value == ";":
+        i += 1
+    return i
+
+def _declaration_items(tokens, declarations, start, prefix):
+    """
+    Items for the declarations of a compilation unit or type body, which follow each other from token `start`:
+    each one spans from the token after the previous one (its annotations and modifiers) to its end.
+    """
+    items = []
+    for node in declarations:
+        start = _skip_separators(tokens, start)
+        if start >= len(tokens):
+            break
+        end = _extent(tokens, start, _has_body(node))
+        start_line, end_line = tokens[start].position.line, tokens[end].position.line
+        if isinstance(node, TYPE_DECLARATIONS):
+            name = prefix + node.name
+            members = []
+            if isinstance(node, (ClassDeclaration, InterfaceDeclaration)):
+                # Members follow the type's opening brace; fields stay in its outline
+                body = _declaration_items(tokens, node.body, _body_start(tokens, start), name + ".")
+                members = [item for item in body if item["type"] != "Declarations"]
+            items.append(definition(type(node).__name__, name, start_line, end_line, members))
+        elif isinstance(node, (MethodDeclaration, ConstructorDeclaration)):
+            items.append(definition(type(node).__name__, prefix + node.name, start_line, end_line))
+        elif isinstance(node, (FieldDeclaration, ConstantDeclaration)):
+            items.append(definition("Declarations", ", ".join(d.name for d in node.declarators), start_line, end_line))
+        else:
+            # Package, imports and initializer blocks
+            name = getattr(node, "path", None) or getattr(node, "name", "")
+            items.append(definition("Declarations", name, start_line, end_line))
+        start = end + 1
+    return items
+
+def chunk_java_code(code, file_path, max_tokens=None, overlap_tokens=None):
+    """
+    Chunks a Java file from its javalang tree: one chunk per top-level type, with its annotations and
+    Javadoc, and the package and imports as declarations. A type too large for one chunk is emitted as
+    its methods, constructors and nested types (named `Outer.Inner.method`) plus an outline of its
+    fields and signatures. javalang only records where declarations start, so their ends are found
+    by matching brackets in the token stream.
+    Parse errors, oversized files and timeouts raise, so the caller can fall back to line-based chunks.
+    """
+    tree, tokens = parse_java(code)
+    return chunk_definitions(code, _items(tree, tokens), file_path, max_tokens, overlap_tokens)
+
+def _items(tree, tokens):
+    declarations = ([tree.package] if tree.package else []) + list(tree.imports) + list(tree.types)
+    return _declaration_items(tokens, declarations, 0, "")
+
+def analyze_java(code):
+    """
+    Definitions (the types, methods and constructors the chunker finds, qualified as `Outer.Inner.method`)
+    and references (imports and method calls, with the enclosing definition) in a Java file. javalang
+    records no position for instantiations (`new T()`), so they are not references.
+    """
+    tree, tokens = parse_java(code)
+    definitions = item_definitions(_items(tree, tokens), SYMBOL_KINDS)
+    scopes = line_scopes(definitions, code.count("\n") + 1)
+    references = [{"name": node.path, "kind": "import", "line": node.position.line, "scope": "<module>"}
+                  for node in tree.imports if node.position]
+    for _, node in tree.filter(MethodInvocation):
+        if node.position:
+            references.append({"name": node.member, "kind": "call", "line": node.position.line,
+                               "scope": scopes[node.position.line]})
+    references.sort(key=lambda r: r["line"])
+    return {"definitions": definitions, "references": references}
+
+# Usage: python -m src.java_chunker File.java [File.java ...]
+if __name__ == "__main__":
+    import sys
+
+    total_chunks, start = 0, time.perf_counter()
+    for path in sys.argv[1:]:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            file_chunks = chunk_java_code(f.read(), path)
+        total_chunks += len(file_chunks)
+        print(f"{path}: {len(file_chunks)} chunks")
+    print(f"{len(sys.argv) - 1} files, {total_chunks} chunks in {time.perf_counter() - start:.2f}s")
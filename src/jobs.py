@@ -0,0 +1,119 @@
+# src/jobs.py
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Ingestions running at once, and jobs allowed to wait behind them
+INGEST_MAX_CONCURRENT = int(os.environ.get("INGEST_MAX_CONCURRENT", "2"))
+INGEST_MAX_QUEUED = int(os.environ.get("INGEST_MAX_QUEUED", "16"))
+# Finished jobs kept around for status queries
+JOB_HISTORY = 100
+
+class JobQueueFull(Exception):
+    pass
+
+class IngestionJob:
+    def __init__(self, key, repo_url, options=None):
+        self.job_id = uuid.uuid4().hex
+        self.key = key
+        self.repo_url = repo_url
+        # Ingestion settings requested by the client, e.g. index_type
+        self.options = options or {}
+        self.status = "queued"
+        self.stage = "queued"
+        self.message = ""
+        self.repo = None
+        self.commit = None
+        self.files_total = 0
+        self.files_processed = 0
+        self.chunks_processed = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def update(self, stage=None, **counts):
+        """Progress callback: sets the current stage and job fields such as files_processed or chunks_processed."""
+        with self._lock:
+            if stage is not None:
+                self.stage = stage
+            for name, value in counts.items():
+                setattr(self, name, value)
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def to_dict(self):
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                "job_id": self.job_id,
+                "status": self.status,
+                "stage": self.stage,
+                "repo": self.repo,
+                "commit": self.commit,
+                "files_total": self.files_total,
+                "files_processed": self.files_processed,
+                "chunks_processed": self.chunks_processed,
+                "elapsed_seconds": round(end - (self.started_at or end), 3),
+                "queued_seconds": round((self.started_at or end) - self.created_at, 3),
+                "response": self.message,
+            }
+
+class JobManager:
+    """
+    Runs ingestion jobs on a bounded thread pool so request handlers return immediately.
+    `run(job)` must return a {"status", "message", ...} dict like initialize_vector_db does.
+    """
+
+    def __init__(self, run, max_concurrent=INGEST_MAX_CONCURRENT, max_queued=INGEST_MAX_QUEUED):
+        self.run = run
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="ingest")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, key, repo_url, **options):
+        """Queues an ingestion, or returns the active job already ingesting the same repository."""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and job.active:
+                    return job
+            if sum(job.active for job in self._jobs.values()) >= self.max_queued:
+                raise JobQueueFull(f"Too many ingestions in progress (limit {self.max_queued}).")
+            job = IngestionJob(key, repo_url, options)
+            self._jobs[job.job_id] = job
+            self._prune()
+        self._executor.submit(self._execute, job)
+        return job
+
+    def _execute(self, job):
+        job.started_at = time.time()
+        job.update(stage="starting", status="running")
+        try:
+            result = self.run(job)
+            job.update(stage="done", status="done" if result["status"] == "success" else "error",
+                       message=result["message"], repo=result.get("repo"))
+        except Exception as e:
+            logger.exception(f"Ingestion job {job.job_id} failed")
+            job.update(stage="done", status="error", message=f"Failed to ingest repository: {str(e)}")
+        finally:
+            job.finished_at = time.time()
+        logger.info(f"Ingestion job {job.job_id} for {job.repo_url} finished with status {job.status} "
+                    f"in {job.finished_at - job.started_at:.1f}s")
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
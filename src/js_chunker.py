@@ -0,0 +1,178 @@
+# src/js_chunker.py
+import os
+import time
+import esprima
+from src.definition_chunker import definition, chunk_definitions, parse_once, item_definitions, line_scopes
+
+# Larger files (typically bundles) and parses running longer than the timeout fall back to line-based chunks
+JS_PARSE_MAX_BYTES = int(os.environ.get("JS_PARSE_MAX_BYTES", str(512 * 1024)))
+JS_PARSE_TIMEOUT_SECONDS = float(os.environ.get("JS_PARSE_TIMEOUT_SECONDS", "5"))
+# Bumped whenever chunk boundaries, metadata or extracted symbols change, so indexed JavaScript files are re-chunked
+CHUNKER_VERSION = 2
+
+FUNCTION_TYPES = ("FunctionDeclaration", "FunctionExpression", "ArrowFunctionExpression")
+CLASS_TYPES = ("ClassDeclaration", "ClassExpression")
+MAX_CALLEE_NAME = 60
+# Symbol index kinds of the item types
+SYMBOL_KINDS = {**dict.fromkeys(FUNCTION_TYPES, "function"), **dict.fromkeys(CLASS_TYPES, "class"),
+                "MethodDefinition": "method", "Property": "method"}
+
+def parse_js(code, timeout=None):
+    """
+    Parses JavaScript as an ES module (with JSX), or as a classic script if it is not a valid module.
+    Raises ValueError for files over JS_PARSE_MAX_BYTES and TimeoutError once the timeout has passed.
+    Parsing the same file again, for its symbols after its chunks, reuses the result.
+    """
+    timeout = timeout or JS_PARSE_TIMEOUT_SECONDS
+    return parse_once(("js", code, JS_PARSE_MAX_BYTES, timeout), lambda: _parse_js(code, timeout))
+
+def _parse_js(code, timeout):
+    size = len(code.encode("utf-8"))
+    if size > JS_PARSE_MAX_BYTES:
+        raise ValueError(f"{size} bytes exceeds JS_PARSE_MAX_BYTES ({JS_PARSE_MAX_BYTES})")
+    deadline = time.perf_counter() + timeout
+
+    # Called for every node the parser creates, so the deadline is checked throughout the parse
+    def check_deadline(node, metadata):
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"parse exceeded {timeout}s")
+
+    options = {"loc": True, "range": True, "jsx": True}
+    try:
+        return esprima.parseModule(code, options, check_deadline)
+    except esprima.Error:
+        # Sloppy-mode scripts (with statements, legacy octal literals, ...) are not valid modules
+        return esprima.parseScript(code, options, check_deadline)
+
+def _source(code, node):
+    return code[node.range[0]:node.range[1]]
+
+def _key_name(code, key):
+    if key.type == "Identifier":
+        return key.name
+    if key.type == "Literal":
+        return str(key.value)
+    return _source(code, key)
+
+def _value_members(code, value, name):
+    # Methods of a class, or function-valued properties of an object literal
+    if value.type in CLASS_TYPES:
+        return [definition("MethodDefinition", f"{name}.{_key_name(code, method.key)}",
+                           method.loc.start.line, method.loc.end.line)
+                for method in value.body.body if method.type == "MethodDefinition"]
+    if value.type == "ObjectExpression":
+        return [definition("Property", f"{name}.{_key_name(code, prop.key)}", prop.loc.start.line, prop.loc.end.line)
+                for prop in value.properties
+                if prop.type == "Property" and prop.value.type in FUNCTION_TYPES + CLASS_TYPES]
+    return []
+
+def _wrapped_function(expression):
+    # IIFEs, UMD/AMD wrappers and callback registrations (describe(...), app.get(...), $(function ...))
+    while expression.type == "UnaryExpression":
+        expression = expression.argument
+    if expression.type not in ("CallExpression", "NewExpression"):
+        return None, None
+    functions = [node for node in [expression.callee] + list(expression.arguments) if node.type in FUNCTION_TYPES]
+    return (expression, functions[-1]) if functions else (None, None)
+
+def _statement_item(code, statement):
+    node = statement
+    if node.type in ("ExportNamedDeclaration", "ExportDefaultDeclaration") and node.declaration is not None:
+        node = node.declaration
+    start_line, end_line = statement.loc.start.line, statement.loc.end.line
+
+    if node.type in FUNCTION_TYPES + CLASS_TYPES:
+        name = node.id.name if getattr(node, "id", None) else "default"
+        return definition(node.type, name, start_line, end_line, _value_members(code, node, name))
+    if node.type == "VariableDeclaration":
+        names = [declarator.id.name if declarator.id.type == "Identifier" else _source(code, declarator.id)
+                 for declarator in node.declarations]
+        value = node.declarations[0].init if len(node.declarations) == 1 else None
+        if value is not None and value.type in FUNCTION_TYPES + CLASS_TYPES + ("ObjectExpression",):
+            members = _value_members(code, value, names[0])
+            # Plain object literals (configuration, constants) stay with the surrounding declarations
+            if value.type != "ObjectExpression" or members:
+                return definition(value.type, names[0], start_line, end_line, members)
+        return definition("Declarations", ", ".join(names), start_line, end_line)
+    if node.type == "ExpressionStatement":
+        expression = node.expression
+        if expression.type == "AssignmentExpression" and \
+                expression.right.type in FUNCTION_TYPES + CLASS_TYPES + ("ObjectExpression",):
+            name = _source(code, expression.left)
+            members = _value_members(code, expression.right, name)
+            if expression.right.type != "ObjectExpression" or members:
+                # e.g. module.exports.load = function, Foo.prototype.render = function
+                return definition(expression.right.type, name, start_line, end_line, members)
+        call, function = _wrapped_function(expression)
+        if call is not None:
+            callee = "" if call.callee.type in FUNCTION_TYPES else _source(code, call.callee)[:MAX_CALLEE_NAME]
+            members = [_statement_item(code, inner) for inner in function.body.body] \
+                if function.body.type == "BlockStatement" else []
+            return definition("CallExpression", callee, start_line, end_line, members)
+    if node.type == "ImportDeclaration":
+        return definition("Declarations", ", ".join(spec.local.name for spec in node.specifiers) or node.source.value,
+                          start_line, end_line)
+    return definition("Declarations", "", start_line, end_line)
+
+def chunk_js_code(code, file_path, max_tokens=None, overlap_tokens=None):
+    """
+    Chunks a JavaScript file from its esprima tree: one chunk per function and class (including ones bound
+    to variables, exports and assignments such as `module.exports.x = function`), one per top-level call
+    wrapping a function (IIFEs, `define(...)`, `describe(...)`), and runs of other statements grouped up
+    to the token budget. Oversized classes and wrappers are split into their methods or inner statements.
+    Parse errors, oversized files and timeouts raise, so the caller can fall back to line-based chunks.
+    """
+    tree = parse_js(code)
+    items = [_statement_item(code, statement) for statement in tree.body]
+    return chunk_definitions(code, items, file_path, max_tokens, overlap_tokens)
+
+def _nodes(tree):
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        yield node
+        for value in vars(node).values():
+            if isinstance(value, esprima.nodes.Node):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(item for item in value if isinstance(item, esprima.nodes.Node))
+
+def analyze_js(code):
+    """
+    Definitions (the functions, classes and methods the chunker finds, with dotted qualified names) and
+    references (imports, require() calls and call sites, with the enclosing definition) in a JavaScript file.
+    """
+    tree = parse_js(code)
+    definitions = item_definitions([_statement_item(code, statement) for statement in tree.body], SYMBOL_KINDS)
+    scopes = line_scopes(definitions, code.count("\n") + 1)
+    references = []
+
+    def reference(name, kind, node):
+        references.append({"name": name, "kind": kind, "line": node.loc.start.line, "scope": scopes[node.loc.start.line]})
+
+    for node in _nodes(tree):
+        if node.type == "ImportDeclaration":
+            reference(node.source.value, "import", node)
+        elif node.type in ("CallExpression", "NewExpression"):
+            callee = node.callee
+            if callee.type == "Identifier" and callee.name == "require" and node.arguments \
+                    and node.arguments[0].type == "Literal" and isinstance(node.arguments[0].value, str):
+                reference(node.arguments[0].value, "import", node)
+            elif callee.type == "Identifier":
+                reference(callee.name, "call", node)
+            elif callee.type == "MemberExpression" and not callee.computed and callee.property.type == "Identifier":
+                reference(callee.property.name, "call", node)
+    references.sort(key=lambda r: r["line"])
+    return {"definitions": definitions, "references": references}
+
+# Usage: python -m src.js_chunker file.js [file.js ...]
+if __name__ == "__main__":
+    import sys
+
+    total_chunks, start = 0, time.perf_counter()
+    for path in sys.argv[1:]:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            file_chunks = chunk_js_code(f.read(), path)
+        total_chunks += len(file_chunks)
+        print(f"{path}: {len(file_chunks)} chunks")
+    print(f"{len(sys.argv) - 1} files, {total_chunks} chunks in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,170 @@
+# src/lexical_index.py
+import os
+import re
+import logging
+import sqlite3
+import threading
+from langchain_core.retrievers import BaseRetriever
+from src.metrics import timed
+
+logger = logging.getLogger(__name__)
+
+LEXICAL_INDEX_FILENAME = "lexical.sqlite"
+# Candidates taken from each retriever before fusion, and the reciprocal rank fusion constant
+HYBRID_FETCH_K = int(os.environ.get("HYBRID_FETCH_K", "20"))
+RRF_K = 60
+
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+IDENTIFIER_PART_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+# Words that carry no lexical signal in natural-language questions about code
+STOPWORDS = frozenset("""
+a an and are as at be by can do does did for from how i in is it its me of on or show tell that the
+their there this to use used uses using was what when where which who why with would you your
+""".split())
+
+def split_identifier(identifier):
+    """Splits snake_case and camelCase identifiers into lowercase parts."""
+    return [part.lower() for piece in identifier.split("_") for part in IDENTIFIER_PART_RE.findall(piece)]
+
+def code_terms(text):
+    """Lowercase identifiers in a text, each followed by its snake/camel-case parts when it has several."""
+    terms = []
+    for identifier in IDENTIFIER_RE.findall(text):
+        terms.append(identifier.lower())
+        parts = split_identifier(identifier)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+def query_terms(query):
+    return list(dict.fromkeys(term for term in code_terms(query) if term not in STOPWORDS and len(term) > 1))
+
+def symbol_candidates(query):
+    """
+    Identifiers a question explicitly names: backticked names, call syntax like `foo()`, or a query
+    that is nothing but an identifier (optionally dotted, e.g. `Class.method`).
+    """
+    stripped = query.strip().strip("?`'\" ").rstrip("()")
+    if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*", stripped):
+        return [stripped.rsplit(".", 1)[-1]]
+    names = re.findall(r"`([A-Za-z_][A-Za-z0-9_.]*)(?:\(\))?`", query)
+    names += re.findall(r"\b([A-Za-z_][A-Za-z0-9_]*)\(\)", query)
+    return list(dict.fromkeys(name.rsplit(".", 1)[-1] for name in names))
+
+class LexicalIndex:
+    """
+    Per-repository lexical index stored in SQLite next to the FAISS index: an FTS5 table over code
+    terms (ranked with FTS5's built-in BM25) and a symbol table of chunk names for exact lookups.
+    Rows are keyed by the same chunk ids as the vector store, so incremental updates apply to both.
+    """
+
+    def __init__(self, db_dir, path=None):
+        # `path` opens the copy saved with an index generation, read-only, instead of the working index
+        self._lock = threading.Lock()
+        if path is not None:
+            self.path = path
+            self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            return
+        os.makedirs(db_dir, exist_ok=True)
+        self.path = os.path.join(db_dir, LEXICAL_INDEX_FILENAME)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(terms, chunk_id UNINDEXED, tokenize=\"unicode61 tokenchars '_'\")"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS symbols (name TEXT NOT NULL, chunk_id TEXT NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS symbols_chunk ON symbols (chunk_id)")
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def add(self, chunk_ids, texts, metadatas):
+        with self._lock:
+            self._db.executemany("INSERT INTO chunks (terms, chunk_id) VALUES (?, ?)", [
+                (" ".join(code_terms(text) + code_terms(metadata.get("name", ""))), chunk_id)
+                for chunk_id, text, metadata in zip(chunk_ids, texts, metadatas)
+            ])
+            self._db.executemany("INSERT INTO symbols (name, chunk_id) VALUES (?, ?)", [
+                (metadata["name"].lower(), chunk_id)
+                for chunk_id, metadata in zip(chunk_ids, metadatas) if metadata.get("name")
+            ])
+            self._db.commit()
+
+    def delete(self, chunk_ids):
+        with self._lock:
+            self._db.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+            self._db.executemany("DELETE FROM symbols WHERE chunk_id = ?", [(chunk_id,) for chunk_id in chunk_ids])
+            self._db.commit()
+
+    def search(self, query, k=HYBRID_FETCH_K):
+        """Returns up to k chunk ids ranked by BM25 over code terms."""
+        terms = query_terms(query)
+        if not terms:
+            return []
+        match = " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT chunk_id FROM chunks WHERE chunks MATCH ? ORDER BY bm25(chunks) LIMIT ?", (match, k)
+            ).fetchall()
+        return [chunk_id for (chunk_id,) in rows]
+
+    def lookup_symbols(self, names):
+        """Returns chunk ids whose chunk name exactly matches one of the names (case-insensitive)."""
+        if not names:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT chunk_id FROM symbols WHERE name IN ({','.join('?' * len(names))}) ORDER BY rowid",
+                [name.lower() for name in names]
+            ).fetchall()
+        return list(dict.fromkeys(chunk_id for (chunk_id,) in rows))
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda item: -scores[item])
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses BM25 lexical results with MMR vector results by reciprocal rank.
+    Questions that name a known symbol (e.g. "what does `load_repo` do?") are answered from the
+    symbol table alone, without an embedding call; `symbol_index`, if given, also resolves names
+    defined inside chunks, such as methods, to their defining chunk.
+    """
+
+    vectordb: object
+    lexical_index: object
+    symbol_index: object = None
+    k: int = 8
+    fetch_k: int = HYBRID_FETCH_K
+
+    def _docs_for_ids(self, chunk_ids):
+        docs = []
+        for chunk_id in chunk_ids:
+            doc = self.vectordb.docstore.search(chunk_id)
+            if doc is not None and not isinstance(doc, str):
+                docs.append(doc)
+        return docs
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        names = symbol_candidates(query)
+        with timed("symbol_lookup"):
+            symbol_ids = self.lexical_index.lookup_symbols(names)
+            if self.symbol_index is not None and names:
+                symbol_ids = list(dict.fromkeys(symbol_ids + self.symbol_index.definition_chunk_ids(names)))
+        if symbol_ids:
+            return self._docs_for_ids(symbol_ids[:self.k])
+
+        with timed("lexical_search"):
+            lexical_ids = self.lexical_index.search(query, self.fetch_k)
+        with timed("query_embed"):
+            embedding = self.vectordb.embeddings.embed_query(query)
+        with timed("faiss_search"):
+            vector_docs = self.vectordb.max_marginal_relevance_search_by_vector(embedding, k=self.fetch_k,
+                                                                                fetch_k=2 * self.fetch_k)
+        vector_ids = [doc.metadata["chunk_id"] for doc in vector_docs if "chunk_id" in doc.metadata]
+        return self._docs_for_ids(reciprocal_rank_fusion([vector_ids, lexical_ids])[:self.k])
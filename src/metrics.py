@@ -0,0 +1,136 @@
+# src/metrics.py
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+METRICS_PREFIX = "repochat_"
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    def __init__(self, name, help_text, kind):
+        self.name = METRICS_PREFIX + name
+        self.help_text = help_text
+        self.kind = kind
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text, "counter")
+
+    def inc(self, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def render(self):
+        with self._lock:
+            return self._header() + [f"{self.name}{_label_text(key)} {_number(value)}"
+                                     for key, value in sorted(self._values.items())]
+
+class Gauge(Counter):
+    def __init__(self, name, help_text):
+        Metric.__init__(self, name, help_text, "gauge")
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+class Histogram(Metric):
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, "histogram")
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                for bound, count in zip(self.buckets + ("+Inf",), counts):
+                    lines.append(f"{self.name}_bucket{_label_text(key + (('le', bound),))} {count}")
+                lines.append(f"{self.name}_sum{_label_text(key)} {_number(total)}")
+                lines.append(f"{self.name}_count{_label_text(key)} {counts[-1]}")
+        return lines
+
+STAGE_SECONDS = Histogram("stage_seconds", "Duration of ingestion and query stages.")
+FILES = Counter("ingested_files_total", "Files parsed and chunked during ingestion, by extension.")
+FILE_BYTES = Counter("ingested_bytes_total", "Bytes of source parsed during ingestion, by extension.")
+CHUNKS = Counter("chunks_total", "Chunks produced during ingestion, by extension.")
+PARSE_FALLBACKS = Counter("parse_fallbacks_total", "Files whose parser failed and were split by lines instead, by extension.")
+EMBEDDED_CHUNKS = Counter("embedded_chunks_total", "Chunks embedded during ingestion (cache hits included).")
+EMBEDDING_CACHE = Counter("embedding_cache_total", "Embedding cache lookups during ingestion, by result.")
+INDEX_VECTORS = Gauge("index_vectors", "Vectors in each repository's index after its last ingestion.")
+INDEX_BYTES = Gauge("index_bytes", "On-disk size of each repository's index after its last ingestion.")
+LLM_CALLS = Counter("llm_calls_total", "LLM calls, by status.")
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens reported by the provider, by direction.")
+CHAT_REQUESTS = Counter("chat_requests_total", "Chat messages answered, by endpoint and answer cache result.")
+CONTEXT_TOKENS = Counter("context_tokens_total", "Tokens of retrieved chunks and of the assembled prompt context.")
+
+ALL_METRICS = (STAGE_SECONDS, FILES, FILE_BYTES, CHUNKS, PARSE_FALLBACKS, EMBEDDED_CHUNKS, EMBEDDING_CACHE,
+               INDEX_VECTORS, INDEX_BYTES, LLM_CALLS, LLM_TOKENS, CHAT_REQUESTS, CONTEXT_TOKENS)
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    return "\n".join(line for metric in ALL_METRICS for line in metric.render()) + "\n"
+
+class Trace:
+    """Stages timed while handling one request, in the order they finished."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds, **extra):
+        with self._lock:
+            self.stages.append(dict({"stage": stage, "ms": round(1000 * seconds, 2)}, **extra))
+
+    def to_dict(self):
+        with self._lock:
+            return {"total_ms": round(1000 * (time.perf_counter() - self.started), 2), "stages": list(self.stages)}
+
+# The trace of the request being handled, if it asked for one; copied into threadpool calls
+current_trace = contextvars.ContextVar("current_trace", default=None)
+
+def start_trace():
+    trace = Trace()
+    current_trace.set(trace)
+    return trace
+
+def record_stage(stage, seconds, **extra):
+    """Records a stage duration in the histogram and in the current request's trace."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds, **extra)
+
+@contextmanager
+def timed(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
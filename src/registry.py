@@ -0,0 +1,190 @@
+# src/registry.py
+import os
+import logging
+import threading
+from collections import OrderedDict
+from src.indexer import INDEX_DIRNAME, load_manifest
+from src.helper import is_repo_id
+from src.chat_pipeline import wait_for_memory
+from src.index_store import current_generation, opened_generation, opened_files
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_MEMORY_BUDGET_MB = int(os.environ.get("REGISTRY_MEMORY_BUDGET_MB", "1024"))
+DEFAULT_SESSION = "default"
+
+def estimate_index_bytes(vectordb):
+    """
+    Rough resident size of a loaded FAISS store. For an opened generation, the sizes of its index file
+    (in the index type's own encoding: fp16/sq8 codes, HNSW links, IVF-PQ codes and centroids) and of
+    its SQLite docstore, which are resident once searched, memory-mapped or in the page cache; stores
+    loaded into memory (the pickled format) are serialized to measure them. IVF indexes add the direct
+    map built when opening.
+    """
+    import faiss
+    from src.index_types import index_bytes
+
+    index = vectordb.index
+    files = opened_files(vectordb)
+    if files is not None:
+        size = sum(os.path.getsize(path) for path in files)
+    else:
+        size = index_bytes(index)
+        docstore = getattr(vectordb.docstore, "_dict", {})
+        size += sum(len(doc.page_content) for doc in docstore.values())
+    if faiss.try_extract_index_ivf(index) is not None:
+        size += index.ntotal * 8
+    return size
+
+class LoadedRepo:
+    def __init__(self, repo_hash, vectordb, retriever, commit=None, generation=None):
+        self.repo_hash = repo_hash
+        self.vectordb = vectordb
+        self.retriever = retriever
+        # Indexed commit SHA from the manifest, part of the answer cache key
+        self.commit = commit
+        # Index generation on disk this copy was opened from; a newer one means another process re-ingested
+        self.generation = generation
+        self.size_bytes = estimate_index_bytes(vectordb)
+        # One conversational chain (and memory) per chat session
+        self.chains = {}
+
+class RepoRegistry:
+    """
+    Keeps loaded repository indexes in an LRU bounded by an estimated memory budget.
+    Indexes are loaded lazily from `<persist_directory>/<repo_hash>/faiss_index`, and each
+    (repo, session) pair gets its own chat chain so many repos and users can be served at once.
+    A repo re-ingested by another worker process is reopened when its index generation on disk changes.
+    """
+
+    def __init__(self, persist_directory, load_index, make_retriever, make_chain,
+                 memory_budget_bytes=REGISTRY_MEMORY_BUDGET_MB * 1024 * 1024):
+        self.persist_directory = persist_directory
+        self.load_index = load_index
+        self.make_retriever = make_retriever
+        self.make_chain = make_chain
+        self.memory_budget_bytes = memory_budget_bytes
+        self.default_repo = None
+        self._repos = OrderedDict()
+        self._lock = threading.RLock()
+        self._loading_locks = {}
+
+    def db_dir(self, repo_hash):
+        # Repo hashes come from requests; never let one name a path outside persist_directory or a cache in it
+        if not is_repo_id(repo_hash):
+            raise ValueError(f"Invalid repository id {repo_hash!r}")
+        return os.path.join(self.persist_directory, repo_hash)
+
+    def exists(self, repo_hash):
+        with self._lock:
+            if repo_hash in self._repos:
+                return True
+        return os.path.exists(self.index_path(repo_hash))
+
+    def is_known(self, repo_hash):
+        """Whether `repo_hash` names an ingested repository (loaded, indexed or with a manifest)."""
+        return is_repo_id(repo_hash) and (self.exists(repo_hash) or load_manifest(self.db_dir(repo_hash)) is not None)
+
+    def repo_path(self, repo_hash):
+        manifest = load_manifest(self.db_dir(repo_hash))
+        return manifest.get("repo_path") if manifest else None
+
+    def index_path(self, repo_hash):
+        return os.path.join(self.db_dir(repo_hash), INDEX_DIRNAME)
+
+    def put(self, repo_hash, vectordb=None):
+        """
+        Registers a freshly built index, replacing any loaded copy and its sessions.
+        Without `vectordb` the index is reopened from disk, so the builder's in-memory copy can be freed.
+        """
+        if vectordb is None:
+            vectordb = self.load_index(self.index_path(repo_hash))
+        with self._lock:
+            self._repos.pop(repo_hash, None)
+            self._repos[repo_hash] = self._loaded(repo_hash, vectordb)
+            self.default_repo = repo_hash
+            self._evict()
+
+    def _loaded(self, repo_hash, vectordb):
+        manifest = load_manifest(self.db_dir(repo_hash)) or {}
+        generation = opened_generation(vectordb) or current_generation(self.index_path(repo_hash))
+        return LoadedRepo(repo_hash, vectordb, self.make_retriever(self.db_dir(repo_hash), vectordb),
+                          commit=manifest.get("commit"), generation=generation)
+
+    def _get(self, repo_hash):
+        generation = current_generation(self.index_path(repo_hash))
+        with self._lock:
+            loaded = self._repos.get(repo_hash)
+            if loaded is not None and loaded.generation == generation:
+                self._repos.move_to_end(repo_hash)
+                return loaded
+            if loaded is not None:
+                # Re-ingested by another worker process: drop this copy and its sessions, open the new one
+                logger.info(f"Index for {repo_hash} changed on disk (generation {generation}), reloading")
+                self._repos.pop(repo_hash)
+            loading_lock = self._loading_locks.setdefault(repo_hash, threading.Lock())
+        # Load outside the registry lock so other repos stay available meanwhile
+        with loading_lock:
+            with self._lock:
+                if repo_hash in self._repos:
+                    return self._repos[repo_hash]
+            index_path = self.index_path(repo_hash)
+            if not os.path.exists(index_path):
+                raise KeyError(repo_hash)
+            logger.info(f"Loading index for {repo_hash} from {index_path}")
+            loaded = self._loaded(repo_hash, self.load_index(index_path))
+            with self._lock:
+                self._repos[repo_hash] = loaded
+                self._loading_locks.pop(repo_hash, None)
+                self._evict()
+            return loaded
+
+    def get_vectordb(self, repo_hash):
+        return self._get(repo_hash).vectordb
+
+    def commit(self, repo_hash):
+        return self._get(repo_hash).commit
+
+    def get_retriever(self, repo_hash):
+        return self._get(repo_hash).retriever
+
+    def get_chain(self, repo_hash, session_id=DEFAULT_SESSION):
+        loaded = self._get(repo_hash)
+        with self._lock:
+            chain = loaded.chains.get(session_id)
+            if chain is None:
+                chain = loaded.chains[session_id] = self.make_chain(loaded.retriever)
+            return chain
+
+    def clear_session(self, repo_hash, session_id=DEFAULT_SESSION):
+        with self._lock:
+            loaded = self._repos.get(repo_hash)
+            chain = loaded.chains.get(session_id) if loaded else None
+            if chain is None:
+                return False
+        # A background update finishing after the clear would bring the last exchange back
+        wait_for_memory(chain)
+        chain.memory.clear()
+        return True
+
+    def remove(self, repo_hash):
+        with self._lock:
+            self._repos.pop(repo_hash, None)
+            if self.default_repo == repo_hash:
+                self.default_repo = None
+
+    def _evict(self):
+        total = sum(loaded.size_bytes for loaded in self._repos.values())
+        # The most recently used repo always stays loaded, even if it alone exceeds the budget
+        while total > self.memory_budget_bytes and len(self._repos) > 1:
+            repo_hash, loaded = self._repos.popitem(last=False)
+            total -= loaded.size_bytes
+            logger.info(f"Evicted index for {repo_hash} ({loaded.size_bytes // 1024} KiB) from memory")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": [{"repo": loaded.repo_hash, "bytes": loaded.size_bytes, "sessions": len(loaded.chains)}
+                           for loaded in self._repos.values()],
+                "budget_bytes": self.memory_budget_bytes,
+            }
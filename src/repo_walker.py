@@ -0,0 +1,170 @@
+# src/repo_walker.py
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Directory names never worth indexing: VCS metadata, dependencies, build output and caches
+DEFAULT_EXCLUDES = (
+    ".git", ".hg", ".svn", "node_modules", "bower_components", "vendor", "third_party",
+    "build", "dist", "out", "target", "bin", "obj", "__pycache__", ".venv", "venv", "env",
+    ".tox", ".mypy_cache", ".pytest_cache", ".idea", ".vscode", ".gradle", ".next", "coverage",
+)
+INGEST_EXCLUDE = tuple(name.strip() for name in os.environ.get("INGEST_EXCLUDE", "").split(",") if name.strip())
+MAX_FILE_BYTES = int(os.environ.get("INGEST_MAX_FILE_BYTES", str(1024 * 1024)))
+
+# Bytes sampled from each file for binary and minified detection
+SAMPLE_BYTES = 8192
+MINIFIED_SUFFIXES = (".min.js", ".min.css", ".bundle.js")
+MINIFIED_AVG_LINE_LENGTH = 300
+
+def _glob_to_regex(pattern):
+    i, regex = 0, ""
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            regex += "/.*"
+            i += 3
+        elif pattern[i] == "*":
+            regex += "[^/]*"
+            i += 1
+        elif pattern[i] == "?":
+            regex += "[^/]"
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(pattern[i])
+                i += 1
+            else:
+                regex += "[" + pattern[i + 1:end].replace("!", "^", 1) + "]"
+                i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    return re.compile(regex + r"\Z")
+
+class GitIgnore:
+    """
+    Minimal .gitignore matcher: supports comments, negation, directory-only patterns,
+    anchored patterns and `**`. Rules from nested .gitignore files apply below their directory,
+    and the last matching rule wins.
+    """
+
+    def __init__(self):
+        self.rules = []
+
+    def add_file(self, gitignore_path, base_dir=""):
+        try:
+            with open(gitignore_path, 'r', encoding='utf-8', errors='ignore') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            anchored = "/" in line
+            self.rules.append((base_dir, _glob_to_regex(line.lstrip("/")), negate, dir_only, anchored))
+
+    def ignored(self, rel_path, is_dir):
+        result = False
+        for base_dir, regex, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base_dir:
+                if not rel_path.startswith(base_dir + "/"):
+                    continue
+                sub_path = rel_path[len(base_dir) + 1:]
+            else:
+                sub_path = rel_path
+            target = sub_path if anchored else sub_path.rsplit("/", 1)[-1]
+            if regex.match(target):
+                result = not negate
+        return result
+
+def classify_sample(file_name, sample):
+    """Returns a skip reason ("binary" or "minified") for a file's leading bytes, or None."""
+    if b"\0" in sample:
+        return "binary"
+    if file_name.endswith(MINIFIED_SUFFIXES):
+        return "minified"
+    if len(sample) >= SAMPLE_BYTES // 2 and len(sample) / (sample.count(b"\n") + 1) > MINIFIED_AVG_LINE_LENGTH:
+        return "minified"
+    return None
+
+def walk_repo(repo_path, extensions, excludes=None, max_file_bytes=MAX_FILE_BYTES):
+    """
+    Walks a repository once with os.scandir, honoring .gitignore files and an exclude list of
+    directory/file names, and skipping binary, minified and oversized files.
+    Returns (file_paths, stats) where file_paths are in a deterministic (sorted, depth-first) order
+    and stats holds per-extension file/byte counts and skip counts by reason.
+    """
+    excludes = set(DEFAULT_EXCLUDES + INGEST_EXCLUDE if excludes is None else excludes)
+    extensions = tuple(extensions)
+    stats = {"by_extension": {}, "skipped": {}}
+    gitignore = GitIgnore()
+    files = []
+
+    def skip(reason):
+        stats["skipped"][reason] = stats["skipped"].get(reason, 0) + 1
+
+    def walk(dir_path, rel_dir):
+        if os.path.isfile(os.path.join(dir_path, ".gitignore")):
+            gitignore.add_file(os.path.join(dir_path, ".gitignore"), rel_dir)
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning(f"Cannot read directory {dir_path}: {e}")
+            return
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name in excludes:
+                    skip("excluded")
+                elif gitignore.ignored(rel_path, True):
+                    skip("gitignored")
+                else:
+                    walk(entry.path, rel_path)
+                continue
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            extension = os.path.splitext(entry.name)[1].lower()
+            if extension not in extensions:
+                continue
+            if entry.name in excludes:
+                skip("excluded")
+                continue
+            if gitignore.ignored(rel_path, False):
+                skip("gitignored")
+                continue
+            size = entry.stat(follow_symlinks=False).st_size
+            if size > max_file_bytes:
+                skip("oversized")
+                continue
+            try:
+                with open(entry.path, 'rb') as f:
+                    reason = classify_sample(entry.name, f.read(SAMPLE_BYTES))
+            except OSError:
+                reason = "unreadable"
+            if reason:
+                skip(reason)
+                continue
+            counts = stats["by_extension"].setdefault(extension, {"files": 0, "bytes": 0})
+            counts["files"] += 1
+            counts["bytes"] += size
+            files.append(entry.path)
+
+    walk(repo_path, "")
+    return files, stats
@@ -1,43 +1,76 @@
 # src/route_handlers.py
 from fastapi import APIRouter, HTTPException, Form
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 import os
 import shutil
-import re
-from src.helper import repo_ingestion, load_repo, function_class_chunker, get_repo_hash, remove_readonly
+from src.helper import repo_ingestion, get_repo_hash, remove_readonly
+from src.indexer import build_index
+from src.embedding_cache import CachedEmbeddings
+from src.embeddings import LocalEmbeddings, EMBEDDING_PRELOAD, cache_model_name
+from src.registry import RepoRegistry, DEFAULT_SESSION
+from src.jobs import JobManager, JobQueueFull
+from src.chat_pipeline import (iter_sse_answer, iter_sse_cached, sse_event, has_history, remember_in_background,
+                               run_chat, make_chain as make_chat_chain, llm_stats)
+from src.answer_cache import AnswerCache
+from src.fake_llm import load_fake_llm
+from src.index_store import open_index, opened_side_index, side_index_file
+from src.lexical_index import LexicalIndex, HybridRetriever
+from src.symbol_index import SymbolIndex, SYMBOL_INDEX_FILENAME
+from src.context_assembler import ContextAssemblingRetriever
+from src.metrics import render_prometheus, start_trace, timed, STAGE_SECONDS, CHAT_REQUESTS
 from pydantic import BaseModel
 from typing import Optional
 
+# "groq" for the hosted model, "fake" for the local streaming fake used offline and in testing
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "groq")
+
 # Global variables
-qa = None
-current_repo_hash = None
-current_repo_path = None
+registry = None
 _embeddings = None
+# Near-duplicate matching (ANSWER_CACHE_SIMILARITY) embeds questions with the same model as the index
+answer_cache = AnswerCache(embed_query=lambda question: get_embeddings().embed_query(question))
 
 class ChatRequest(BaseModel):
     msg: str
+    # Repository name or URL returned by /api/repository; defaults to the last ingested one
+    repo: Optional[str] = None
+    session_id: Optional[str] = None
+    # Return per-stage timings (retrieval, LLM calls, ...) of this message in the response
+    trace: bool = False
 
 class RepoRequest(BaseModel):
     question: str
+    # flat, fp16, sq8, hnsw, ivfpq or auto; defaults to the repository's previous choice or INDEX_TYPE
+    index_type: Optional[str] = None
 
 def get_embeddings():
     global _embeddings
     if _embeddings is None:
-        from langchain_huggingface import HuggingFaceEmbeddings
-        _embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        # Chunks embedded before (by any repository) are served from the on-disk cache
+        _embeddings = CachedEmbeddings(LocalEmbeddings(), model_name=cache_model_name())
     return _embeddings
 
 def setup_routes(app, persist_directory):
-    global qa, current_repo_hash, current_repo_path
+    global registry
+
+    if EMBEDDING_PRELOAD:
+        # Load the embedding model before serving, so the first ingestion or chat does not pay for it
+        app.add_event_handler("startup", lambda: get_embeddings().embed_query("warm up"))
 
     def load_llm():
+        if LLM_PROVIDER == "fake":
+            llm = load_fake_llm()
+            llm.callbacks = [llm_stats]
+            return llm
         from langchain_groq import ChatGroq
         return ChatGroq(
             model="llama3-70b-8192",
             temperature=0.5,
             max_tokens=512,
             timeout=10,
-            max_retries=2
+            max_retries=2,
+            callbacks=[llm_stats]
         )
 
     # Custom prompt template for code Q&A
@@ -66,55 +99,66 @@ Question:
 Provide the answer in clear, simple language with a professional tone, formatted entirely in Markdown.
     """
 
-    def initialize_vector_db(repo_url=None, repo_path=None):
-        global qa, current_repo_hash, current_repo_path
-        from langchain.memory import ConversationSummaryMemory
-        from langchain.chains import ConversationalRetrievalChain
-        from langchain_community.vectorstores import FAISS
-        from langchain_core.prompts import PromptTemplate
-
-        if qa is not None:
-            qa = None
-        llm = load_llm()
-        memory = ConversationSummaryMemory(llm=llm, memory_key="chat_history", return_messages=True)
+    def make_retriever(db_dir, vectordb):
+        # Lexical (BM25 + symbol) results fused with MMR vector search, merged into token-budgeted context.
+        # The lexical and symbol indexes are the copies saved with the vector index's generation.
+        lexical_index = LexicalIndex(db_dir, opened_side_index(vectordb, "lexical"))
+        symbol_index = SymbolIndex(db_dir, opened_side_index(vectordb, "symbols"))
+        return ContextAssemblingRetriever(retriever=HybridRetriever(
+            vectordb=vectordb, lexical_index=lexical_index, symbol_index=symbol_index, k=8))
+
+    def make_chain(retriever):
+        # Memory type (CHAT_MEMORY) decides how many LLM calls each message costs
+        return make_chat_chain(load_llm(), retriever, CUSTOM_PROMPT_TEMPLATE)
+
+    def load_index(index_path):
+        # Memory-mapped where the index type allows it, so every worker process shares one copy
+        with timed("index_load"):
+            return open_index(index_path, get_embeddings())
+
+    registry = RepoRegistry(persist_directory, load_index, make_retriever, make_chain)
+
+    def initialize_vector_db(repo_url=None, repo_path=None, progress=None, index_type=None):
         try:
-            embeddings = get_embeddings()
-            if repo_url:
-                repo_hash = get_repo_hash(repo_url)
-                db_path = os.path.join(persist_directory, repo_hash, "faiss_index")
-                current_repo_hash = repo_hash
-                current_repo_path = repo_path
-                if os.path.exists(db_path):
-                    shutil.rmtree(os.path.join(persist_directory, repo_hash), onerror=remove_readonly)
-                if repo_path:
-                    documents = load_repo(repo_path)
-                    text_chunks = function_class_chunker(documents)
-                    vectordb = FAISS.from_documents(documents=text_chunks, embedding=embeddings)
-                    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-                    vectordb.save_local(db_path)
-                else:
-                    return {"status": "error", "message": "No repository path provided for new ingestion."}
-            elif current_repo_hash:
-                db_path = os.path.join(persist_directory, current_repo_hash, "faiss_index")
-                if os.path.exists(db_path):
-                    vectordb = FAISS.load_local(db_path, embeddings, allow_dangerous_deserialization=True)
-                else:
-                    return {"status": "error", "message": "No existing vector DB found for current repository."}
-            else:
-                return {"status": "error", "message": "No repository URL or existing vector DB found."}
-            qa = ConversationalRetrievalChain.from_llm(
-                llm,
-                retriever=vectordb.as_retriever(search_type="mmr", search_kwargs={"k": 8}),
-                memory=memory,
-                combine_docs_chain_kwargs={"prompt": PromptTemplate(
-                    template=CUSTOM_PROMPT_TEMPLATE,
-                    input_variables=["context", "question"]
-                )}
-            )
-            return {"status": "success", "message": "Vector DB initialized successfully"}
+            if not repo_url:
+                return {"status": "error", "message": "No repository URL provided."}
+            if not repo_path:
+                return {"status": "error", "message": "No repository path provided for new ingestion."}
+            repo_hash = get_repo_hash(repo_url)
+            # Re-ingestion only re-embeds files changed since the last indexed state
+            _, stats = build_index(repo_path, registry.db_dir(repo_hash), get_embeddings(),
+                                   progress=progress, index_type=index_type)
+            # Serve the saved (memory-mapped) index rather than the in-memory copy used for building
+            registry.put(repo_hash)
+            answer_cache.invalidate(repo_hash)
+            return {"status": "success", "repo": repo_hash, "message": (
+                f"Vector DB initialized successfully ({stats['mode']} ingestion: "
+                f"{stats['files_indexed']} files indexed, {stats['files_removed']} removed, {stats['index_type']} index, "
+                f"embedding cache {stats.get('cache_hits', 0)} hits / {stats.get('cache_misses', 0)} misses)"
+            )}
         except Exception as e:
             return {"status": "error", "message": f"Failed to initialize Vector DB: {str(e)}"}
 
+    def resolve_repo(repo):
+        """
+        Repo hash for a request's `repo`: a repository URL or a hash returned by /api/repository.
+        Returns None for anything that is not an ingested repository.
+        """
+        if not repo:
+            return registry.default_repo
+        if repo.startswith(("http://", "https://", "file://")):
+            repo = get_repo_hash(repo)
+        return repo if registry.is_known(repo) else None
+
+    def remove_tree(path, root):
+        # Only ever deletes a directory strictly inside `root`, never `root`, an ancestor or the index store
+        path, root = os.path.realpath(path), os.path.realpath(root)
+        persist = os.path.realpath(persist_directory)
+        if path == root or os.path.commonpath([path, root]) != root or os.path.commonpath([path, persist]) == path:
+            raise ValueError(f"Refusing to delete {path}: not inside {root}")
+        if os.path.exists(path):
+            shutil.rmtree(path, onerror=remove_readonly)
+
     # Create API router
     router = APIRouter()
 
@@ -134,64 +178,152 @@ Provide the answer in clear, simple language with a professional tone, formatted
         </html>
         """
 
+    def run_ingestion(job):
+        # Runs on the ingestion pool: clone, then parse/embed/save with progress reported on the job
+        job.update("cloning")
+        with timed("clone"):
+            repo_result = repo_ingestion(job.repo_url)
+        if repo_result["status"] == "error":
+            return repo_result
+        job.update(commit=repo_result["commit"])
+        return initialize_vector_db(repo_url=job.repo_url, repo_path=repo_result["repo_path"],
+                                    progress=job.update, index_type=job.options.get("index_type"))
+
+    jobs = JobManager(run_ingestion)
+
     @router.post("/api/repository")
     async def ingest_repository(request: RepoRequest):
-        global qa, current_repo_hash
         user_input = request.question
-        repo_result = repo_ingestion(user_input)
-        
-        if repo_result["status"] == "error":
-            if "Repository already exists" in repo_result["message"]:
-                match = re.search(r"at (.+)", repo_result["message"])
-                repo_path = match.group(1) if match else None
-                if repo_path:
-                    repo_hash = get_repo_hash(user_input)
-                    old_db_path = os.path.join(persist_directory, repo_hash, "faiss_index")
-                    if os.path.exists(old_db_path):
-                        shutil.rmtree(os.path.join(persist_directory, repo_hash), onerror=remove_readonly)
-                    init_result = initialize_vector_db(repo_url=user_input, repo_path=repo_path)
-                    return {"response": init_result["message"] if init_result["status"] == "success" else repo_result["message"]}
-                return {"response": "Could not determine repository path. Please ingest a new repository."}
-            return {"response": repo_result["message"]}
-        
-        init_result = initialize_vector_db(repo_url=user_input, repo_path=repo_result["repo_path"])
-        return {"response": init_result["message"]}
+        try:
+            job = jobs.submit(get_repo_hash(user_input), user_input, index_type=request.index_type)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        return {"response": "Repository ingestion started.", "type": "job", "job_id": job.job_id}
+
+    @router.get("/api/jobs/{job_id}")
+    async def job_status(job_id: str):
+        job = jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Unknown job id.")
+        return job.to_dict()
+
+    def chat_response(trace, include_trace, cache_result, **response):
+        trace_dict = trace.to_dict()
+        STAGE_SECONDS.observe(trace_dict["total_ms"] / 1000, stage="chat")
+        CHAT_REQUESTS.inc(endpoint="chat", cache=cache_result)
+        if include_trace:
+            response["trace"] = trace_dict
+        return response
 
     @router.post("/api/chat")
     async def chat(request: ChatRequest):
-        global qa, current_repo_hash, current_repo_path
         msg = request.msg
-        
+        repo_hash = resolve_repo(request.repo)
+        session_id = request.session_id or DEFAULT_SESSION
+
         if msg == "clear_chat":
-            if qa:
-                qa.memory.clear()
+            if repo_hash and registry.clear_session(repo_hash, session_id):
                 return {"response": "", "type": "chat"}
             return {"response": "No chat history to clear.", "type": "chat"}
-        
+
         if msg in ("new_chat", "clear_repo"):
-            if current_repo_hash:
-                repo_dir = os.path.join(persist_directory, current_repo_hash)
-                if os.path.exists(repo_dir):
-                    shutil.rmtree(repo_dir, onerror=remove_readonly)
-            if current_repo_path and os.path.exists(current_repo_path):
-                shutil.rmtree(current_repo_path, onerror=remove_readonly)
-            qa = None
-            current_repo_hash = None
-            current_repo_path = None
+            if repo_hash:
+                repo_path = registry.repo_path(repo_hash)
+                registry.remove(repo_hash)
+                answer_cache.invalidate(repo_hash)
+                try:
+                    remove_tree(registry.db_dir(repo_hash), persist_directory)
+                    # Checkouts live under the working directory (<user>/<repo> or local/<repo>)
+                    if repo_path:
+                        remove_tree(repo_path, os.getcwd())
+                except ValueError as e:
+                    return {"response": str(e), "type": "error"}
             return {"response": "", "type": "repo"}
-        
-        if not qa:
+
+        if not repo_hash or not registry.exists(repo_hash):
             return {"response": "Vector DB not initialized. Please ingest a repository first.", "type": "error"}
-        
+
+        # Stages timed in the threadpool calls below land in this trace (contextvars are copied into them)
+        trace = start_trace()
         try:
-            result = qa(msg)
-            return {"response": result["answer"], "type": "answer"}
+            # Index loading, retrieval and the LLM calls all block, so keep them off the event loop
+            qa = await run_in_threadpool(registry.get_chain, repo_hash, session_id)
+            # Only standalone questions are cached; follow-ups depend on the session's history
+            cacheable = not has_history(qa)
+            if cacheable:
+                commit = registry.commit(repo_hash)
+                hit = await run_in_threadpool(answer_cache.get, repo_hash, commit, msg)
+                if hit is not None:
+                    entry, cache_info = hit
+                    remember_in_background(qa, msg, entry.answer)
+                    return chat_response(trace, request.trace, "hit", response=entry.answer, type="answer",
+                                         cache=cache_info)
+            result = await run_in_threadpool(run_chat, qa, msg)
+            if cacheable:
+                await run_in_threadpool(answer_cache.put, repo_hash, commit, msg, result["answer"])
+            return chat_response(trace, request.trace, "miss", response=result["answer"], type="answer",
+                                 cache={"hit": False})
         except Exception as e:
             return {"response": f"Error processing chat: {str(e)}", "type": "error"}
 
+    def sse_error(message):
+        # A single `error` event, as the streaming client expects instead of an HTTP error
+        return StreamingResponse(iter([sse_event("error", {"response": message, "type": "error"})]),
+                                 media_type="text/event-stream")
+
+    @router.post("/api/chat/stream")
+    async def chat_stream(request: ChatRequest):
+        repo_hash = resolve_repo(request.repo)
+        if not repo_hash or not registry.exists(repo_hash):
+            return sse_error("Vector DB not initialized. Please ingest a repository first.")
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        on_answer = None
+        try:
+            qa = await run_in_threadpool(registry.get_chain, repo_hash, request.session_id or DEFAULT_SESSION)
+            if not has_history(qa):
+                commit = registry.commit(repo_hash)
+                hit = await run_in_threadpool(answer_cache.get, repo_hash, commit, request.msg)
+                if hit is not None:
+                    entry, cache_info = hit
+                    CHAT_REQUESTS.inc(endpoint="stream", cache="hit")
+                    remember_in_background(qa, request.msg, entry.answer)
+                    return StreamingResponse(iter_sse_cached(entry.answer, cache_info),
+                                             media_type="text/event-stream", headers=headers)
+                on_answer = lambda answer: answer_cache.put(repo_hash, commit, request.msg, answer)
+        except Exception as e:
+            return sse_error(f"Error processing chat: {str(e)}")
+        CHAT_REQUESTS.inc(endpoint="stream", cache="miss")
+        # StreamingResponse iterates sync generators in a worker thread
+        return StreamingResponse(iter_sse_answer(qa, request.msg, on_answer=on_answer,
+                                                 done_extra={"cache": {"hit": False}}),
+                                 media_type="text/event-stream", headers=headers)
+
+    @router.get("/api/symbols")
+    async def symbols(name: str, repo: Optional[str] = None, kind: str = "definitions"):
+        # Answered from the precomputed symbol table, without loading the vector index or calling the LLM
+        if kind not in ("definitions", "callers", "importers"):
+            raise HTTPException(status_code=400, detail="kind must be definitions, callers or importers.")
+        repo_hash = resolve_repo(repo)
+        # The current generation's copy; indexes saved before side indexes were versioned use the working file
+        symbols_path = side_index_file(registry.index_path(repo_hash), "symbols") if repo_hash else None
+        if not repo_hash or not os.path.exists(
+                symbols_path or os.path.join(registry.db_dir(repo_hash), SYMBOL_INDEX_FILENAME)):
+            raise HTTPException(status_code=404, detail="No symbol index for this repository. Please ingest it first.")
+        symbol_index = SymbolIndex(registry.db_dir(repo_hash), symbols_path)
+        if kind == "definitions":
+            results = await run_in_threadpool(symbol_index.definitions, name)
+        else:
+            results = await run_in_threadpool(symbol_index.references, name, "call" if kind == "callers" else "import")
+        return {"repo": repo_hash, "name": name, "kind": kind, "results": results}
+
     @router.get("/api/health")
     async def health_check():
         return {"status": "healthy", "message": "API is running"}
 
+    @router.get("/api/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        # Prometheus text exposition format
+        return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
     # Include router in the app
     app.include_router(router)
\ No newline at end of file
@@ -0,0 +1,178 @@
+# src/symbol_index.py
+import os
+import ast
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+SYMBOL_INDEX_FILENAME = "symbols.sqlite"
+
+class _PythonSymbolVisitor(ast.NodeVisitor):
+    """Collects definitions (with class-qualified names), imports and call sites from a Python AST."""
+
+    def __init__(self):
+        self.definitions = []
+        self.references = []
+        self.scope = []
+
+    def _scope_name(self):
+        return ".".join(name for name, _ in self.scope) or "<module>"
+
+    def _define(self, node, kind):
+        qualname = ".".join([name for name, _ in self.scope] + [node.name])
+        self.definitions.append({
+            "name": node.name, "qualname": qualname, "kind": kind,
+            "start_line": node.lineno, "end_line": getattr(node, "end_lineno", node.lineno),
+        })
+        self.scope.append((node.name, kind))
+        self.generic_visit(node)
+        self.scope.pop()
+
+    def visit_ClassDef(self, node):
+        self._define(node, "class")
+
+    def visit_FunctionDef(self, node):
+        self._define(node, "method" if self.scope and self.scope[-1][1] == "class" else "function")
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.references.append({"name": alias.name, "kind": "import", "line": node.lineno, "scope": self._scope_name()})
+
+    def visit_ImportFrom(self, node):
+        for alias in node.names:
+            name = f"{node.module}.{alias.name}" if node.module else alias.name
+            self.references.append({"name": name, "kind": "import", "line": node.lineno, "scope": self._scope_name()})
+
+    def visit_Call(self, node):
+        func = node.func
+        name = func.id if isinstance(func, ast.Name) else func.attr if isinstance(func, ast.Attribute) else None
+        if name:
+            self.references.append({"name": name, "kind": "call", "line": node.lineno, "scope": self._scope_name()})
+        self.generic_visit(node)
+
+def extract_python_symbols(code):
+    visitor = _PythonSymbolVisitor()
+    visitor.visit(ast.parse(code))
+    return {"definitions": visitor.definitions, "references": visitor.references}
+
+def extract_cpp_symbols(file_path, code):
+    # Shares the chunker's cached libclang parse
+    from src.cpp_chunker import analyze_cpp_file
+    analysis = analyze_cpp_file(file_path, code)
+    return {"definitions": analysis["definitions"], "references": analysis["references"]}
+
+def extract_symbols(file_path, code):
+    """
+    Definitions and references (imports, call sites) in one source file; empty for unsupported types.
+    C, JavaScript and Java symbols come from the parse their chunker made of the same file.
+    """
+    file_extension = os.path.splitext(file_path)[1].lower()
+    try:
+        if file_extension == ".py":
+            return extract_python_symbols(code)
+        if file_extension in (".cpp", ".hpp"):
+            return extract_cpp_symbols(file_path, code)
+        if file_extension in (".c", ".h"):
+            from src.c_chunker import analyze_c
+            return analyze_c(code)
+        if file_extension == ".js":
+            from src.js_chunker import analyze_js
+            return analyze_js(code)
+        if file_extension == ".java":
+            from src.java_chunker import analyze_java
+            return analyze_java(code)
+    except Exception as e:
+        logger.warning(f"Symbol extraction failed for {file_path}: {e}")
+    return {"definitions": [], "references": []}
+
+class SymbolIndex:
+    """
+    Per-repository symbol table and cross-reference index in SQLite, stored next to the FAISS index.
+    Rows are grouped by repository-relative file so incremental ingestion can replace a file's symbols.
+    """
+
+    def __init__(self, db_dir, path=None):
+        # `path` opens the copy saved with an index generation, read-only, instead of the working index
+        self._lock = threading.Lock()
+        if path is not None:
+            self.path = path
+            self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            return
+        os.makedirs(db_dir, exist_ok=True)
+        self.path = os.path.join(db_dir, SYMBOL_INDEX_FILENAME)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS definitions (
+                name TEXT NOT NULL, qualname TEXT NOT NULL, kind TEXT NOT NULL, file TEXT NOT NULL,
+                start_line INTEGER, end_line INTEGER, chunk_id TEXT
+            );
+            CREATE TABLE IF NOT EXISTS refs (
+                name TEXT NOT NULL, kind TEXT NOT NULL, file TEXT NOT NULL, line INTEGER, scope TEXT
+            );
+            CREATE INDEX IF NOT EXISTS definitions_name ON definitions (name);
+            CREATE INDEX IF NOT EXISTS definitions_qualname ON definitions (qualname);
+            CREATE INDEX IF NOT EXISTS definitions_file ON definitions (file);
+            CREATE INDEX IF NOT EXISTS refs_name ON refs (name);
+            CREATE INDEX IF NOT EXISTS refs_file ON refs (file);
+        """)
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def add_file(self, file, symbols, chunk_spans=()):
+        """
+        Stores a file's symbols. `chunk_spans` is a list of (chunk_id, start_line, end_line) used to link
+        each definition to the first chunk containing its first line.
+        """
+        def chunk_for(line):
+            return next((chunk_id for chunk_id, start, end in chunk_spans
+                         if start is not None and end is not None and start <= line <= end), None)
+
+        with self._lock:
+            self._db.executemany("INSERT INTO definitions VALUES (?, ?, ?, ?, ?, ?, ?)", [
+                (d["name"], d["qualname"], d["kind"], file, d["start_line"], d["end_line"], chunk_for(d["start_line"]))
+                for d in symbols["definitions"]
+            ])
+            self._db.executemany("INSERT INTO refs VALUES (?, ?, ?, ?, ?)", [
+                (r["name"], r["kind"], file, r["line"], r["scope"]) for r in symbols["references"]
+            ])
+            self._db.commit()
+
+    def delete_files(self, files):
+        with self._lock:
+            self._db.executemany("DELETE FROM definitions WHERE file = ?", [(file,) for file in files])
+            self._db.executemany("DELETE FROM refs WHERE file = ?", [(file,) for file in files])
+            self._db.commit()
+
+    def definitions(self, name):
+        """Where is `name` defined? Matches plain names (`load_repo`) and qualified ones (`Class.method`)."""
+        column = "qualname" if ("." in name or "::" in name) else "name"
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT name, qualname, kind, file, start_line, end_line, chunk_id FROM definitions "
+                f"WHERE {column} = ? ORDER BY file, start_line", (name,)
+            ).fetchall()
+        keys = ("name", "qualname", "kind", "file", "start_line", "end_line", "chunk_id")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def references(self, name, kind=None):
+        """Who calls / imports `name`? `kind` restricts to "call" or "import"."""
+        query = "SELECT name, kind, file, line, scope FROM refs WHERE name = ?"
+        params = [name.rsplit(".", 1)[-1].rsplit("::", 1)[-1] if kind == "call" else name]
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY file, line", params).fetchall()
+        return [dict(zip(("name", "kind", "file", "line", "scope"), row)) for row in rows]
+
+    def definition_chunk_ids(self, names):
+        return list(dict.fromkeys(
+            d["chunk_id"] for name in names for d in self.definitions(name) if d["chunk_id"]
+        ))
@@ -0,0 +1,48 @@
+import os
+import time
+from types import SimpleNamespace
+import pytest
+
+# Tests run without network access: models and tokenizers come from the local cache, token counts
+# fall back to length estimates, chat uses the fake LLM and ingestion chunks files in-process
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("EMBEDDING_PRELOAD", "false")
+os.environ.setdefault("INGEST_WORKERS", "1")
+
+def wait_for_job(client, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(f"Job {job_id} did not finish")
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """
+    The API with fake embeddings and the fake LLM, serving a synthetic repository ingested from a
+    file:// URL. Runs in tmp_path, where checkouts (local/<repo>) and indexes (db/) are written.
+    """
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    import src.route_handlers as route_handlers
+    from src.benchmark import generate_repo, fake_embeddings
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(route_handlers, "_embeddings", fake_embeddings())
+    upstream = str(tmp_path / "upstream")
+    files = generate_repo(upstream, files=12)
+    app = FastAPI()
+    route_handlers.setup_routes(app, "db")
+    client = TestClient(app)
+
+    def ingest(url="file://" + upstream, **body):
+        response = client.post("/api/repository", json=dict(body, question=url)).json()
+        return wait_for_job(client, response["job_id"])
+
+    job = ingest()
+    assert job["status"] == "done", job
+    return SimpleNamespace(client=client, repo=job["repo"], upstream=upstream, files=files, ingest=ingest,
+                           registry=route_handlers.registry, db="db")
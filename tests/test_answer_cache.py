@@ -0,0 +1,50 @@
+import time
+from src.answer_cache import AnswerCache, normalize_question
+
+VECTORS = {
+    "how is the config loaded": [1.0, 0.0, 0.0],
+    "where does the config get loaded": [0.9, 0.1, 0.0],
+    "what does merge do": [0.0, 1.0, 0.0],
+}
+
+def embed_query(question):
+    return VECTORS[normalize_question(question)]
+
+def test_trivial_variants_share_a_key():
+    assert normalize_question("  How is the   config loaded?? ") == normalize_question("how is the config loaded")
+
+def test_answers_are_kept_per_repo_and_commit():
+    cache = AnswerCache()
+    cache.put("a__repo", "c1", "How is the config loaded?", "From config.yaml.")
+    entry, info = cache.get("a__repo", "c1", "how is the config loaded")
+    assert entry.answer == "From config.yaml." and info["match"] == "exact"
+    # A new commit, or another repository, does not reuse the answer
+    assert cache.get("a__repo", "c2", "How is the config loaded?") is None
+    assert cache.get("b__repo", "c1", "How is the config loaded?") is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 2}
+
+    cache.invalidate("a__repo")
+    assert cache.get("a__repo", "c1", "How is the config loaded?") is None
+
+def test_similar_questions_reuse_answers_above_the_threshold():
+    cache = AnswerCache(similarity_threshold=0.95, embed_query=embed_query)
+    cache.put("a__repo", "c1", "How is the config loaded?", "From config.yaml.")
+    entry, info = cache.get("a__repo", "c1", "Where does the config get loaded?")
+    assert entry.answer == "From config.yaml."
+    assert info["match"] == "similar" and info["cached_question"] == "How is the config loaded?"
+    assert 0.95 <= info["similarity"] < 1
+    assert cache.get("a__repo", "c1", "What does merge do?") is None
+    assert cache.get("a__repo", "c2", "Where does the config get loaded?") is None
+
+def test_entries_expire_and_are_evicted_least_recently_used_first():
+    cache = AnswerCache(max_entries=2, ttl_seconds=60)
+    for question in ("one", "two"):
+        cache.put("a__repo", "c1", question, question.upper())
+    assert cache.get("a__repo", "c1", "one") is not None
+    cache.put("a__repo", "c1", "three", "THREE")
+    assert cache.get("a__repo", "c1", "two") is None
+    assert cache.get("a__repo", "c1", "one") is not None
+
+    cache._entries[("a__repo", "c1", "one")].created = time.time() - 61
+    assert cache.get("a__repo", "c1", "one") is None
+    assert cache.stats()["entries"] == 1
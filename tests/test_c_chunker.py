@@ -0,0 +1,52 @@
+from src.c_chunker import chunk_c_code
+
+SAMPLE = """\
+#include <stdlib.h>
+
+struct node {
+    int value;
+    struct node *next;
+};
+
+typedef struct {
+    int x, y;
+} point_t;
+
+/* Allocates a node. */
+struct node *new_node(int v) {
+    struct node *n = malloc(sizeof *n);
+    n->value = v;
+    return n;
+}
+
+int count = 0;
+
+static enum color { RED, GREEN } default_color(void) {
+    return RED;
+}
+"""
+
+def _spans(code):
+    return [(c["metadata"]["type"], c["metadata"]["name"], c["metadata"]["start_line"], c["metadata"]["end_line"])
+            for c in chunk_c_code(code, "list.c") if c["metadata"]["name"]]
+
+def test_functions_returning_aggregates_are_functions():
+    spans = _spans(SAMPLE)
+    assert ("FuncDef", "new_node", 12, 17) in spans
+    assert ("FuncDef", "default_color", 21, 23) in spans
+    # The declaration after the function is not swallowed by it
+    assert ("Declarations", "count", 19, 19) in spans
+
+def test_aggregate_definitions():
+    spans = _spans(SAMPLE)
+    assert ("Struct", "node", 3, 6) in spans
+    assert ("Struct", "point_t", 8, 10) in spans
+
+def test_scanned_names_without_pycparser():
+    # GCC attributes make pycparser fail, so names come from the brace scan
+    code = SAMPLE + "\nstruct __attribute__((packed)) header {\n    char tag;\n};\n"
+    spans = _spans(code)
+    assert ("FuncDef", "new_node", 12, 17) in spans
+    assert ("Declarations", "count", 19, 19) in spans
+    assert ("Struct", "point_t", 8, 10) in spans
+    assert ("Struct", "header", 25, 27) in spans
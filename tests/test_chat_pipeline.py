@@ -0,0 +1,66 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.chat_pipeline import (LLMCallStats, make_chain, build_memory, run_chat, iter_answer_tokens, wait_for_memory,
+                               has_history, CHAT_MEMORY_WINDOW)
+from src.fake_llm import load_fake_llm
+
+class StaticRetriever(BaseRetriever):
+    docs: list
+    queries: list = []
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        self.queries.append(query)
+        return self.docs
+
+def _chain(memory_kind, responses=None):
+    stats = LLMCallStats()
+    llm = load_fake_llm(responses=responses, token_delay=0, call_delay=0)
+    llm.callbacks = [stats]
+    retriever = StaticRetriever(docs=[Document(page_content="def load_repo(path):\n    return path")], queries=[])
+    return make_chain(llm, retriever, "Context:\n{context}\n\nQuestion:\n{question}", memory_kind), stats
+
+def _calls(qa, stats, question, pipeline="fast"):
+    """LLM calls made before the answer is returned, and in total once the memory update has finished."""
+    before = stats.calls
+    run_chat(qa, question, pipeline)
+    answered = stats.calls - before
+    wait_for_memory(qa)
+    return answered, stats.calls - before
+
+def test_fast_pipeline_answers_standalone_questions_in_one_call():
+    qa, stats = _chain("window")
+    assert _calls(qa, stats, "What does load_repo do?") == (1, 1)
+    # Follow-ups are condensed first
+    assert _calls(qa, stats, "And what does it return?") == (2, 2)
+    assert qa.retriever.queries[0] == "What does load_repo do?"
+
+def test_summary_updates_run_after_the_response():
+    qa, stats = _chain("summary")
+    assert _calls(qa, stats, "What does load_repo do?") == (1, 2)
+    assert has_history(qa)
+
+def test_chain_pipeline_summarizes_before_responding():
+    qa, stats = _chain("summary")
+    assert _calls(qa, stats, "What does load_repo do?", pipeline="chain") == (2, 2)
+
+def test_window_memory_keeps_the_last_exchanges():
+    qa, stats = _chain("window")
+    for i in range(CHAT_MEMORY_WINDOW + 3):
+        run_chat(qa, f"Question {i}?")
+    wait_for_memory(qa)
+    messages = qa.memory.load_memory_variables({})["chat_history"]
+    assert len(messages) == 2 * CHAT_MEMORY_WINDOW
+    assert messages[-2].content == f"Question {CHAT_MEMORY_WINDOW + 2}?"
+
+def test_unknown_memory_is_rejected():
+    with pytest.raises(ValueError, match="Unknown chat memory"):
+        build_memory(load_fake_llm(), "forever")
+
+def test_streamed_tokens_make_up_the_answer():
+    qa, stats = _chain("window", responses=["It returns the path."])
+    assert "".join(iter_answer_tokens(qa, "What does load_repo return?")) == "It returns the path."
+    wait_for_memory(qa)
+    assert stats.snapshot()["calls"] == 1
+    assert [message.content for message in qa.memory.chat_memory.messages] == [
+        "What does load_repo return?", "It returns the path."]
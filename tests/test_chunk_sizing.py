@@ -0,0 +1,71 @@
+import pytest
+import src.chunk_sizing as chunk_sizing
+import src.indexer as indexer
+from src.benchmark import generate_repo, fake_embeddings
+from src.chunk_sizing import split_chunk, count_tokens, truncation_report, FALLBACK_CHARS_PER_TOKEN
+from src.indexer import build_index
+
+@pytest.fixture(autouse=True)
+def length_estimates(monkeypatch):
+    # The same token counts whether or not a tokenizer happens to be cached locally
+    monkeypatch.setattr(chunk_sizing, "get_tokenizer", lambda model_name=None: None)
+
+def _function(index, body_lines=6):
+    body = "".join(f"    value_{index}_{i} = compute({i})\n" for i in range(body_lines))
+    return f"def function_{index}():\n{body}    return value_{index}_0\n\n"
+
+def test_token_counts_fall_back_to_length_estimates():
+    assert count_tokens(["", "abc", "abcd"]) == [0, 1, 2]
+    assert count_tokens([]) == []
+    assert FALLBACK_CHARS_PER_TOKEN == 3
+
+def test_small_chunks_are_kept_whole():
+    code = _function(0)
+    [chunk] = split_chunk(code, {"start_line": 5, "name": "function_0"}, max_tokens=1000)
+    assert chunk["content"] == code
+    assert chunk["metadata"] == {"start_line": 5, "name": "function_0", "tokens": sum(count_tokens(code.split("\n")))}
+
+def test_long_chunks_are_split_within_budget_on_boundaries():
+    code = "".join(_function(i) for i in range(6))
+    chunks = split_chunk(code, {"start_line": 10, "end_line": 10 + code.count("\n")}, max_tokens=80,
+                         overlap_tokens=0)
+    assert len(chunks) > 1
+    assert all(chunk["metadata"]["tokens"] <= 80 for chunk in chunks)
+    assert [chunk["metadata"]["split"] for chunk in chunks] == [str(i) for i in range(1, len(chunks) + 1)]
+    # Without overlap the pieces cover the chunk line by line, each ending at a natural boundary
+    lines = code.split("\n")
+    assert sum(chunk["content"].count("\n") + 1 for chunk in chunks) == len(lines)
+    for chunk in chunks[:-1]:
+        assert chunk_sizing.BOUNDARY_LINE_RE.search(chunk["content"].split("\n")[-1])
+    for chunk in chunks:
+        start, end = chunk["metadata"]["start_line"], chunk["metadata"]["end_line"]
+        assert chunk["content"] == "\n".join(lines[start - 10:end - 10 + 1])
+
+def test_pieces_overlap_by_whole_lines():
+    code = "".join(_function(i) for i in range(6))
+    chunks = split_chunk(code, {"start_line": 1}, max_tokens=80, overlap_tokens=20)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        overlap = previous["metadata"]["end_line"] - chunk["metadata"]["start_line"] + 1
+        assert overlap >= 1
+        assert sum(count_tokens(chunk["content"].split("\n")[:overlap])) <= 20
+
+def test_an_overlong_line_is_cut_into_slices():
+    line = "x" * 900
+    chunks = split_chunk(line, {"start_line": 1}, max_tokens=100, overlap_tokens=0)
+    assert "".join(chunk["content"] for chunk in chunks) == line
+    assert all(chunk["metadata"]["tokens"] <= 100 and chunk["metadata"]["start_line"] == 1 for chunk in chunks)
+
+def test_truncation_report_counts_tokens_past_the_limit():
+    assert truncation_report([100, 300, 50], max_tokens=254) == {
+        "chunks": 3, "chunks_truncated": 1, "tokens": 450, "truncated_tokens": 46, "truncated_fraction": 0.1022,
+    }
+
+def test_changing_the_chunk_budget_rebuilds_the_index(tmp_path, monkeypatch):
+    repo_path, db_dir = str(tmp_path / "repo"), str(tmp_path / "db")
+    generate_repo(repo_path, files=3, mix={".py": 1})
+    build_index(repo_path, db_dir, fake_embeddings())
+    _, stats = build_index(repo_path, db_dir, fake_embeddings())
+    assert stats["mode"] == "incremental"
+    monkeypatch.setattr(indexer, "CHUNK_MAX_TOKENS", 128)
+    _, stats = build_index(repo_path, db_dir, fake_embeddings())
+    assert stats["mode"] == "full"
@@ -0,0 +1,43 @@
+from langchain_core.documents import Document
+from src.context_assembler import merge_chunks, assemble_context
+from src.helper import load_file, chunk_document
+
+def _chunk(chunk_id, start_line, lines):
+    return Document(page_content="\n".join(lines),
+                    metadata={"chunk_id": chunk_id, "start_line": start_line, "end_line": start_line + len(lines) - 1})
+
+def _function(name, body_lines):
+    return [f"def {name}():"] + [f"    {name}_{i} = {i}" for i in range(body_lines)] + [f"    return {name}_0", ""]
+
+def test_overlapping_chunks_of_a_file_are_merged():
+    lines = [f"line {i}" for i in range(1, 21)]
+    blocks = merge_chunks([_chunk("a.py#0", 1, lines[:12]), _chunk("a.py#1", 9, lines[8:])])
+    assert len(blocks) == 1
+    assert (blocks[0]["start_line"], blocks[0]["end_line"]) == (1, 20)
+    assert blocks[0]["text"] == "\n".join(lines)
+
+def test_separate_chunks_of_a_file_are_not_merged():
+    blocks = merge_chunks([_chunk("a.py#0", 1, ["def alpha():", "    pass"]),
+                           _chunk("a.py#3", 40, ["def beta():", "    pass"])])
+    assert [(block["start_line"], block["end_line"]) for block in blocks] == [(1, 2), (40, 41)]
+
+def test_chunks_with_conflicting_lines_are_not_merged():
+    alpha = _chunk("a.py#0", 1, ["def alpha():", "    return 1"])
+    beta = _chunk("a.py#1", 1, ["def beta():", "    return 2"])
+    blocks, report = assemble_context([alpha, beta])
+    assert sorted(block["text"] for block in blocks) == sorted([alpha.page_content, beta.page_content])
+    assert report["blocks_dropped"] == 0
+
+def test_large_python_file_chunks_keep_file_line_numbers(tmp_path):
+    lines = _function("alpha", 300) + _function("beta", 300)
+    path = tmp_path / "big.py"
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+    chunks = [chunk for doc in load_file(str(path)) for chunk in chunk_document(doc, max_tokens=10000)]
+    starts = {chunk["metadata"]["name"]: chunk["metadata"]["start_line"] for chunk in chunks}
+    assert starts == {"alpha": 1, "beta": lines.index("def beta():") + 1}
+
+    docs = [Document(page_content=chunk["content"], metadata=dict(chunk["metadata"], chunk_id=f"big.py#{i}"))
+            for i, chunk in enumerate(chunks)]
+    blocks, _ = assemble_context(docs, max_tokens=100000)
+    assert [block["text"].split("\n")[0] for block in blocks] == ["def alpha():", "def beta():"]
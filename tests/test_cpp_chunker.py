@@ -0,0 +1,48 @@
+import pytest
+import src.cpp_chunker as cpp_chunker
+from src.cpp_chunker import analyze_cpp_file, chunk_cpp_code
+
+pytest.importorskip("clang.cindex")
+try:
+    cpp_chunker.get_index()
+except Exception as e:
+    pytest.skip(f"libclang is not available: {e}", allow_module_level=True)
+
+SAMPLE = """\
+#include "shapes.hpp"
+
+namespace app {
+class Box {
+ public:
+  int area() const {
+    return w * h;
+  }
+  int w = 1, h = 2;
+};
+
+int run(int v) {
+  Box b;
+  return b.area() + helper(v);
+}
+}
+"""
+
+@pytest.fixture
+def source(tmp_path, monkeypatch):
+    monkeypatch.setattr(cpp_chunker, "CPP_PARSE_CACHE_DIR", str(tmp_path / "parse_cache"))
+    (tmp_path / "shapes.hpp").write_text("#pragma once\n", encoding="utf-8")
+    path = tmp_path / "main.cpp"
+    path.write_text(SAMPLE, encoding="utf-8")
+    return path
+
+def test_classes_and_functions_get_their_own_chunks(source):
+    spans = [(c["metadata"]["type"], c["metadata"]["name"], c["metadata"]["start_line"], c["metadata"]["end_line"])
+             for c in chunk_cpp_code(SAMPLE, str(source))]
+    assert spans == [("CLASS_DECL", "Box", 4, 10), ("FUNCTION_DECL", "run", 12, 15)]
+
+def test_cache_is_refreshed_when_an_included_header_changes(source):
+    calls = lambda: {r["name"] for r in analyze_cpp_file(str(source))["references"] if r["kind"] == "call"}
+    # helper is undeclared, so clang does not resolve the call
+    assert "helper" not in calls()
+    (source.parent / "shapes.hpp").write_text("#pragma once\nint helper(int x);\n", encoding="utf-8")
+    assert "helper" in calls()
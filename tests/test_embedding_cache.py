@@ -0,0 +1,47 @@
+import hashlib
+import multiprocessing
+import numpy as np
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from src.embedding_cache import EmbeddingCache, CachedEmbeddings
+
+DIM = 8
+
+def _vector(key):
+    return np.random.default_rng(int(hashlib.sha256(key.encode()).hexdigest()[:8], 16)).random(DIM).tolist()
+
+def _put_keys(cache_dir, worker, count):
+    cache = EmbeddingCache(cache_dir, max_entries=1000)
+    for i in range(0, count, 5):
+        keys = [f"w{worker}-{j}" for j in range(i, i + 5)]
+        cache.put_many((key, _vector(key)) for key in keys)
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_entries=3)
+    cache.put_many((key, _vector(key)) for key in ("a", "b", "c"))
+    cache.get_many(["a"])
+    cache.put_many([("d", _vector("d"))])
+    assert set(cache.get_many(["a", "b", "c", "d"])) == {"a", "c", "d"}
+    assert np.allclose(cache.get_many(["d"])["d"], _vector("d"), atol=1e-3)
+
+def test_processes_sharing_a_cache_get_distinct_slots(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_put_keys, args=(str(tmp_path), worker, 40)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+        assert process.exitcode == 0
+
+    cache = EmbeddingCache(str(tmp_path), max_entries=1000)
+    keys = [f"w{worker}-{j}" for worker in range(4) for j in range(40)]
+    found = cache.get_many(keys)
+    assert len(found) == len(keys)
+    for key in keys:
+        assert np.allclose(found[key], _vector(key), atol=1e-3), key
+
+def test_cache_hits_and_misses_return_the_same_vectors(tmp_path):
+    embeddings = CachedEmbeddings(DeterministicFakeEmbedding(size=DIM), "fake", EmbeddingCache(str(tmp_path)))
+    first = embeddings.embed_documents(["def load(): pass", "class Store: pass"])
+    second = embeddings.embed_documents(["def load(): pass", "class Store: pass"])
+    assert first == second
+    assert embeddings.cache_stats()["hits"] == 2 and embeddings.cache_stats()["misses"] == 2
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from src.benchmark import generate_repo, FAKE_EMBEDDING_SIZE
+from src.embedding_cache import EmbeddingCache, CachedEmbeddings
+from src.embeddings import LocalEmbeddings, cache_model_name
+from src.indexer import build_index, embedding_fingerprint
+
+TEXTS = ["def add(a, b):\n    return a + b", "class Stack:\n    def push(self, item):\n        self.items.append(item)",
+         "int main(void) { return 0; }"]
+
+class BackendEmbeddings(DeterministicFakeEmbedding):
+    """Fake embeddings reporting the runtime they stand in for, like LocalEmbeddings.backend."""
+    backend: str = "torch"
+
+def _cached(backend, cache_dir):
+    return CachedEmbeddings(BackendEmbeddings(size=FAKE_EMBEDDING_SIZE, backend=backend),
+                            model_name=cache_model_name("model", backend), cache=EmbeddingCache(cache_dir))
+
+def test_backend_is_part_of_the_fingerprint(tmp_path):
+    fingerprints = [embedding_fingerprint(_cached(backend, str(tmp_path))) for backend in ("torch", "onnx", "onnx-int8")]
+    assert [fingerprint["backend"] for fingerprint in fingerprints] == ["torch", "onnx", "onnx-int8"]
+    assert len({str(sorted(fingerprint.items())) for fingerprint in fingerprints}) == 3
+
+def test_quantized_backends_have_their_own_cache_entries():
+    assert cache_model_name("model", "torch") == cache_model_name("model", "onnx") == "model"
+    assert cache_model_name("model", "onnx-int8") == "model:onnx-int8"
+
+def test_changing_the_backend_rebuilds_the_index(tmp_path):
+    repo_path, db_dir = str(tmp_path / "repo"), str(tmp_path / "db")
+    generate_repo(repo_path, files=3, mix={".py": 1})
+    build_index(repo_path, db_dir, _cached("torch", str(tmp_path / "cache")))
+    _, stats = build_index(repo_path, db_dir, _cached("torch", str(tmp_path / "cache")))
+    assert stats["mode"] == "incremental"
+    _, stats = build_index(repo_path, db_dir, _cached("onnx", str(tmp_path / "cache")))
+    assert stats["mode"] == "full"
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        LocalEmbeddings(backend="tensorrt")
+
+def test_onnx_vectors_match_torch():
+    pytest.importorskip("sentence_transformers")
+    pytest.importorskip("optimum.onnxruntime")
+    try:
+        torch_embeddings, onnx_embeddings = LocalEmbeddings(backend="torch"), LocalEmbeddings(backend="onnx")
+    except (OSError, ValueError) as e:
+        pytest.skip(f"Embedding model is not available offline: {e}")
+    torch_vectors = np.asarray(torch_embeddings.embed_documents(TEXTS))
+    onnx_vectors = np.asarray(onnx_embeddings.embed_documents(TEXTS))
+    assert onnx_vectors.shape == torch_vectors.shape
+    np.testing.assert_allclose(onnx_vectors, torch_vectors, atol=1e-4)
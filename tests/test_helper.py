@@ -0,0 +1,74 @@
+import os
+import pytest
+from git import Repo, Actor
+from src.benchmark import generate_repo
+from src.helper import get_repo_hash, is_repo_id, repo_ingestion, walk_repo_files, iter_chunked_files
+
+def test_repo_ids_include_the_owner():
+    assert get_repo_hash("https://github.com/a/utils") == "a__utils"
+    assert get_repo_hash("https://github.com/b/utils") == "b__utils"
+
+def test_unsafe_urls_are_hashed():
+    repo_hash = get_repo_hash("https://github.com/x/..")
+    assert len(repo_hash) == 32 and is_repo_id(repo_hash)
+
+def test_cache_directories_are_not_repo_ids():
+    assert not is_repo_id("_embedding_cache")
+    assert not is_repo_id("_parse_cache")
+    assert not is_repo_id("..")
+    assert not is_repo_id("a/b")
+
+def _commit(repo, rel_path, text, message):
+    with open(os.path.join(repo.working_dir, rel_path), "w", encoding="utf-8") as f:
+        f.write(text)
+    repo.index.add([rel_path])
+    author = Actor("Test", "test@example.com")
+    return repo.index.commit(message, author=author, committer=author).hexsha
+
+@pytest.fixture
+def remote(tmp_path, monkeypatch):
+    """A working repository with two commits, pushed to a bare repository that is cloned by file:// URL."""
+    monkeypatch.chdir(tmp_path)
+    work = Repo.init(str(tmp_path / "work"))
+    _commit(work, "app.py", "def first():\n    return 1\n", "First")
+    _commit(work, "app.py", "def first():\n    return 2\n", "Second")
+    bare = Repo.clone_from(work.working_dir, str(tmp_path / "remote.git"), bare=True)
+    work.create_remote("origin", bare.working_dir)
+    return work, bare, "file://" + bare.working_dir
+
+def test_clone_is_shallow_and_fetch_fast_forwards(remote):
+    work, bare, url = remote
+    result = repo_ingestion(url)
+    assert result["status"] == "success" and result["repo_path"] == os.path.join("local", "remote")
+    checkout = Repo(result["repo_path"])
+    assert checkout.git.rev_list("--count", "HEAD") == "1"
+
+    assert repo_ingestion(url)["updated"] is False
+    head = _commit(work, "app.py", "def first():\n    return 3\n", "Third")
+    work.remotes.origin.push(work.active_branch.name)
+    result = repo_ingestion(url)
+    assert result["updated"] is True and result["commit"] == head
+    assert checkout.head.commit.hexsha == head
+
+def test_fetch_follows_a_force_pushed_branch(remote):
+    work, bare, url = remote
+    repo_ingestion(url)
+    # Rewrite the last commit, so the new head does not descend from the checked out one
+    work.git.reset("--hard", "HEAD~1")
+    head = _commit(work, "app.py", "def rewritten():\n    return 0\n", "Rewritten")
+    work.remotes.origin.push(work.active_branch.name, force=True)
+
+    result = repo_ingestion(url)
+    assert result["status"] == "success" and result["updated"] is True and result["commit"] == head
+    with open(os.path.join(result["repo_path"], "app.py"), encoding="utf-8") as f:
+        assert "def rewritten" in f.read()
+
+def test_parallel_chunking_matches_serial(tmp_path):
+    generate_repo(str(tmp_path), files=12, mix={".py": 1, ".c": 1, ".js": 1, ".java": 1})
+    file_paths = walk_repo_files(str(tmp_path))[0]
+    serial = list(iter_chunked_files(file_paths, workers=1))
+    # Fewer files in flight than files, so results are collected while later files are still being chunked
+    parallel = list(iter_chunked_files(file_paths, workers=3, max_pending=2))
+    assert [file_path for file_path, _, _ in parallel] == file_paths
+    assert parallel == serial
+    assert all(chunks for _, chunks, _ in serial) and all(symbols["definitions"] for _, _, symbols in serial)
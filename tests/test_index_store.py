@@ -0,0 +1,71 @@
+import os
+import pytest
+from src.benchmark import generate_repo, fake_embeddings
+from src.index_store import (open_index, load_index_for_update, save_index, current_generation, opened_generation,
+                             ReadOnlyIndexError, CURRENT_FILENAME)
+from src.indexer import build_index, INDEX_DIRNAME
+from src.registry import RepoRegistry
+
+REPO_HASH = "example__service"
+
+@pytest.fixture
+def store(tmp_path):
+    repo_path, db_dir = str(tmp_path / "repo"), str(tmp_path / "db" / REPO_HASH)
+    files = generate_repo(repo_path, files=4, mix={".py": 1})
+    build_index(repo_path, db_dir, fake_embeddings())
+    return repo_path, db_dir, files
+
+def test_opened_indexes_are_read_only(store):
+    _, db_dir, _ = store
+    vectordb = open_index(os.path.join(db_dir, INDEX_DIRNAME), fake_embeddings())
+    ntotal = vectordb.index.ntotal
+    with pytest.raises(ReadOnlyIndexError):
+        vectordb.add_texts(["def extra():\n    pass"])
+    with pytest.raises(ReadOnlyIndexError):
+        vectordb.delete([vectordb.index_to_docstore_id[0]])
+    with pytest.raises(ReadOnlyIndexError):
+        vectordb.docstore.add({})
+    assert vectordb.index.ntotal == ntotal
+
+def test_new_generations_replace_old_files_without_breaking_open_readers(store):
+    _, db_dir, _ = store
+    index_path = os.path.join(db_dir, INDEX_DIRNAME)
+    old = open_index(index_path, fake_embeddings())
+    [doc] = old.similarity_search("config", k=1)
+    generation = current_generation(index_path)
+
+    updated = load_index_for_update(index_path, fake_embeddings())
+    updated.delete([doc.id])
+    save_index(updated, index_path)
+    assert current_generation(index_path) == generation + 1
+    assert sorted(os.listdir(index_path)) == sorted(
+        [CURRENT_FILENAME, f"index-{generation + 1}.faiss", f"docstore-{generation + 1}.sqlite"])
+
+    # A reader of the previous generation keeps its files until it is closed
+    assert old.similarity_search("config", k=1)[0].id == doc.id
+    new = open_index(index_path, fake_embeddings())
+    assert opened_generation(new) == generation + 1
+    assert new.index.ntotal == old.index.ntotal - 1
+    assert doc.id not in [d.id for d in new.similarity_search("config", k=new.index.ntotal)]
+
+def test_registry_reloads_when_another_process_reingests(store):
+    repo_path, db_dir, files = store
+    registry = RepoRegistry(os.path.dirname(db_dir), load_index=lambda path: open_index(path, fake_embeddings()),
+                            make_retriever=lambda db_dir, vectordb: vectordb.as_retriever(),
+                            make_chain=lambda retriever: object())
+    first = registry.get_vectordb(REPO_HASH)
+    chain = registry.get_chain(REPO_HASH, "session")
+    assert registry.get_vectordb(REPO_HASH) is first and registry.get_chain(REPO_HASH, "session") is chain
+
+    # Another worker process re-ingests after a file was removed and switches CURRENT
+    os.remove(os.path.join(repo_path, files[0]))
+    _, stats = build_index(repo_path, db_dir, fake_embeddings())
+    assert stats["mode"] == "incremental"
+
+    reloaded = registry.get_vectordb(REPO_HASH)
+    assert reloaded is not first
+    assert opened_generation(reloaded) == opened_generation(first) + 1
+    assert reloaded.index.ntotal < first.index.ntotal
+    # Sessions belonged to the replaced index, so they start over
+    assert registry.get_chain(REPO_HASH, "session") is not chain
+    assert [loaded["repo"] for loaded in registry.stats()["loaded"]] == [REPO_HASH]
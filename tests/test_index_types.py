@@ -0,0 +1,71 @@
+import os
+import faiss
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from src.benchmark import generate_repo, fake_embeddings
+from src.index_store import save_index, open_index, ReadOnlyFAISS
+from src.index_types import (choose_index_type, convert_index, INDEX_TYPES, IVFPQ_MIN_CHUNKS, AUTO_FLAT_MAX_CHUNKS,
+                             AUTO_SQ_MAX_CHUNKS)
+from src.indexer import build_index, load_manifest
+
+DIM = 32
+
+def test_auto_type_follows_the_chunk_count():
+    assert choose_index_type(AUTO_FLAT_MAX_CHUNKS, "auto") == "flat"
+    assert choose_index_type(AUTO_FLAT_MAX_CHUNKS + 1, "auto") == "sq8"
+    assert choose_index_type(AUTO_SQ_MAX_CHUNKS + 1, "auto") == "ivfpq"
+    assert choose_index_type(100, "hnsw") == "hnsw"
+    # Too few vectors to train IVF-PQ
+    assert choose_index_type(IVFPQ_MIN_CHUNKS - 1, "ivfpq") == "sq8"
+    with pytest.raises(ValueError):
+        choose_index_type(100, "lsh")
+
+@pytest.fixture(scope="module")
+def vectors():
+    rng = np.random.default_rng(0)
+    # Clustered, like embeddings of similar code, so quantizers have structure to learn
+    centers = rng.normal(size=(64, DIM))
+    return (centers[rng.integers(0, 64, IVFPQ_MIN_CHUNKS)] + 0.3 * rng.normal(size=(IVFPQ_MIN_CHUNKS, DIM))).astype(np.float32)
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_index_types_round_trip_through_the_store(tmp_path, vectors, index_type):
+    embeddings = fake_embeddings(size=DIM)
+    texts = [f"chunk {i}" for i in range(len(vectors))]
+    ids = [f"file.py#{i}" for i in range(len(vectors))]
+    vectordb = FAISS.from_embeddings(list(zip(texts, vectors.tolist())), embeddings, ids=ids,
+                                     metadatas=[{"start_line": i} for i in range(len(vectors))])
+    report = convert_index(vectordb, index_type)
+    save_index(vectordb, str(tmp_path))
+
+    opened = open_index(str(tmp_path), embeddings)
+    assert isinstance(opened, ReadOnlyFAISS)
+    # The index is stored in FAISS's own format, so it reads back byte for byte
+    assert faiss.serialize_index(opened.index).tobytes() == faiss.serialize_index(vectordb.index).tobytes()
+    queries = range(0, len(vectors), 500)
+    found = [opened.similarity_search_by_vector(vectors[i].tolist(), k=8) for i in queries]
+    recall = np.mean([ids[i] in [doc.id for doc in docs] for i, docs in zip(queries, found)])
+    assert recall >= (0.6 if index_type == "ivfpq" else 0.95), report
+    assert found[0][0].page_content.startswith("chunk ") and "start_line" in found[0][0].metadata
+
+def test_requested_type_is_recorded_and_kept_on_reingest(tmp_path):
+    repo_path, db_dir = str(tmp_path / "repo"), str(tmp_path / "db")
+    files = generate_repo(repo_path, files=4, mix={".py": 1})
+    _, stats = build_index(repo_path, db_dir, fake_embeddings(), index_type="sq8")
+    index = load_manifest(db_dir)["index"]
+    assert stats["index_type"] == index["type"] == index["requested"] == "sq8"
+    assert 0 <= index["report"]["recall_at_k"] <= 1
+
+    os.remove(os.path.join(repo_path, files[0]))
+    # sq8 updates in place; the requested type is kept without being passed again
+    _, stats = build_index(repo_path, db_dir, fake_embeddings())
+    assert (stats["mode"], stats["index_type"]) == ("incremental", "sq8")
+
+def test_graph_indexes_are_rebuilt_on_change(tmp_path):
+    repo_path, db_dir = str(tmp_path / "repo"), str(tmp_path / "db")
+    files = generate_repo(repo_path, files=4, mix={".py": 1})
+    build_index(repo_path, db_dir, fake_embeddings(), index_type="hnsw")
+    with open(os.path.join(repo_path, files[0]), "a", encoding="utf-8") as f:
+        f.write("\ndef appended():\n    return 1\n")
+    _, stats = build_index(repo_path, db_dir, fake_embeddings())
+    assert (stats["mode"], stats["index_type"]) == ("full", "hnsw")
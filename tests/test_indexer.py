@@ -0,0 +1,103 @@
+import os
+import pytest
+from git import Repo
+from src.benchmark import generate_repo, touch_files, fake_embeddings
+from src.indexer import build_index, load_manifest, save_manifest, INDEX_DIRNAME, STAGING_DIRNAME, MANIFEST_FILENAME
+from src.index_store import open_index, current_generation
+from src.lexical_index import LEXICAL_INDEX_FILENAME
+from src.symbol_index import SymbolIndex, SYMBOL_INDEX_FILENAME
+
+@pytest.fixture
+def indexed(tmp_path):
+    repo_path, db_dir = str(tmp_path / "repo"), str(tmp_path / "db")
+    files = generate_repo(repo_path, files=6, mix={".py": 1})
+    embeddings = fake_embeddings()
+    build_index(repo_path, db_dir, embeddings)
+    return repo_path, db_dir, files, embeddings
+
+def _side_files(db_dir):
+    contents = {}
+    for filename in (MANIFEST_FILENAME, LEXICAL_INDEX_FILENAME, SYMBOL_INDEX_FILENAME):
+        with open(os.path.join(db_dir, filename), 'rb') as f:
+            contents[filename] = f.read()
+    return contents
+
+def _fail_embedding(monkeypatch, embeddings):
+    def embed_documents(self, texts):
+        raise RuntimeError("embedding failed")
+    monkeypatch.setattr(type(embeddings), "embed_documents", embed_documents)
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_failed_ingestion_keeps_the_previous_build(indexed, monkeypatch, incremental):
+    repo_path, db_dir, files, embeddings = indexed
+    index_path = os.path.join(db_dir, INDEX_DIRNAME)
+    before, generation = _side_files(db_dir), current_generation(index_path)
+    touch_files(repo_path, files[:2])
+    _fail_embedding(monkeypatch, embeddings)
+
+    with pytest.raises(RuntimeError, match="embedding failed"):
+        build_index(repo_path, db_dir, embeddings, incremental=incremental)
+
+    assert _side_files(db_dir) == before
+    assert current_generation(index_path) == generation
+    assert not os.path.exists(os.path.join(db_dir, STAGING_DIRNAME))
+    assert open_index(index_path, embeddings).index.ntotal > 0
+    monkeypatch.undo()
+    _, stats = build_index(repo_path, db_dir, embeddings)
+    assert stats["mode"] == "incremental" and stats["files_indexed"] == 2
+
+def test_full_rebuild_replaces_the_side_indexes(indexed):
+    repo_path, db_dir, files, embeddings = indexed
+    os.remove(os.path.join(repo_path, files[0]))
+    _, stats = build_index(repo_path, db_dir, embeddings, incremental=False)
+
+    assert stats["mode"] == "full"
+    assert sorted(os.listdir(db_dir)) == sorted([INDEX_DIRNAME, MANIFEST_FILENAME, LEXICAL_INDEX_FILENAME,
+                                                 SYMBOL_INDEX_FILENAME])
+    indexed_files = {row[0] for row in SymbolIndex(db_dir)._db.execute("SELECT DISTINCT file FROM definitions")}
+    assert indexed_files == {path.replace(os.sep, "/") for path in files[1:]}
+
+def test_manifest_of_another_generation_forces_a_rebuild(indexed):
+    repo_path, db_dir, files, embeddings = indexed
+    manifest = load_manifest(db_dir)
+    touch_files(repo_path, files[:1])
+    build_index(repo_path, db_dir, embeddings)
+    # As if saving stopped after the new generation, before its manifest was written
+    save_manifest(db_dir, manifest)
+
+    _, stats = build_index(repo_path, db_dir, embeddings)
+    assert stats["mode"] == "full"
+
+def _indexed_chunks(db_dir, embeddings):
+    vectordb = open_index(os.path.join(db_dir, INDEX_DIRNAME), embeddings)
+    return {chunk_id: vectordb.docstore.search(chunk_id).page_content for _, chunk_id in vectordb.docstore.iter_ids()}
+
+def _indexed_definitions(db_dir):
+    return set(SymbolIndex(db_dir)._db.execute("SELECT file, qualname, start_line, end_line, chunk_id FROM definitions"))
+
+def test_reingesting_a_change_a_rename_and_a_delete_matches_a_rebuild(indexed, tmp_path):
+    repo_path, db_dir, files, embeddings = indexed
+    changed, renamed, deleted = (path.replace(os.sep, "/") for path in files[:3])
+    touch_files(repo_path, [changed])
+    repo = Repo(repo_path)
+    repo.index.move([renamed, "moved.py"])
+    repo.index.remove([deleted], working_tree=True)
+    repo.index.commit("Rename and delete")
+
+    _, stats = build_index(repo_path, db_dir, embeddings)
+    assert (stats["mode"], stats["files_indexed"], stats["files_removed"]) == ("incremental", 2, 2)
+    manifest = load_manifest(db_dir)
+    assert set(manifest["files"]) == {path.replace(os.sep, "/") for path in files[3:]} | {changed, "moved.py"}
+    assert manifest["commit"] == repo.head.commit.hexsha
+
+    rebuilt_dir = str(tmp_path / "rebuilt")
+    build_index(repo_path, rebuilt_dir, embeddings)
+    assert _indexed_chunks(db_dir, embeddings) == _indexed_chunks(rebuilt_dir, embeddings)
+    assert _indexed_definitions(db_dir) == _indexed_definitions(rebuilt_dir)
+
+def test_reingesting_an_unchanged_checkout_embeds_nothing(indexed):
+    repo_path, db_dir, _, embeddings = indexed
+    generation = current_generation(os.path.join(db_dir, INDEX_DIRNAME))
+    _, stats = build_index(repo_path, db_dir, embeddings)
+    assert (stats["mode"], stats["files_indexed"], stats["chunks_added"]) == ("incremental", 0, 0)
+    assert current_generation(os.path.join(db_dir, INDEX_DIRNAME)) == generation
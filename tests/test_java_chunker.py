@@ -0,0 +1,64 @@
+import pytest
+from langchain_core.documents import Document
+import src.java_chunker as java_chunker
+from src.java_chunker import chunk_java_code
+from src.helper import chunk_document
+
+SAMPLE = """\
+package com.example;
+
+import java.util.List;
+
+/** A store of items. */
+public class Store {
+    private final List<String> items;
+
+    public Store(List<String> items) {
+        this.items = items;
+    }
+
+    @Override
+    public String toString() {
+        return items.toString();
+    }
+
+    static class Entry {
+        int size() { return 0; }
+    }
+}
+"""
+
+def _spans(chunks):
+    return [(c["metadata"]["type"], c["metadata"]["name"], c["metadata"]["start_line"], c["metadata"]["end_line"])
+            for c in chunks]
+
+def test_type_chunk_includes_its_javadoc():
+    assert _spans(chunk_java_code(SAMPLE, "Store.java")) == [
+        ("Declarations", "com.example, java.util.List", 1, 3),
+        ("ClassDeclaration", "Store", 5, 21),
+    ]
+
+def test_oversized_type_is_split_into_members():
+    assert _spans(chunk_java_code(SAMPLE, "Store.java", max_tokens=30)) == [
+        ("Declarations", "com.example, java.util.List", 1, 3),
+        ("ClassDeclaration", "Store", 5, 21),
+        ("ConstructorDeclaration", "Store.Store", 9, 11),
+        ("MethodDeclaration", "Store.toString", 13, 16),
+        ("ClassDeclaration", "Store.Entry", 18, 20),
+    ]
+
+def _fallback_types():
+    chunks = chunk_document(Document(page_content=SAMPLE, metadata={"source": "Store.java"}))
+    return {c["metadata"]["type"] for c in chunks}
+
+def test_oversized_file_falls_back_to_line_chunks(monkeypatch):
+    monkeypatch.setattr(java_chunker, "JAVA_PARSE_MAX_BYTES", 100)
+    with pytest.raises(ValueError):
+        chunk_java_code(SAMPLE, "Store.java")
+    assert _fallback_types() == {"text_split"}
+
+def test_parse_timeout_falls_back_to_line_chunks(monkeypatch):
+    monkeypatch.setattr(java_chunker, "JAVA_PARSE_TIMEOUT_SECONDS", 1e-9)
+    with pytest.raises(TimeoutError):
+        chunk_java_code(SAMPLE, "Store.java")
+    assert _fallback_types() == {"text_split"}
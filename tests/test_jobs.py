@@ -0,0 +1,65 @@
+import threading
+import time
+import pytest
+from src.jobs import JobManager, JobQueueFull
+
+def _wait(job, statuses=("done", "error"), timeout=10):
+    deadline = time.time() + timeout
+    while job.status not in statuses:
+        assert time.time() < deadline, job.to_dict()
+        time.sleep(0.01)
+    return job.to_dict()
+
+class BlockingRun:
+    """Ingestion stand-in that reports progress, then waits until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def __call__(self, job):
+        job.update("parsing", files_total=3)
+        job.update(files_processed=1, chunks_processed=4)
+        self.release.wait(10)
+        return {"status": "success", "message": f"Ingested {job.repo_url}", "repo": job.key}
+
+def test_jobs_report_progress_and_result():
+    run = BlockingRun()
+    job = JobManager(run).submit("a__repo", "https://github.com/a/repo")
+    _wait(job, ("running",))
+    while job.to_dict()["chunks_processed"] == 0:
+        time.sleep(0.01)
+    state = job.to_dict()
+    assert (state["status"], state["stage"], state["files_total"], state["files_processed"],
+            state["chunks_processed"]) == ("running", "parsing", 3, 1, 4)
+
+    run.release.set()
+    state = _wait(job)
+    assert (state["status"], state["stage"], state["repo"]) == ("done", "done", "a__repo")
+    assert state["response"] == "Ingested https://github.com/a/repo"
+
+def test_queue_is_bounded_and_deduplicated_per_repository():
+    run = BlockingRun()
+    manager = JobManager(run, max_concurrent=1, max_queued=2)
+    first = manager.submit("a__repo", "https://github.com/a/repo")
+    assert manager.submit("a__repo", "https://github.com/a/repo") is first
+    second = manager.submit("b__repo", "https://github.com/b/repo")
+    assert _wait(first, ("running",))["status"] == "running"
+    assert second.to_dict()["status"] == "queued"
+    with pytest.raises(JobQueueFull):
+        manager.submit("c__repo", "https://github.com/c/repo")
+
+    run.release.set()
+    assert _wait(first)["status"] == _wait(second)["status"] == "done"
+    assert manager.get(first.job_id) is first
+    assert manager.submit("c__repo", "https://github.com/c/repo").status in ("queued", "running", "done")
+
+def test_failed_ingestions_are_reported_as_errors():
+    def run(job):
+        if job.key == "broken":
+            raise RuntimeError("disk full")
+        return {"status": "error", "message": "No supported files found."}
+
+    manager = JobManager(run)
+    assert _wait(manager.submit("broken", "url"))["response"] == "Failed to ingest repository: disk full"
+    state = _wait(manager.submit("empty", "url"))
+    assert (state["status"], state["response"]) == ("error", "No supported files found.")
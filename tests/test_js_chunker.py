@@ -0,0 +1,65 @@
+import pytest
+from langchain_core.documents import Document
+import src.js_chunker as js_chunker
+from src.js_chunker import chunk_js_code
+from src.helper import chunk_document
+
+SAMPLE = """\
+import { readFile } from "fs";
+
+const DEFAULTS = { retries: 3 };
+
+function loadConfig(path) {
+  return JSON.parse(readFile(path));
+}
+
+class Store {
+  constructor(items) {
+    this.items = items;
+  }
+
+  add(item) {
+    this.items.push(item);
+  }
+}
+
+const merge = (a, b) => ({ ...a, ...b });
+
+module.exports.save = function (store) {
+  return store.items.length;
+};
+"""
+
+def _spans(chunks):
+    return [(c["metadata"]["type"], c["metadata"]["name"], c["metadata"]["start_line"], c["metadata"]["end_line"])
+            for c in chunks]
+
+def test_functions_and_classes_get_their_own_chunks():
+    assert _spans(chunk_js_code(SAMPLE, "sample.js")) == [
+        ("Declarations", "readFile, DEFAULTS", 1, 3),
+        ("FunctionDeclaration", "loadConfig", 5, 7),
+        ("ClassDeclaration", "Store", 9, 17),
+        ("ArrowFunctionExpression", "merge", 19, 19),
+        ("FunctionExpression", "module.exports.save", 21, 23),
+    ]
+
+def test_oversized_class_is_split_into_methods():
+    spans = _spans(chunk_js_code(SAMPLE, "sample.js", max_tokens=30))
+    assert ("MethodDefinition", "Store.constructor", 10, 12) in spans
+    assert ("MethodDefinition", "Store.add", 14, 16) in spans
+
+def _fallback_types():
+    chunks = chunk_document(Document(page_content=SAMPLE, metadata={"source": "sample.js"}))
+    return {c["metadata"]["type"] for c in chunks}
+
+def test_oversized_file_falls_back_to_line_chunks(monkeypatch):
+    monkeypatch.setattr(js_chunker, "JS_PARSE_MAX_BYTES", 100)
+    with pytest.raises(ValueError):
+        chunk_js_code(SAMPLE, "sample.js")
+    assert _fallback_types() == {"text_split"}
+
+def test_parse_timeout_falls_back_to_line_chunks(monkeypatch):
+    monkeypatch.setattr(js_chunker, "JS_PARSE_TIMEOUT_SECONDS", 1e-9)
+    with pytest.raises(TimeoutError):
+        chunk_js_code(SAMPLE, "sample.js")
+    assert _fallback_types() == {"text_split"}
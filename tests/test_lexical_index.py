@@ -0,0 +1,65 @@
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_community.vectorstores import FAISS
+from src.lexical_index import (LexicalIndex, HybridRetriever, reciprocal_rank_fusion, symbol_candidates, code_terms,
+                               query_terms)
+
+CHUNKS = {
+    "repo.py#0": ("def load_repo(path):\n    return open(path).read()\n", {"name": "load_repo"}),
+    "repo.py#1": ("class RepoCache:\n    def getEntry(self, key):\n        return self.entries[key]\n", {"name": "RepoCache"}),
+    "net.py#0": ("def fetch_url(url):\n    return requests.get(url, timeout=5)\n", {"name": "fetch_url"}),
+    "README.md#0": ("How to install the tool and where the cache lives.\n", {}),
+}
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    queries: int = 0
+
+    def embed_query(self, text):
+        self.queries += 1
+        return super().embed_query(text)
+
+def _indexes(tmp_path):
+    lexical_index = LexicalIndex(str(tmp_path))
+    ids = list(CHUNKS)
+    texts = [text for text, _ in CHUNKS.values()]
+    metadatas = [dict(metadata, chunk_id=chunk_id) for chunk_id, (_, metadata) in CHUNKS.items()]
+    lexical_index.add(ids, texts, metadatas)
+    embeddings = CountingEmbeddings(size=32)
+    vectordb = FAISS.from_texts(texts, embeddings, metadatas=metadatas, ids=ids)
+    return vectordb, lexical_index, embeddings
+
+def test_identifiers_are_split_into_their_parts():
+    assert code_terms("getEntry load_repo HTTPServer") == [
+        "getentry", "get", "entry", "load_repo", "load", "repo", "httpserver", "http", "server"]
+    assert query_terms("How does the repo cache get an entry?") == ["repo", "cache", "get", "entry"]
+
+def test_symbol_candidates_are_only_explicit_names():
+    assert symbol_candidates("load_repo") == ["load_repo"]
+    assert symbol_candidates("RepoCache.getEntry()") == ["getEntry"]
+    assert symbol_candidates("what does `load_repo` call and who calls fetch_url()?") == ["load_repo", "fetch_url"]
+    assert symbol_candidates("how are repositories loaded?") == []
+
+def test_reciprocal_rank_fusion_favours_items_ranked_by_both():
+    assert reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]]) == ["c", "a", "b", "d"]
+    assert reciprocal_rank_fusion([[], ["x"]]) == ["x"]
+
+def test_bm25_matches_identifier_parts(tmp_path):
+    _, lexical_index, _ = _indexes(tmp_path)
+    assert lexical_index.search("where is the repo cache entry looked up?")[0] == "repo.py#1"
+    assert lexical_index.search("fetch a url with a timeout") == ["net.py#0"]
+    assert lexical_index.search("what is it?") == []
+    assert lexical_index.lookup_symbols(["LOAD_REPO", "missing"]) == ["repo.py#0"]
+
+    lexical_index.delete(["net.py#0"])
+    assert lexical_index.search("fetch_url") == []
+
+def test_named_symbols_skip_the_embedding_call(tmp_path):
+    vectordb, lexical_index, embeddings = _indexes(tmp_path)
+    retriever = HybridRetriever(vectordb=vectordb, lexical_index=lexical_index, k=2)
+
+    [doc] = retriever.invoke("what does `fetch_url` do?")
+    assert doc.metadata["chunk_id"] == "net.py#0"
+    assert embeddings.queries == 0
+
+    docs = retriever.invoke("how is a repo cache entry read?")
+    assert embeddings.queries == 1
+    assert len(docs) == 2 and "repo.py#1" in [doc.metadata["chunk_id"] for doc in docs]
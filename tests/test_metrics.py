@@ -0,0 +1,66 @@
+import re
+from src.metrics import Counter, Gauge, Histogram, Trace, current_trace, record_stage, timed, STAGE_SECONDS
+
+def test_counters_and_gauges_render_one_line_per_label_set():
+    counter = Counter("test_requests_total", "Requests.")
+    counter.inc(endpoint="chat")
+    counter.inc(2, endpoint="chat")
+    counter.inc(endpoint='say "hi"\n')
+    assert counter.render() == [
+        "# HELP repochat_test_requests_total Requests.",
+        "# TYPE repochat_test_requests_total counter",
+        'repochat_test_requests_total{endpoint="chat"} 3',
+        'repochat_test_requests_total{endpoint="say \\"hi\\"\\n"} 1',
+    ]
+    gauge = Gauge("test_vectors", "Vectors.")
+    gauge.set(10, repo="a")
+    gauge.set(4, repo="a")
+    assert gauge.render()[1:] == ["# TYPE repochat_test_vectors gauge", 'repochat_test_vectors{repo="a"} 4']
+
+def test_histograms_are_cumulative():
+    histogram = Histogram("test_seconds", "Durations.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, stage="embed")
+    assert histogram.render()[2:] == [
+        'repochat_test_seconds_bucket{stage="embed",le="0.1"} 1',
+        'repochat_test_seconds_bucket{stage="embed",le="1.0"} 3',
+        'repochat_test_seconds_bucket{stage="embed",le="+Inf"} 4',
+        'repochat_test_seconds_sum{stage="embed"} 4.05',
+        'repochat_test_seconds_count{stage="embed"} 4',
+    ]
+
+def _stage_count(stage):
+    match = re.search(rf'repochat_stage_seconds_count{{stage="{stage}"}} (\d+)', "\n".join(STAGE_SECONDS.render()))
+    return int(match.group(1)) if match else 0
+
+def test_stages_land_in_the_histogram_and_the_current_trace():
+    before = _stage_count("test_stage")
+    record_stage("test_stage", 0.2, chunks=3)
+    assert current_trace.get() is None
+
+    trace = Trace()
+    token = current_trace.set(trace)
+    try:
+        with timed("test_stage"):
+            pass
+    finally:
+        current_trace.reset(token)
+    assert _stage_count("test_stage") == before + 2
+    [stage] = trace.to_dict()["stages"]
+    assert stage["stage"] == "test_stage" and stage["ms"] >= 0
+
+def test_metrics_endpoint_and_chat_traces(api):
+    response = api.client.post("/api/chat", json={"msg": "How is the config loaded?", "repo": api.repo,
+                                                  "trace": True}).json()
+    stages = [stage["stage"] for stage in response["trace"]["stages"]]
+    assert {"lexical_search", "query_embed", "faiss_search", "llm"} <= set(stages)
+    assert stages.index("faiss_search") < stages.index("llm")
+
+    metrics = api.client.get("/api/metrics")
+    assert metrics.headers["content-type"].startswith("text/plain")
+    text = metrics.text
+    assert 'repochat_chat_requests_total{cache="miss",endpoint="chat"}' in text
+    assert 'repochat_llm_calls_total{status="ok"}' in text
+    assert f'repochat_index_vectors{{repo="{api.repo}"}}' in text
+    for stage in ("ingest", "embed", "index_save", "chat"):
+        assert _stage_count(stage) >= 1, stage
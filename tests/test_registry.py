@@ -0,0 +1,43 @@
+import os
+import pytest
+from src.benchmark import generate_repo, fake_embeddings
+from src.indexer import build_index, INDEX_DIRNAME
+from src.index_store import open_index, opened_files, load_index_for_update
+from src.index_types import index_bytes
+from src.registry import RepoRegistry, estimate_index_bytes
+
+@pytest.fixture
+def registry(tmp_path):
+    return RepoRegistry(str(tmp_path), load_index=None, make_retriever=None, make_chain=None)
+
+@pytest.mark.parametrize("repo_hash", ["..", ".", "../x", "/etc", "a/b", "_embedding_cache", "_parse_cache"])
+def test_unsafe_or_reserved_ids_are_rejected(registry, repo_hash):
+    with pytest.raises(ValueError):
+        registry.db_dir(repo_hash)
+    assert not registry.is_known(repo_hash)
+
+@pytest.fixture(scope="module")
+def built_indexes(tmp_path_factory):
+    root = tmp_path_factory.mktemp("indexes")
+    repo_path = str(root / "repo")
+    generate_repo(repo_path, files=8, mix={".py": 1})
+    for index_type in ("flat", "fp16", "sq8", "hnsw"):
+        build_index(repo_path, str(root / index_type), fake_embeddings(), index_type=index_type)
+    return root
+
+@pytest.mark.parametrize("index_type", ["flat", "fp16", "sq8", "hnsw"])
+def test_opened_index_size_is_its_files(built_indexes, index_type):
+    vectordb = open_index(str(built_indexes / index_type / INDEX_DIRNAME), fake_embeddings())
+    index_file, docstore_file = opened_files(vectordb)
+    assert estimate_index_bytes(vectordb) == os.path.getsize(index_file) + os.path.getsize(docstore_file)
+
+def test_compact_index_types_are_estimated_smaller(built_indexes):
+    sizes = {index_type: estimate_index_bytes(open_index(str(built_indexes / index_type / INDEX_DIRNAME),
+                                                         fake_embeddings()))
+             for index_type in ("flat", "fp16", "sq8")}
+    assert sizes["sq8"] < sizes["fp16"] < sizes["flat"]
+
+def test_in_memory_store_size_is_serialized_index_and_text(built_indexes):
+    vectordb = load_index_for_update(str(built_indexes / "fp16" / INDEX_DIRNAME), fake_embeddings())
+    text_bytes = sum(len(doc.page_content) for doc in vectordb.docstore._dict.values())
+    assert estimate_index_bytes(vectordb) == index_bytes(vectordb.index) + text_bytes
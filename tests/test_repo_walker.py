@@ -0,0 +1,49 @@
+import os
+from src.repo_walker import walk_repo
+
+FILES = {
+    ".gitignore": "# generated\n*.gen.py\n!keep.gen.py\n/out_dir/\ndocs/**/draft.py\n",
+    "src/app.py": "def main():\n    pass\n",
+    "src/app.gen.py": "x = 1\n",
+    "src/keep.gen.py": "x = 2\n",
+    "src/notes.txt": "not indexed\n",
+    "node_modules/lib/index.js": "module.exports = {};\n",
+    "out_dir/result.py": "y = 1\n",
+    "docs/a/b/draft.py": "z = 1\n",
+    "docs/a/final.py": "z = 2\n",
+    "sub/.gitignore": "local.py\n",
+    "sub/local.py": "w = 1\n",
+    "other/local.py": "w = 2\n",
+    "big.py": "# padding\n" * 1200,
+    "blob.c": "int x;\0\0\0",
+    "vendor.min.js": "var a=1;\n",
+    "bundle.js": "var a=1;" * 1000,
+    "util.js": "function f() {}\n",
+}
+
+def _write_tree(root):
+    for rel_path, content in FILES.items():
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8', newline="") as f:
+            f.write(content)
+
+def test_walk_applies_ignore_rules_and_caps(tmp_path):
+    _write_tree(str(tmp_path))
+    files, stats = walk_repo(str(tmp_path), (".py", ".c", ".js"), max_file_bytes=10000)
+
+    assert [os.path.relpath(path, tmp_path).replace(os.sep, "/") for path in files] == [
+        "docs/a/final.py", "other/local.py", "src/app.py", "src/keep.gen.py", "util.js",
+    ]
+    assert stats["skipped"] == {"excluded": 1, "gitignored": 4, "oversized": 1, "binary": 1, "minified": 2}
+    assert stats["by_extension"] == {
+        ".py": {"files": 4, "bytes": sum(len(FILES[p]) for p in ("docs/a/final.py", "other/local.py", "src/app.py",
+                                                                  "src/keep.gen.py"))},
+        ".js": {"files": 1, "bytes": len(FILES["util.js"])},
+    }
+
+def test_excludes_replace_the_default_list(tmp_path):
+    _write_tree(str(tmp_path))
+    files, stats = walk_repo(str(tmp_path), (".js",), excludes=("util.js",))
+    assert [os.path.relpath(path, tmp_path).replace(os.sep, "/") for path in files] == ["node_modules/lib/index.js"]
+    assert stats["skipped"]["excluded"] == 1
@@ -0,0 +1,93 @@
+import os
+import json
+from src.jobs import JobManager, JobQueueFull
+
+def _events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_chat_answers_and_caches_standalone_questions(api):
+    first = api.client.post("/api/chat", json={"msg": "How is the config loaded?", "repo": api.repo}).json()
+    assert first["type"] == "answer" and first["response"]
+    assert first["cache"] == {"hit": False}
+
+    # Another session has no history, so the same question is answered from the cache
+    second = api.client.post("/api/chat", json={"msg": "How is the config loaded?", "repo": api.repo,
+                                                "session_id": "other"}).json()
+    assert second["cache"]["hit"] is True
+    assert second["response"] == first["response"]
+
+def test_reingesting_drops_cached_answers(api):
+    question = {"msg": "How is the config loaded?", "repo": api.repo}
+    api.client.post("/api/chat", json=question)
+    assert api.ingest()["status"] == "done"
+    assert api.client.post("/api/chat", json=dict(question, session_id="other")).json()["cache"] == {"hit": False}
+
+def test_stream_sends_tokens_then_done(api):
+    response = api.client.post("/api/chat/stream", json={"msg": "Where are records validated?", "repo": api.repo})
+    events = _events(response.text)
+    assert [name for name, _ in events[:-1]] == ["token"] * (len(events) - 1) and len(events) > 1
+    name, done = events[-1]
+    assert name == "done" and done["cache"] == {"hit": False}
+    assert done["response"] == "".join(data["token"] for _, data in events[:-1])
+
+def test_stream_serves_cached_answers(api):
+    answer = api.client.post("/api/chat", json={"msg": "What does merge do?", "repo": api.repo}).json()["response"]
+    events = _events(api.client.post("/api/chat/stream", json={"msg": "What does merge do?", "repo": api.repo,
+                                                              "session_id": "other"}).text)
+    assert events[-1][0] == "done" and events[-1][1]["cache"]["hit"] is True
+    assert events[-1][1]["response"] == answer
+
+def test_stream_errors_are_sse_events(api, monkeypatch):
+    response = api.client.post("/api/chat/stream", json={"msg": "hi", "repo": "unknown"})
+    assert response.status_code == 200 and _events(response.text)[0][0] == "error"
+
+    def fail(*args, **kwargs):
+        raise OSError("index file is missing")
+    monkeypatch.setattr(api.registry, "get_chain", fail)
+    response = api.client.post("/api/chat/stream", json={"msg": "hi", "repo": api.repo})
+    assert response.status_code == 200
+    assert _events(response.text) == [("error", {"response": "Error processing chat: index file is missing",
+                                                 "type": "error"})]
+    assert api.client.post("/api/chat", json={"msg": "hi", "repo": api.repo}).json()["type"] == "error"
+
+def test_reingesting_a_pushed_commit_is_incremental(api, tmp_path):
+    from git import Repo, Actor
+
+    upstream = Repo(api.upstream)
+    bare = Repo.clone_from(api.upstream, str(tmp_path / "service.git"), bare=True)
+    url = "file://" + bare.working_dir
+    job = api.ingest(url)
+    assert "full ingestion" in job["response"]
+    definitions = lambda: api.client.get("/api/symbols", params={"name": "pushed_helper", "repo": url}).json()
+    assert definitions()["results"] == []
+
+    with open(os.path.join(api.upstream, "pkg0", "pushed.py"), "w", encoding="utf-8") as f:
+        f.write("def pushed_helper(value):\n    return value * 2\n")
+    upstream.index.add([os.path.join("pkg0", "pushed.py")])
+    author = Actor("Test", "test@example.com")
+    head = upstream.index.commit("Add pushed_helper", author=author, committer=author).hexsha
+    upstream.git.push(bare.working_dir, upstream.active_branch.name)
+
+    job = api.ingest(url)
+    assert job["commit"] == head
+    assert "incremental ingestion: 1 files indexed" in job["response"]
+    assert [(d["file"], d["start_line"]) for d in definitions()["results"]] == [("pkg0/pushed.py", 1)]
+
+def test_ingestion_jobs_report_progress(api):
+    # A different index type rebuilds the index, so every file is processed again
+    job = api.ingest(index_type="fp16")
+    assert (job["status"], job["stage"], job["repo"]) == ("done", "done", api.repo)
+    assert job["files_total"] == job["files_processed"] == len(api.files) and job["chunks_processed"] > 0
+    assert job["commit"] and job["elapsed_seconds"] >= 0
+    assert api.client.get("/api/jobs/unknown").status_code == 404
+
+def test_full_ingestion_queue_is_rejected(api, monkeypatch):
+    def submit(self, key, repo_url, **options):
+        raise JobQueueFull("Too many ingestions in progress (limit 16).")
+    monkeypatch.setattr(JobManager, "submit", submit)
+    response = api.client.post("/api/repository", json={"question": "file://" + api.upstream})
+    assert response.status_code == 429
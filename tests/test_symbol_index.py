@@ -0,0 +1,108 @@
+import esprima
+from src.benchmark import fake_embeddings
+from src.helper import load_and_chunk_file
+from src.indexer import build_index
+from src.symbol_index import SymbolIndex, extract_symbols
+
+C_SOURCE = """#include <stdlib.h>
+#include "list.h"
+
+struct node { int value; struct node *next; };
+
+static struct node *push(struct node *head, int value) {
+    struct node *node = malloc(sizeof *node);
+    node->next = head;
+    return node;
+}
+"""
+
+JS_SOURCE = """import { render } from "./view";
+const fs = require("fs");
+
+class Store {
+  load(path) {
+    return JSON.parse(fs.readFileSync(path));
+  }
+}
+
+function main() {
+  render(new Store().load("state.json"));
+}
+"""
+
+JAVA_SOURCE = """package demo;
+
+import java.util.List;
+
+public class Registry {
+    private List<String> names;
+
+    public int size() {
+        return names.size();
+    }
+
+    static class Entry {
+        void touch() { log("touched"); }
+    }
+}
+"""
+
+def _definitions(symbols):
+    return {(d["qualname"], d["kind"], d["start_line"], d["end_line"]) for d in symbols["definitions"]}
+
+def _references(symbols):
+    return {(r["name"], r["kind"], r["line"], r["scope"]) for r in symbols["references"]}
+
+def test_c_symbols():
+    symbols = extract_symbols("list.c", C_SOURCE)
+    assert _definitions(symbols) == {("node", "class", 4, 4), ("push", "function", 6, 10)}
+    assert _references(symbols) == {("stdlib.h", "import", 1, "<module>"), ("list.h", "import", 2, "<module>"),
+                                    ("malloc", "call", 7, "push")}
+
+def test_js_symbols():
+    symbols = extract_symbols("store.js", JS_SOURCE)
+    assert _definitions(symbols) == {("Store", "class", 4, 8), ("Store.load", "method", 5, 7),
+                                     ("main", "function", 10, 12)}
+    assert {d["name"] for d in symbols["definitions"]} == {"Store", "load", "main"}
+    assert _references(symbols) == {
+        ("./view", "import", 1, "<module>"), ("fs", "import", 2, "<module>"),
+        ("parse", "call", 6, "Store.load"), ("readFileSync", "call", 6, "Store.load"),
+        ("render", "call", 11, "main"), ("Store", "call", 11, "main"), ("load", "call", 11, "main"),
+    }
+
+def test_java_symbols():
+    symbols = extract_symbols("Registry.java", JAVA_SOURCE)
+    assert _definitions(symbols) == {("Registry", "class", 5, 15), ("Registry.size", "method", 8, 10),
+                                     ("Registry.Entry", "class", 12, 14), ("Registry.Entry.touch", "method", 13, 13)}
+    assert _references(symbols) == {("java.util.List", "import", 3, "<module>"),
+                                     ("size", "call", 9, "Registry.size"), ("log", "call", 13, "Registry.Entry.touch")}
+
+def test_unparsable_files_have_no_symbols():
+    assert extract_symbols("broken.js", "function (") == {"definitions": [], "references": []}
+    assert extract_symbols("Broken.java", "class {") == {"definitions": [], "references": []}
+
+def test_chunker_and_symbols_share_one_parse(tmp_path, monkeypatch):
+    calls = []
+    parse_module = esprima.parseModule
+    monkeypatch.setattr(esprima, "parseModule", lambda *args: calls.append(1) or parse_module(*args))
+    path = tmp_path / "store.js"
+    # Not parsed by another test, so the previous parse on this thread is not reused either
+    path.write_text(JS_SOURCE + "main();\n", encoding="utf-8")
+
+    chunks, symbols = load_and_chunk_file(str(path))
+    assert len(calls) == 1
+    assert {chunk["metadata"]["name"] for chunk in chunks} >= {"Store", "main"}
+    assert "Store.load" in {d["qualname"] for d in symbols["definitions"]}
+
+def test_ingested_definitions_link_to_their_chunks(tmp_path):
+    repo_path, db_dir = tmp_path / "repo", str(tmp_path / "db")
+    repo_path.mkdir()
+    for name, source in (("list.c", C_SOURCE), ("store.js", JS_SOURCE), ("Registry.java", JAVA_SOURCE)):
+        (repo_path / name).write_text(source, encoding="utf-8")
+    build_index(str(repo_path), db_dir, fake_embeddings())
+
+    symbol_index = SymbolIndex(db_dir)
+    for name, file in (("push", "list.c"), ("load", "store.js"), ("touch", "Registry.java")):
+        [definition] = symbol_index.definitions(name)
+        assert definition["file"] == file and definition["chunk_id"].startswith(file + "#")
+    assert {r["scope"] for r in symbol_index.references("malloc", "call")} == {"push"}